@@ -0,0 +1,133 @@
+# /// script
+# dependencies = ["cloudpickle"]
+# ///
+"""Benchmark PEP 723 metadata parsing against the previous regex parser.
+
+Usage:
+    uv run _extra/benchmarks/script_metadata.py
+    uv run _extra/benchmarks/script_metadata.py --scripts 5000 --body-lines 400
+"""
+
+import argparse
+import re
+import sys
+import tempfile
+import time
+import tomllib
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from obj_from_process import (
+    _metadata_cache,
+    parse_script_metadata,
+    read_directory_metadata,
+    read_script_metadata,
+)
+
+HEADER = """\
+# /// script
+# requires-python = ">=3.12"
+# dependencies = [
+#   "mcp[cli]",
+#   "httpx>=0.27",
+#   "maps[storage,mcp]@git+https://github.com/zzstoatzz/maps.git",
+# ]
+# ///
+"""
+
+
+def regex_parse(script_content: str) -> dict[str, Any] | None:
+    """The previous behaviour: a multiline regex over the whole script."""
+    metadata_pattern = (
+        r"(?m)^# /// (?P<type>[a-zA-Z0-9-]+)$\s(?P<content>(^#(| .*)$\s)+)^# ///$"
+    )
+    matches = [
+        match
+        for match in re.finditer(metadata_pattern, script_content)
+        if match.group("type") == "script"
+    ]
+    if not matches:
+        return None
+
+    toml_content = ""
+    for line in matches[0].group("content").splitlines():
+        if line.startswith("# "):
+            toml_content += line[2:] + "\n"
+        elif line == "#":
+            toml_content += "\n"
+    return tomllib.loads(toml_content)
+
+
+def script(body_lines: int) -> str:
+    body = "\n".join(f"# step {i}\nvalue_{i} = {i}" for i in range(body_lines // 2))
+    return f"{HEADER}\nfrom mcp.server.fastmcp import FastMCP\n\n{body}\n"
+
+
+def pathological(lines: int) -> str:
+    """Opening lines that never close, which the regex rescans from each one."""
+    return "# /// script\n" * lines + "code\n"
+
+
+def timed(name: str, count: int, fn: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<34} {elapsed * 1000:9.1f}ms  {elapsed / count * 1e6:8.1f}us each")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scripts", type=int, default=2000)
+    parser.add_argument("--body-lines", type=int, default=200)
+    parser.add_argument("--pathological-lines", type=int, default=2000)
+    args = parser.parse_args()
+
+    sources = [script(args.body_lines) for _ in range(args.scripts)]
+    assert all(regex_parse(s) == parse_script_metadata(s) for s in sources[:10])
+
+    print(f"{args.scripts} scripts of ~{args.body_lines} lines")
+    timed("regex", args.scripts, lambda: [regex_parse(s) for s in sources])
+    timed("scanner", args.scripts, lambda: [parse_script_metadata(s) for s in sources])
+
+    bad = pathological(args.pathological_lines)
+    print(f"\n{args.pathological_lines} unclosed opening lines")
+    timed("regex", 1, lambda: regex_parse(bad))
+    timed("scanner", 1, lambda: parse_script_metadata(bad))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        paths = [directory / f"server_{i}.py" for i in range(args.scripts)]
+        for path, source in zip(paths, sources):
+            path.write_text(source)
+
+        print(f"\nreading {args.scripts} files")
+        timed(
+            "read + regex",
+            args.scripts,
+            lambda: [regex_parse(p.read_text()) for p in paths],
+        )
+        _metadata_cache.clear()
+        timed(
+            "read_script_metadata (cold)",
+            args.scripts,
+            lambda: [read_script_metadata(p) for p in paths],
+        )
+        timed(
+            "read_script_metadata (cached)",
+            args.scripts,
+            lambda: [read_script_metadata(p) for p in paths],
+        )
+        _metadata_cache.clear()
+        timed(
+            "read_directory_metadata (cold)",
+            args.scripts,
+            lambda: read_directory_metadata(directory),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Synthetic frame corpora for the firehose benchmarks.
+
+Recorded corpora use the format of `docket_firehose.replay`: raw websocket
+frames, each prefixed with its length as a 4-byte big-endian integer.
+"""
+
+import hashlib
+import random
+
+import libipld
+
+_BSKY_COLLECTIONS = [
+    "app.bsky.feed.post",
+    "app.bsky.feed.like",
+    "app.bsky.feed.repost",
+    "app.bsky.graph.follow",
+]
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _cid(block: bytes) -> bytes:
+    # CIDv1, dag-cbor, sha2-256
+    return bytes([0x01, 0x71, 0x12, 0x20]) + hashlib.sha256(block).digest()
+
+
+def _car(blocks: list[bytes]) -> tuple[bytes, list[bytes]]:
+    cids = [_cid(block) for block in blocks]
+    header = libipld.encode_dag_cbor({"version": 1, "roots": cids[:1]})
+    out = bytearray(_varint(len(header)) + header)
+    for cid, block in zip(cids, blocks):
+        out += _varint(len(cid) + len(block)) + cid + block
+    return bytes(out), cids
+
+
+def _commit_frame(seq: int, collection: str, rng: random.Random) -> bytes:
+    rkey = f"{rng.getrandbits(64):016x}"
+    if collection.startswith("app.mcp."):
+        record = {
+            "$type": collection,
+            "name": f"server-{seq}",
+            "installation": f"uv run https://example.com/{rkey}.py",
+            "tools": [],
+            "createdAt": "2025-03-16T00:00:00",
+        }
+    else:
+        record = {
+            "$type": collection,
+            "text": "x" * rng.randint(20, 280),
+            "createdAt": "2025-03-16T00:00:00.000Z",
+        }
+
+    # a commit object, the record, and a few MST nodes, like a real commit diff
+    blocks = [libipld.encode_dag_cbor({"did": "did:plc:bench", "rev": "3l3qo2vutsw2b"})]
+    blocks.append(libipld.encode_dag_cbor(record))
+    blocks.extend(
+        libipld.encode_dag_cbor({"l": None, "e": [{"k": rng.randbytes(32)}]})
+        for _ in range(rng.randint(2, 6))
+    )
+    car, cids = _car(blocks)
+
+    header = libipld.encode_dag_cbor({"op": 1, "t": "#commit"})
+    body = libipld.encode_dag_cbor(
+        {
+            "blobs": [],
+            "blocks": car,
+            "commit": cids[0],
+            "ops": [
+                {"action": "create", "path": f"{collection}/{rkey}", "cid": cids[1]}
+            ],
+            "rebase": False,
+            "repo": "did:plc:bench",
+            "rev": "3l3qo2vutsw2b",
+            "seq": seq,
+            "since": None,
+            "time": "2025-03-16T00:00:00.000Z",
+            "tooBig": False,
+        }
+    )
+    return header + body
+
+
+def synthesize_frames(
+    count: int, match_ratio: float = 0.001, seed: int = 0
+) -> list[bytes]:
+    """Build commit frames that are mostly `app.bsky.*` with some `app.mcp.server`."""
+    rng = random.Random(seed)
+    return [
+        _commit_frame(
+            seq,
+            "app.mcp.server"
+            if rng.random() < match_ratio
+            else rng.choice(_BSKY_COLLECTIONS),
+            rng,
+        )
+        for seq in range(count)
+    ]
+
+
+def _record(collection: str, rkey: str, rng: random.Random) -> dict:
+    if collection.startswith("app.mcp."):
+        return {
+            "$type": collection,
+            "name": f"server-{rkey}",
+            "installation": f"uv run https://example.com/{rkey}.py",
+            "tools": [],
+            "createdAt": "2025-03-16T00:00:00",
+        }
+    return {
+        "$type": collection,
+        "text": "x" * rng.randint(20, 280),
+        "createdAt": "2025-03-16T00:00:00.000Z",
+    }
+
+
+def synthesize_repo(
+    count: int,
+    match_ratio: float = 0.001,
+    seed: int = 0,
+    did: str = "did:plc:bench",
+    fanout: int = 16,
+) -> tuple[bytes, dict[str, list[str]]]:
+    """
+    Build a `getRepo` style CAR export of `count` records.
+
+    Most records are `app.bsky.*`, with some `app.mcp.server` and
+    `app.mcp.server.attestation`. Keys are split over MST nodes of `fanout`
+    prefix-compressed entries, and the blocks are shuffled, since nothing
+    guarantees an export's block order. Returns the CAR and the MST keys of
+    the `app.mcp.*` records.
+    """
+    rng = random.Random(seed)
+    records: dict[str, bytes] = {}
+    for _ in range(count):
+        if rng.random() < match_ratio:
+            collection = rng.choice(["app.mcp.server", "app.mcp.server.attestation"])
+        else:
+            collection = rng.choice(_BSKY_COLLECTIONS)
+        rkey = f"{rng.getrandbits(64):016x}"
+        key = f"{collection}/{rkey}"
+        records[key] = libipld.encode_dag_cbor(_record(collection, rkey, rng))
+
+    keys = sorted(records)
+    nodes: list[bytes] = []
+    for start in range(0, len(keys), fanout):
+        entries = []
+        previous = b""
+        for key in keys[start : start + fanout]:
+            encoded = key.encode()
+            prefix = 0
+            while (
+                prefix < min(len(previous), len(encoded))
+                and previous[prefix] == encoded[prefix]
+            ):
+                prefix += 1
+            entries.append(
+                {"k": encoded[prefix:], "p": prefix, "t": None, "v": _cid(records[key])}
+            )
+            previous = encoded
+        nodes.append(libipld.encode_dag_cbor({"e": entries, "l": None}))
+
+    commit = libipld.encode_dag_cbor(
+        {"data": _cid(nodes[0]), "did": did, "rev": "3l3qo2vutsw2b", "version": 3}
+    )
+    rest = nodes + list(records.values())
+    rng.shuffle(rest)
+    car, _ = _car([commit, *rest])
+
+    wanted: dict[str, list[str]] = {}
+    for key in keys:
+        collection = key.partition("/")[0]
+        if collection.startswith("app.mcp."):
+            wanted.setdefault(collection, []).append(key)
+    return car, wanted
@@ -0,0 +1,84 @@
+"""Benchmark commit filtering with and without the op-path fast path.
+
+Usage:
+    uv run benchmarks/prefilter.py                       # synthetic corpus
+    uv run benchmarks/prefilter.py --corpus frames.bin   # recorded corpus
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from atproto import CAR, models, parse_subscribe_repos_message
+from atproto_firehose.models import Frame, MessageFrame
+from corpus import synthesize_frames
+
+from docket_firehose.decode import decode_commit_records
+from docket_firehose.replay import read_frames
+
+Commit = models.ComAtprotoSyncSubscribeRepos.Commit
+
+
+def full_decode(commit: Commit, record_types: frozenset[str]) -> list[dict]:
+    """The previous behaviour: decode the whole CAR and check every block."""
+    if not commit.blocks:
+        return []
+    car = CAR.from_bytes(
+        commit.blocks if isinstance(commit.blocks, bytes) else commit.blocks.encode()
+    )
+    return [
+        record
+        for record in car.blocks.values()
+        if isinstance(record, dict) and record.get("$type") in record_types
+    ]
+
+
+def run(
+    name: str,
+    commits: list[Commit],
+    record_types: frozenset[str],
+    decode: Callable[[Commit, frozenset[str]], list],
+) -> int:
+    start = time.perf_counter()
+    matched = sum(len(decode(commit, record_types)) for commit in commits)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>12}: {len(commits) / elapsed:>12,.0f} commits/s "
+        f"({matched} records matched in {elapsed:.3f}s)"
+    )
+    return matched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="recorded frame corpus")
+    parser.add_argument("--frames", type=int, default=20_000)
+    parser.add_argument("--match-ratio", type=float, default=0.001)
+    parser.add_argument("--types", nargs="+", default=["app.mcp.server"])
+    args = parser.parse_args()
+
+    if args.corpus:
+        raw_frames = list(read_frames(args.corpus))
+    else:
+        raw_frames = synthesize_frames(args.frames, args.match_ratio)
+
+    commits = []
+    for raw in raw_frames:
+        frame = Frame.from_bytes(raw)
+        if not isinstance(frame, MessageFrame):
+            continue
+        message = parse_subscribe_repos_message(frame)
+        if isinstance(message, Commit):
+            commits.append(message)
+
+    record_types = frozenset(args.types)
+    print(f"{len(commits)} commits, watching {', '.join(sorted(record_types))}")
+    before = run("full decode", commits, record_types, full_decode)
+    after = run("fast path", commits, record_types, decode_commit_records)
+    if before != after:
+        raise SystemExit(f"mismatch: full decode found {before}, fast path {after}")
+
+
+if __name__ == "__main__":
+    main()
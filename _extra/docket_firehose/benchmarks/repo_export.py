@@ -0,0 +1,87 @@
+"""Benchmark pulling records out of a whole-repository CAR export.
+
+Usage:
+    uv run benchmarks/repo_export.py                          # synthetic repo
+    uv run benchmarks/repo_export.py --write repo.car         # save it as a fixture
+    uv run benchmarks/repo_export.py --car repo.car           # a saved export
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import libipld
+from corpus import synthesize_repo
+
+from docket_firehose.car import RepoRecordExtractor, read_car_file
+from docket_firehose.decode import MatchedRecord
+
+COLLECTIONS = ["app.mcp.server", "app.mcp.server.attestation"]
+
+
+def full_decode(car: bytes, collections: list[str]) -> list[MatchedRecord]:
+    """Decode every block, then walk the MST nodes for the wanted keys."""
+    _, blocks = libipld.decode_car(car)
+    wanted = frozenset(collections)
+    matched = []
+    for block in blocks.values():
+        if not (isinstance(block, dict) and isinstance(block.get("e"), list)):
+            continue
+        key = b""
+        for entry in block["e"]:
+            key = key[: entry["p"]] + entry["k"]
+            collection, _, rkey = key.decode().partition("/")
+            if collection in wanted:
+                cid = libipld.encode_cid(entry["v"])
+                matched.append(MatchedRecord(collection, rkey, cid, blocks[entry["v"]]))
+    return matched
+
+
+def streamed(car: bytes, collections: list[str], chunk_size: int = 64 * 1024):
+    extractor = RepoRecordExtractor(collections)
+    matched = []
+    for start in range(0, len(car), chunk_size):
+        matched.extend(extractor.feed(car[start : start + chunk_size]))
+    extractor.finish()
+    return matched
+
+
+def run(name: str, car: bytes, extract: Callable[[bytes, list[str]], list]) -> set:
+    start = time.perf_counter()
+    matched = extract(car, COLLECTIONS)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:>12}: {len(car) / elapsed / 1e6:>8,.1f} MB/s "
+        f"({len(matched)} records in {elapsed * 1000:.1f}ms)"
+    )
+    return {(m.collection, m.rkey, m.cid) for m in matched}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--car", type=Path, help="saved repository export")
+    parser.add_argument("--write", type=Path, help="save the synthetic export here")
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--match-ratio", type=float, default=0.001)
+    args = parser.parse_args()
+
+    if args.car:
+        car = b"".join(read_car_file(args.car))
+    else:
+        car, _ = synthesize_repo(args.records, args.match_ratio)
+        if args.write:
+            args.write.write_bytes(car)
+            print(f"wrote {args.write}")
+
+    print(f"{len(car) / 1e6:.1f} MB export")
+    before = run("full decode", car, full_decode)
+    after = run("streamed", car, streamed)
+    if before != after:
+        raise SystemExit(
+            f"mismatch: full decode found {len(before)}, streamed {len(after)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark scalar vs vectorized longevity scoring.
+
+Usage:
+    uv run benchmarks/scoring.py --servers 1000000
+"""
+
+import argparse
+import time
+from datetime import UTC, datetime, timedelta
+
+import numpy as np
+
+from docket_firehose.tasks.process import (
+    calculate_longevity_score,
+    calculate_longevity_scores,
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--servers", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start = int(datetime(2025, 1, 1, tzinfo=UTC).timestamp() * 1_000_000)
+    first_seen = start + rng.integers(0, 90 * 86_400_000_000, args.servers)
+    last_seen = first_seen + rng.integers(0, 60 * 86_400_000_000, args.servers)
+
+    first_iso = [
+        (_EPOCH + timedelta(microseconds=us)).isoformat() for us in first_seen.tolist()
+    ]
+    last_iso = [
+        (_EPOCH + timedelta(microseconds=us)).isoformat() for us in last_seen.tolist()
+    ]
+
+    began = time.perf_counter()
+    scalar = [
+        calculate_longevity_score(first, last)
+        for first, last in zip(first_iso, last_iso)
+    ]
+    scalar_elapsed = time.perf_counter() - began
+
+    began = time.perf_counter()
+    bulk = calculate_longevity_scores(first_seen, last_seen)
+    bulk_elapsed = time.perf_counter() - began
+
+    print(f"{args.servers:,} servers")
+    print(f"    scalar: {scalar_elapsed:.3f}s ({args.servers / scalar_elapsed:,.0f}/s)")
+    print(f"vectorized: {bulk_elapsed:.3f}s ({args.servers / bulk_elapsed:,.0f}/s)")
+
+    mismatches = int(np.count_nonzero(np.asarray(scalar) != bulk))
+    if mismatches:
+        raise SystemExit(f"{mismatches} scores differ from the scalar function")
+    print("all scores identical to the scalar function")
+
+
+if __name__ == "__main__":
+    main()
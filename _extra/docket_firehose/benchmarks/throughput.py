@@ -0,0 +1,135 @@
+"""Measure firehose consumer throughput offline by replaying recorded frames.
+
+Usage:
+    uv run benchmarks/throughput.py record frames.bin --frames 50000   # capture from the relay
+    uv run benchmarks/throughput.py run                                # synthetic corpus
+    uv run benchmarks/throughput.py run --corpus frames.bin --workers 4
+    uv run benchmarks/throughput.py run --corpus frames.bin --rate 2000
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from functools import partial
+from pathlib import Path
+
+import anyio
+from atproto_firehose.models import Frame, MessageFrame
+from corpus import synthesize_frames
+
+from docket_firehose.pipeline import decode_frame
+from docket_firehose.replay import ReplayClient, read_frames, record_frames
+from docket_firehose.storage import record_store_from_settings
+from docket_firehose.tasks import firehose
+
+
+def percentiles(samples: list[float]) -> str:
+    if len(samples) < 2:
+        return "n/a"
+    q = statistics.quantiles(samples, n=100)
+    return (
+        " ".join(f"p{p}={q[p - 1] * 1e6:,.0f}us" for p in (50, 90, 99))
+        + f" max={max(samples) * 1e6:,.0f}us"
+    )
+
+
+def decode_latencies(frames: list[bytes], record_types: frozenset[str]) -> list[float]:
+    """Time `decode_frame`, the per-frame work of the consumer, on each frame."""
+    latencies = []
+    for raw in frames:
+        message = Frame.from_bytes(raw)
+        if not isinstance(message, MessageFrame):
+            continue
+        start = time.perf_counter()
+        decode_frame(message, record_types)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def replay(
+    frames: list[bytes],
+    record_types: frozenset[str],
+    rate: float | None,
+    workers: int,
+) -> None:
+    settings = firehose.settings
+    with tempfile.TemporaryDirectory() as tmp:
+        # keep the benchmark's records and cursor away from real data
+        settings.firehose_data_path = anyio.Path(tmp)
+        settings.cursor_file = anyio.Path(tmp) / "cursor"
+        settings.cursor_backend = "file"
+        settings.firehose_workers = workers
+        # there's no worker to tell about the records, and publishing to a
+        # Redis that isn't running would measure its connection errors
+        settings.record_events = False
+
+        client = ReplayClient(frames, rate=rate)
+        start = time.perf_counter()
+        await firehose.consume_firehose(record_types, client=client)
+        elapsed = time.perf_counter() - start
+
+        store = record_store_from_settings(settings)
+        saved = 0
+        for collection in record_types:
+            async for _ in store.read(collection):
+                saved += 1
+
+    mode = f"{workers} decode workers" if workers else "inline decoding"
+    print(f"\n{client.delivered:,} frames in {elapsed:.3f}s with {mode}")
+    print(f"  throughput:       {client.delivered / elapsed:,.0f} frames/s")
+    print(f"  handler latency:  {percentiles(client.latencies)}")
+    print(f"  records saved:    {saved:,}")
+
+
+def run(args: argparse.Namespace) -> None:
+    if args.corpus:
+        frames = list(read_frames(args.corpus))
+    else:
+        frames = synthesize_frames(args.frames, args.match_ratio)
+    record_types = frozenset(args.types)
+
+    print(f"{len(frames):,} frames, watching {', '.join(sorted(record_types))}")
+    print(f"  decode latency:   {percentiles(decode_latencies(frames, record_types))}")
+    anyio.run(replay, frames, record_types, args.rate, args.workers)
+
+
+def record(args: argparse.Namespace) -> None:
+    count = anyio.run(
+        partial(
+            record_frames,
+            anyio.Path(args.output),
+            max_frames=args.frames,
+            max_seconds=args.seconds,
+            cursor=args.cursor,
+        )
+    )
+    print(f"{count:,} frames written to {args.output}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(required=True)
+
+    run_parser = commands.add_parser("run", help="replay frames through the consumer")
+    run_parser.add_argument("--corpus", type=Path, help="recorded frame corpus")
+    run_parser.add_argument("--frames", type=int, default=20_000)
+    run_parser.add_argument("--match-ratio", type=float, default=0.001)
+    run_parser.add_argument("--types", nargs="+", default=["app.mcp.server"])
+    run_parser.add_argument("--rate", type=float, help="frames per second to replay at")
+    run_parser.add_argument("--workers", type=int, default=0)
+    run_parser.set_defaults(command=run)
+
+    record_parser = commands.add_parser("record", help="capture frames from the relay")
+    record_parser.add_argument("output", type=Path)
+    record_parser.add_argument("--frames", type=int, default=10_000)
+    record_parser.add_argument("--seconds", type=float)
+    record_parser.add_argument("--cursor", type=int, help="seq to start after")
+    record_parser.set_defaults(command=record)
+
+    args = parser.parse_args()
+    args.command(args)
+
+
+if __name__ == "__main__":
+    main()
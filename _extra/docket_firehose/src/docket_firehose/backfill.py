@@ -0,0 +1,64 @@
+"""Entry point for backfilling records the firehose consumer never saw."""
+
+import argparse
+from functools import partial
+from pathlib import Path
+from typing import Literal
+
+import anyio
+
+from docket_firehose.logging import setup_logging
+from docket_firehose.settings import Settings
+from docket_firehose.tasks.backfill import backfill_repos
+
+settings = Settings()
+
+
+async def main(
+    collections: list[str],
+    dids: list[str] | None = None,
+    car_dir: Path | None = None,
+    mode: Literal["records", "car"] = settings.backfill_mode,
+) -> None:
+    """Crawl repositories once, resuming from the last checkpoint."""
+    setup_logging()
+    car_files = sorted(car_dir.glob("*.car")) if car_dir is not None else None
+    await backfill_repos(collections, dids, car_files, mode)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill records into the store")
+    parser.add_argument(
+        "--did",
+        dest="dids",
+        action="append",
+        help="Repository to crawl, may be repeated (default: discover from relay)",
+    )
+    parser.add_argument(
+        "--collection",
+        dest="collections",
+        action="append",
+        help=f"Record type to fetch, may be repeated (default: {settings.record_type})",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["records", "car"],
+        default=settings.backfill_mode,
+        help="Page through listRecords or fetch whole repos with getRepo "
+        f"(default: {settings.backfill_mode})",
+    )
+    parser.add_argument(
+        "--car-dir",
+        type=Path,
+        help="Read repository exports (*.car) from this directory instead",
+    )
+    args = parser.parse_args()
+    anyio.run(
+        partial(
+            main,
+            args.collections or [settings.record_type],
+            args.dids,
+            args.car_dir,
+            args.mode,
+        )
+    )
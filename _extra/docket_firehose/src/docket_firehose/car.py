@@ -0,0 +1,182 @@
+"""Streaming extraction of records from whole-repository CAR exports."""
+
+from collections.abc import AsyncIterable, Iterable, Iterator
+from pathlib import Path
+
+import libipld
+
+from docket_firehose.decode import MatchedRecord, cid_length, read_varint
+
+# a DAG-CBOR map of two keys whose first key is "e": how every MST node starts
+_MST_NODE_PREFIX = b"\xa2\x61\x65"
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _try_varint(data: bytes, offset: int) -> tuple[int, int] | None:
+    """Read a varint, or return None if `data` ends in the middle of it."""
+    end = offset
+    while end < len(data):
+        if not data[end] & 0x80:
+            return read_varint(data, offset)
+        end += 1
+    return None
+
+
+class CarStream:
+    """
+    Split a CAR file into its blocks as the bytes arrive.
+
+    `feed` takes chunks of any size and returns the (binary CID, encoded
+    block) sections completed so far; only an unfinished section is kept in
+    memory between calls.
+    """
+
+    def __init__(self) -> None:
+        self.roots: list[bytes] = []
+        self._rest = b""
+        self._header_read = False
+
+    def feed(self, chunk: bytes) -> list[tuple[bytes, bytes]]:
+        data = self._rest + chunk if self._rest else chunk
+        size = len(data)
+        sections: list[tuple[bytes, bytes]] = []
+        offset = 0
+        while offset < size:
+            length = data[offset]
+            start = offset + 1
+            if length & 0x80:
+                # most blocks are under 16 KiB, so their length takes two bytes
+                if start < size and data[start] < 0x80:
+                    length = (length & 0x7F) | (data[start] << 7)
+                    start += 1
+                elif (varint := _try_varint(data, offset)) is None:
+                    break
+                else:
+                    length, start = varint
+            end = start + length
+            if end > size:
+                break
+            if not self._header_read:
+                header = libipld.decode_dag_cbor(data[start:end])
+                self.roots = list(header.get("roots") or [])
+                self._header_read = True
+            else:
+                cid_end = start + cid_length(data, start)
+                sections.append((data[start:cid_end], data[cid_end:end]))
+            offset = end
+        self._rest = data[offset:]
+        return sections
+
+    @property
+    def incomplete(self) -> bool:
+        """Whether bytes are left over that don't make up a whole section."""
+        return bool(self._rest)
+
+
+class RepoRecordExtractor:
+    """
+    Pull the records of some collections out of a repository export.
+
+    Blocks can arrive in any order. MST nodes are always decoded, since each
+    one lists the full keys (`collection/rkey`) and record CIDs of its
+    entries. Other blocks are only kept, still encoded, when their bytes
+    mention one of the wanted collections, and are decoded once an MST entry
+    under a wanted collection points at them. Everything else in the repo,
+    which is nearly all of it, is never decoded.
+    """
+
+    def __init__(self, collections: Iterable[str]) -> None:
+        self.collections = frozenset(collections)
+        # a block holding a wanted record contains its collection name, and
+        # any name containing another one is already covered by it
+        names = sorted(self.collections, key=len)
+        self._needles = [
+            name.encode()
+            for i, name in enumerate(names)
+            if not any(shorter in name for shorter in names[:i])
+        ]
+        self.stream = CarStream()
+        self.did: str | None = None
+
+        self._paths: dict[bytes, str] = {}  # record CID -> wanted MST key
+        self._pending: dict[bytes, bytes] = {}  # candidate blocks not yet keyed
+
+    def _record(self, cid: bytes, path: str, block: bytes) -> MatchedRecord | None:
+        record = libipld.decode_dag_cbor(block)
+        collection, _, rkey = path.partition("/")
+        if isinstance(record, dict) and record.get("$type") == collection:
+            return MatchedRecord(collection, rkey, libipld.encode_cid(cid), record)
+        return None
+
+    def _node(self, block: bytes) -> dict | None:
+        node = libipld.decode_dag_cbor(block)
+        if isinstance(node, dict) and isinstance(node.get("e"), list) and "l" in node:
+            return node
+        return None
+
+    def feed(self, chunk: bytes) -> list[MatchedRecord]:
+        """Take the next bytes of the export and return any records completed."""
+        matched: list[MatchedRecord] = []
+        # usually one collection is wanted, and one `in` is cheaper than any()
+        needle = self._needles[0] if len(self._needles) == 1 else None
+        sections = self.stream.feed(chunk)
+        root = self.stream.roots[0] if self.stream.roots else None
+        for cid, block in sections:
+            if cid == root:
+                commit = libipld.decode_dag_cbor(block)
+                if isinstance(commit, dict):
+                    self.did = commit.get("did")
+                continue
+
+            node = self._node(block) if block.startswith(_MST_NODE_PREFIX) else None
+            if node is not None:
+                key = b""
+                for entry in node["e"]:
+                    key = key[: entry["p"]] + entry["k"]
+                    path = key.decode()
+                    if path.partition("/")[0] not in self.collections:
+                        continue
+                    value = entry["v"]
+                    if (pending := self._pending.pop(value, None)) is not None:
+                        if record := self._record(value, path, pending):
+                            matched.append(record)
+                    else:
+                        self._paths[value] = path
+                continue
+
+            if needle is not None:
+                if needle not in block:
+                    continue
+            elif not any(needle in block for needle in self._needles):
+                continue
+            if (path := self._paths.pop(cid, None)) is not None:
+                if record := self._record(cid, path, block):
+                    matched.append(record)
+            else:
+                self._pending[cid] = block
+        return matched
+
+    def finish(self) -> None:
+        """Check that the export ended cleanly."""
+        if self.stream.incomplete:
+            raise ValueError("CAR export ended in the middle of a block")
+
+
+def read_car_file(path: Path, chunk_size: int = _CHUNK_SIZE) -> Iterator[bytes]:
+    """Read a CAR file from disk in chunks, e.g. a saved `getRepo` fixture."""
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+async def aextract_records(
+    chunks: AsyncIterable[bytes], collections: Iterable[str]
+) -> list[MatchedRecord]:
+    """Collect the records of `collections` from a streamed CAR export."""
+    extractor = RepoRecordExtractor(collections)
+    matched: list[MatchedRecord] = []
+    async for chunk in chunks:
+        matched.extend(extractor.feed(chunk))
+    extractor.finish()
+    return matched
@@ -0,0 +1,363 @@
+"""Resumable, concurrent crawling of repositories for records the firehose missed."""
+
+import json
+import logging
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Literal
+
+import anyio
+import httpx
+from atproto import AsyncClient, AsyncIdResolver, models
+from atproto_client.models.dot_dict import DotDict
+from pydantic import BaseModel
+
+from docket_firehose.car import RepoRecordExtractor, aextract_records, read_car_file
+from docket_firehose.decode import MatchedRecord
+from docket_firehose.storage import StoredRecord
+from docket_firehose.utils import load_json_file
+
+logger = logging.getLogger("backfill")
+
+#: stored records don't come from the firehose, so they carry no seq
+BACKFILL_SEQ = 0
+
+#: the record store log backfilled records are written to, apart from the
+#: one the firehose consumer is writing
+BACKFILL_LOG = "backfill"
+
+#: the most records a PDS returns from one listRecords call
+PAGE_SIZE = 100
+
+
+@dataclass(slots=True)
+class CollectionProgress:
+    """How far the crawl of one collection in one repository has got."""
+
+    cursor: str | None = None
+    records: int = 0
+    done: bool = False
+
+
+class BackfillCheckpoint:
+    """
+    Keep crawl progress per (DID, collection) in a JSON file.
+
+    `advance` only updates memory; the file is rewritten once `flush_interval`
+    seconds have passed since the last write, or on `flush`. `sync` runs
+    first, so a cursor is never saved ahead of the records fetched before it.
+    """
+
+    def __init__(
+        self,
+        path: anyio.Path,
+        sync: Callable[[], Awaitable[None]] | None = None,
+        flush_interval: float = 5.0,
+    ) -> None:
+        self.path = path
+        self.sync = sync
+        self.flush_interval = flush_interval
+        self.progress: dict[str, dict[str, CollectionProgress]] = {}
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self._lock = anyio.Lock()
+
+    async def load(self) -> None:
+        data = await load_json_file(self.path)
+        self.progress = {
+            did: {
+                collection: CollectionProgress(**progress)
+                for collection, progress in collections.items()
+            }
+            for did, collections in data.items()
+        }
+
+    def get(self, did: str, collection: str) -> CollectionProgress:
+        return self.progress.setdefault(did, {}).setdefault(
+            collection, CollectionProgress()
+        )
+
+    async def advance(
+        self, did: str, collection: str, cursor: str | None, records: int
+    ) -> None:
+        """Record a fetched page; a missing `cursor` marks the collection done."""
+        progress = self.get(did, collection)
+        progress.cursor = cursor
+        progress.records += records
+        progress.done = cursor is None
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._dirty:
+                return
+            # anything advanced while syncing is written next time
+            self._dirty = False
+            data = {
+                did: {
+                    collection: asdict(progress)
+                    for collection, progress in collections.items()
+                }
+                for did, collections in self.progress.items()
+            }
+            if self.sync is not None:
+                await self.sync()
+            await self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            await tmp.write_text(json.dumps(data, separators=(",", ":")))
+            await tmp.replace(self.path)
+            self._last_flush = time.monotonic()
+
+
+def _record_value(value: Any) -> dict:
+    """Turn a listRecords value into the plain dict the firehose would store."""
+    if isinstance(value, DotDict):
+        return value.to_dict()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True, exclude_none=True)
+    return dict(value)
+
+
+def stored_record(
+    did: str, collection: str, rkey: str, cid: str, record: dict
+) -> StoredRecord:
+    """
+    Build the `StoredRecord` for a record found by a backfill.
+
+    Its time is when it was crawled, as a firehose record's is when it was
+    committed. The record's own `createdAt` is whatever its publisher
+    claims, and trusting it would let a backdated record score as old.
+    """
+    return StoredRecord(
+        seq=BACKFILL_SEQ,
+        did=did,
+        collection=collection,
+        rkey=rkey,
+        cid=cid,
+        time=datetime.now(UTC).isoformat(),
+        record=record,
+    )
+
+
+class _Pds:
+    """The clients and request limit shared by every repository on one PDS."""
+
+    def __init__(self, endpoint: str, concurrency: int) -> None:
+        self.endpoint = endpoint
+        self.limiter = anyio.CapacityLimiter(concurrency)
+        self._client: AsyncClient | None = None
+        self._http: httpx.AsyncClient | None = None
+
+    @property
+    def client(self) -> AsyncClient:
+        if self._client is None:
+            self._client = AsyncClient(base_url=f"{self.endpoint}/xrpc")
+        return self._client
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """A plain HTTP client, for streaming responses the XRPC client buffers."""
+        if self._http is None:
+            self._http = httpx.AsyncClient(base_url=self.endpoint, timeout=60.0)
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.request.close()
+        if self._http is not None:
+            await self._http.aclose()
+
+
+class Backfill:
+    """
+    Crawl the given collections of many repositories concurrently.
+
+    Each DID is resolved to its PDS, and every PDS gets its own client, and so
+    its own connection pool, shared by all of its repositories. At most
+    `concurrency` repositories are crawled at once, and at most
+    `per_pds_concurrency` requests are in flight to any one PDS.
+
+    In "records" mode each collection is paged through with `listRecords`.
+    Pages of records are handed to `sink` and then to the checkpoint, so an
+    interrupted crawl picks up from the last page of each collection and
+    skips collections that were finished.
+
+    In "car" mode each repository is fetched once with `getRepo` and its
+    records are pulled out of the export as it streams in (see
+    `RepoRecordExtractor`), which costs one request per repository however
+    many records it has. A repository is checkpointed as a whole once all
+    of its records have gone to `sink`.
+    """
+
+    def __init__(
+        self,
+        collections: Iterable[str],
+        sink: Callable[[list[StoredRecord]], Awaitable[None]],
+        checkpoint: BackfillCheckpoint,
+        concurrency: int = 32,
+        per_pds_concurrency: int = 4,
+        relay_url: str = "https://bsky.network/xrpc",
+        mode: Literal["records", "car"] = "records",
+    ) -> None:
+        self.collections = list(collections)
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.per_pds_concurrency = per_pds_concurrency
+        self.relay_url = relay_url
+        self.mode = mode
+
+        self.resolver = AsyncIdResolver()
+        self._pdses: dict[str, _Pds] = {}
+        self.repos_done = 0
+        self.repos_failed = 0
+
+    def _pds(self, endpoint: str) -> _Pds:
+        endpoint = endpoint.rstrip("/")
+        if endpoint not in self._pdses:
+            self._pdses[endpoint] = _Pds(endpoint, self.per_pds_concurrency)
+        return self._pdses[endpoint]
+
+    async def discover(self, collection: str) -> list[str]:
+        """List every repository the relay knows to hold `collection`."""
+        relay = AsyncClient(base_url=self.relay_url)
+        dids: list[str] = []
+        cursor = None
+        try:
+            while True:
+                response = await relay.com.atproto.sync.list_repos_by_collection(
+                    models.ComAtprotoSyncListReposByCollection.Params(
+                        collection=collection, cursor=cursor, limit=2000
+                    )
+                )
+                dids.extend(repo.did for repo in response.repos)
+                cursor = response.cursor
+                if not cursor or not response.repos:
+                    return dids
+        finally:
+            await relay.request.close()
+
+    async def crawl_collection(self, did: str, collection: str, pds: _Pds) -> None:
+        progress = self.checkpoint.get(did, collection)
+        cursor = progress.cursor
+        while not progress.done:
+            async with pds.limiter:
+                response = await pds.client.com.atproto.repo.list_records(
+                    models.ComAtprotoRepoListRecords.Params(
+                        repo=did, collection=collection, cursor=cursor, limit=PAGE_SIZE
+                    )
+                )
+            records = [
+                stored_record(
+                    did,
+                    collection,
+                    record.uri.rsplit("/", 1)[-1],
+                    record.cid,
+                    _record_value(record.value),
+                )
+                for record in response.records
+            ]
+            await self.sink(records)
+            cursor = response.cursor if response.records else None
+            await self.checkpoint.advance(did, collection, cursor, len(records))
+
+    async def _save_export(
+        self, did: str, collections: list[str], matched: list[MatchedRecord]
+    ) -> None:
+        await self.sink(
+            [stored_record(did, m.collection, m.rkey, m.cid, m.record) for m in matched]
+        )
+        for collection in collections:
+            count = sum(1 for m in matched if m.collection == collection)
+            await self.checkpoint.advance(did, collection, None, count)
+
+    async def export_repo(self, did: str, collections: list[str], pds: _Pds) -> None:
+        """Stream the repository's CAR export and store the wanted records."""
+        async with pds.limiter:
+            async with pds.http.stream(
+                "GET", "/xrpc/com.atproto.sync.getRepo", params={"did": did}
+            ) as response:
+                response.raise_for_status()
+                matched = await aextract_records(response.aiter_bytes(), collections)
+        await self._save_export(did, collections, matched)
+
+    async def ingest_car_file(self, path: Path) -> None:
+        """Store the wanted records from a CAR export saved on disk."""
+        extractor = RepoRecordExtractor(self.collections)
+        matched: list[MatchedRecord] = []
+        for chunk in read_car_file(path):
+            matched.extend(extractor.feed(chunk))
+        extractor.finish()
+        if extractor.did is None:
+            raise ValueError(f"{path} has no repository commit")
+        await self._save_export(extractor.did, self.collections, matched)
+
+    async def crawl_repo(self, did: str) -> None:
+        pending = [c for c in self.collections if not self.checkpoint.get(did, c).done]
+        if not pending:
+            return
+        try:
+            data = await self.resolver.did.resolve_atproto_data(did)
+            pds = self._pds(data.pds)
+            if self.mode == "car":
+                await self.export_repo(did, pending, pds)
+            else:
+                for collection in pending:
+                    await self.crawl_collection(did, collection, pds)
+        except Exception as e:
+            # left unfinished in the checkpoint, so the next run tries again
+            self.repos_failed += 1
+            logger.error(f"Error backfilling {did}: {e}")
+        else:
+            self.repos_done += 1
+
+    async def ingest(self, paths: Iterable[Path]) -> None:
+        """Store the wanted records from CAR exports saved on disk."""
+        for path in paths:
+            try:
+                await self.ingest_car_file(path)
+            except Exception as e:
+                self.repos_failed += 1
+                logger.error(f"Error ingesting {path}: {e}")
+            else:
+                self.repos_done += 1
+        await self.checkpoint.flush()
+        logger.info(
+            f"Ingest finished: {self.repos_done} exports read, "
+            f"{self.repos_failed} failed"
+        )
+
+    async def run(self, dids: Iterable[str] | None = None) -> None:
+        """Crawl `dids`, or every repository the relay lists for our collections."""
+        if dids is None:
+            found: set[str] = set()
+            for collection in self.collections:
+                found.update(await self.discover(collection))
+            dids = sorted(found)
+            logger.info(f"Discovered {len(dids)} repositories")
+
+        limiter = anyio.CapacityLimiter(self.concurrency)
+
+        async def crawl(did: str) -> None:
+            async with limiter:
+                await self.crawl_repo(did)
+
+        try:
+            async with anyio.create_task_group() as tg:
+                for did in dids:
+                    tg.start_soon(crawl, did)
+        finally:
+            for pds in self._pdses.values():
+                await pds.aclose()
+            self._pdses.clear()
+            await self.checkpoint.flush()
+
+        logger.info(
+            f"Backfill finished: {self.repos_done} repositories crawled, "
+            f"{self.repos_failed} failed"
+        )
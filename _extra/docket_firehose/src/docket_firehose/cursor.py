@@ -0,0 +1,134 @@
+"""Durable firehose cursor checkpoints."""
+
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Protocol
+
+import anyio
+from redis.asyncio import Redis
+
+from docket_firehose.metrics import METRICS
+from docket_firehose.replay import FirehoseClient
+from docket_firehose.settings import Settings
+
+logger = logging.getLogger("cursor")
+
+
+class CursorStore(Protocol):
+    """Somewhere to keep the last processed firehose seq."""
+
+    async def load(self) -> int | None: ...
+
+    async def save(self, seq: int) -> None: ...
+
+
+class FileCursorStore:
+    """Keep the cursor in a small file, replaced atomically on every save."""
+
+    def __init__(self, path: anyio.Path) -> None:
+        self.path = path
+
+    async def load(self) -> int | None:
+        try:
+            if await self.path.exists():
+                return int((await self.path.read_text()).strip())
+        except Exception as e:
+            logger.error(f"Error loading cursor from {self.path}: {e}")
+        return None
+
+    async def save(self, seq: int) -> None:
+        await self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        await tmp.write_text(str(seq))
+        await tmp.replace(self.path)
+
+
+class RedisCursorStore:
+    """Keep the cursor under a single Redis key."""
+
+    def __init__(self, url: str, key: str) -> None:
+        self.redis = Redis.from_url(url)
+        self.key = key
+
+    async def load(self) -> int | None:
+        try:
+            value = await self.redis.get(self.key)
+            return int(value) if value is not None else None
+        except Exception as e:
+            logger.error(f"Error loading cursor from Redis key {self.key}: {e}")
+        return None
+
+    async def save(self, seq: int) -> None:
+        await self.redis.set(self.key, seq)
+
+
+def cursor_store_from_settings(settings: Settings) -> CursorStore:
+    """Build the cursor store selected by `settings.cursor_backend`."""
+    if settings.cursor_backend == "redis":
+        return RedisCursorStore(settings.redis_url, settings.cursor_key)
+    return FileCursorStore(settings.cursor_file)
+
+
+class CursorCheckpointer:
+    """
+    Track the last processed seq and persist it in batches.
+
+    `advance` is cheap and meant to be called for every processed event; the
+    store is only written once `flush_every` events have gone by or
+    `flush_interval` seconds have passed since the last flush, whichever comes
+    first. Each flush also updates the client's params so that a reconnect
+    resumes from the checkpoint rather than from the live tip.
+
+    If `sync` is given it is awaited before the cursor is saved, so the
+    checkpoint never gets ahead of the data it covers.
+    """
+
+    def __init__(
+        self,
+        store: CursorStore,
+        client: FirehoseClient,
+        flush_every: int,
+        flush_interval: float,
+        sync: Callable[[], Awaitable[None]] | None = None,
+    ) -> None:
+        self.store = store
+        self.client = client
+        self.sync = sync
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        self.seq: int | None = None
+        self.flushed_seq: int | None = None
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    async def advance(self, seq: int) -> None:
+        """Record `seq` as processed, flushing if a checkpoint is due."""
+        self.seq = seq
+        self._pending += 1
+        if (
+            self._pending >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Persist the latest processed seq, if it changed since the last flush."""
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        if self.seq is None or self.seq == self.flushed_seq:
+            return
+
+        seq = self.seq
+        try:
+            if self.sync is not None:
+                await self.sync()
+            await self.store.save(seq)
+        except Exception as e:
+            METRICS.error("cursor")
+            logger.error(f"Error saving cursor {seq}: {e}")
+            return
+
+        self.flushed_seq = seq
+        self.client.update_params({"cursor": seq})
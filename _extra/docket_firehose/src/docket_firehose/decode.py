@@ -0,0 +1,177 @@
+"""Selective decoding of firehose commits."""
+
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+import libipld
+from atproto import models
+
+_WRITE_ACTIONS = frozenset(["create", "update"])
+
+
+@dataclass(frozen=True, slots=True)
+class MatchedRecord:
+    """A record pulled out of a commit whose collection we are watching."""
+
+    collection: str
+    rkey: str
+    cid: str
+    record: dict
+
+
+@dataclass(slots=True)
+class DecodeTimings:
+    """Seconds spent on each step of decoding one frame."""
+
+    parse: float = 0.0
+    filter: float = 0.0
+    car_decode: float = 0.0
+
+
+def read_varint(data: bytes | memoryview, offset: int) -> tuple[int, int]:
+    """Read an unsigned LEB128 varint, returning (value, new offset)."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def cid_length(data: bytes | memoryview, offset: int) -> int:
+    """Return the byte length of the binary CID starting at `offset`."""
+    # CIDv0 is a bare sha2-256 multihash
+    if data[offset] == 0x12 and data[offset + 1] == 0x20:
+        return 34
+    # CIDv1 with a one-byte codec and a sha2-256 multihash, as atproto uses
+    if (
+        data[offset] == 0x01
+        and data[offset + 1] < 0x80
+        and data[offset + 2] == 0x12
+        and data[offset + 3] == 0x20
+    ):
+        return 36
+
+    start = offset
+    _, offset = read_varint(data, offset)  # version
+    _, offset = read_varint(data, offset)  # codec
+    _, offset = read_varint(data, offset)  # multihash code
+    digest_size, offset = read_varint(data, offset)
+    return offset + digest_size - start
+
+
+def iter_car_blocks(data: bytes) -> Iterator[tuple[bytes, memoryview]]:
+    """
+    Walk the sections of a CAR file without decoding any block.
+
+    Yields the binary CID and a view over the still-encoded DAG-CBOR block, so
+    callers can decide which blocks are worth handing to `libipld`. A header or
+    section running past the end of `data` raises `ValueError`.
+    """
+    view = memoryview(data)
+    header_length, offset = read_varint(view, 0)
+    offset += header_length
+    if offset > len(view):
+        raise ValueError(f"CAR header ends past {len(view)} bytes")
+
+    while offset < len(view):
+        section_length, offset = read_varint(view, offset)
+        end = offset + section_length
+        if end > len(view):
+            raise ValueError(f"CAR section at {offset} ends past {len(view)} bytes")
+        cid_end = offset + cid_length(view, offset)
+        yield bytes(view[offset:cid_end]), view[cid_end:end]
+        offset = end
+
+
+def matching_ops(
+    commit: models.ComAtprotoSyncSubscribeRepos.Commit, record_types: frozenset[str]
+) -> list[models.ComAtprotoSyncSubscribeRepos.RepoOp]:
+    """Return the create/update ops in a commit that touch a watched collection."""
+    return [
+        op
+        for op in commit.ops
+        if op.action in _WRITE_ACTIONS
+        and op.cid is not None
+        and op.path.partition("/")[0] in record_types
+    ]
+
+
+def commit_body_matches(body: dict, record_types: frozenset[str]) -> bool:
+    """
+    Whether a raw `#commit` frame body has records `decode_commit_records` keeps.
+
+    This is the same check `matching_ops` makes, on the body before it is
+    parsed into a model, so frames that don't match can skip parsing.
+    """
+    if not body.get("blocks") or body.get("tooBig"):
+        return False
+    return any(
+        op.get("action") in _WRITE_ACTIONS
+        and op.get("cid") is not None
+        and str(op.get("path", "")).partition("/")[0] in record_types
+        for op in body.get("ops") or ()
+    )
+
+
+def decode_commit_records(
+    commit: models.ComAtprotoSyncSubscribeRepos.Commit,
+    record_types: frozenset[str],
+    timings: DecodeTimings | None = None,
+) -> list[MatchedRecord]:
+    """
+    Decode only the records in a commit that belong to `record_types`.
+
+    The op paths are checked first, so commits that only touch other
+    collections (nearly all `app.bsky.*` traffic) never have their CAR
+    payload read at all. For the rest, only the blocks referenced by a
+    matching op are decoded. If `timings` is given, the time spent on each
+    of those steps is stored in it.
+    """
+    if not commit.blocks or commit.too_big:
+        return []
+
+    start = time.perf_counter()
+    ops = matching_ops(commit, record_types)
+    if timings is not None:
+        timings.filter = time.perf_counter() - start
+    if not ops:
+        return []
+
+    start = time.perf_counter()
+    matched = _decode_blocks(commit, ops, record_types)
+    if timings is not None:
+        timings.car_decode = time.perf_counter() - start
+    return matched
+
+
+def _decode_blocks(
+    commit: models.ComAtprotoSyncSubscribeRepos.Commit,
+    ops: list[models.ComAtprotoSyncSubscribeRepos.RepoOp],
+    record_types: frozenset[str],
+) -> list[MatchedRecord]:
+    """Decode the blocks of a commit's CAR payload that `ops` point at."""
+    wanted = {str(op.cid): op for op in ops}
+    blocks = (
+        commit.blocks if isinstance(commit.blocks, bytes) else commit.blocks.encode()
+    )
+
+    matched: list[MatchedRecord] = []
+    for cid_bytes, block in iter_car_blocks(blocks):
+        op = wanted.pop(libipld.encode_cid(cid_bytes), None)
+        if op is None:
+            continue
+
+        record = libipld.decode_dag_cbor(bytes(block))
+        if isinstance(record, dict) and record.get("$type") in record_types:
+            collection, _, rkey = op.path.partition("/")
+            matched.append(MatchedRecord(collection, rkey, str(op.cid), record))
+
+        if not wanted:
+            break
+
+    return matched
@@ -0,0 +1,278 @@
+"""Record arrival events from the firehose consumer to the worker."""
+
+import logging
+import math
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Self
+
+import anyio
+from anyio.abc import TaskGroup
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from redis.asyncio import Redis
+
+from docket_firehose.metrics import METRICS
+from docket_firehose.settings import Settings
+from docket_firehose.storage import StoredRecord
+
+logger = logging.getLogger("events")
+
+# how long a read waits for events when nothing is pending
+_IDLE_BLOCK_MS = 5000
+
+# the most events taken from the stream in one read
+_READ_COUNT = 1000
+
+
+@dataclass(slots=True)
+class RecordEvent:
+    """A record has been stored and can be read from the record store."""
+
+    did: str
+    collection: str
+    rkey: str
+    seq: int
+
+    @classmethod
+    def from_record(cls, record: StoredRecord) -> "RecordEvent":
+        return cls(record.did, record.collection, record.rkey, record.seq)
+
+    @classmethod
+    def from_fields(cls, fields: dict[bytes, bytes]) -> "RecordEvent":
+        return cls(
+            did=fields[b"did"].decode(),
+            collection=fields[b"collection"].decode(),
+            rkey=fields[b"rkey"].decode(),
+            seq=int(fields[b"seq"]),
+        )
+
+    def to_fields(self) -> dict[str, str | int]:
+        return {
+            "did": self.did,
+            "collection": self.collection,
+            "rkey": self.rkey,
+            "seq": self.seq,
+        }
+
+
+class RecordEventPublisher:
+    """
+    Announce stored records on a Redis stream, trimmed to about `maxlen` events.
+
+    `publish` only queues a batch for a background task and never waits, so
+    a slow or unreachable Redis can't hold up whoever stored the records.
+    Once `queue_size` batches are waiting, further batches are dropped.
+    Events only tell the worker when to look at the record store, which is
+    the source of truth, so dropped events and failed or timed out sends
+    are counted and logged rather than raised: the records are still picked
+    up by the worker's next polling pass.
+    """
+
+    def __init__(
+        self, url: str, stream: str, maxlen: int, queue_size: int, timeout: float
+    ) -> None:
+        self.redis = Redis.from_url(url)
+        self.stream = stream
+        self.maxlen = maxlen
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.dropped = 0
+
+        self._task_group: TaskGroup | None = None
+        self._send: MemoryObjectSendStream[list[StoredRecord]]
+        self._receive: MemoryObjectReceiveStream[list[StoredRecord]]
+
+    async def __aenter__(self) -> Self:
+        self._send, self._receive = anyio.create_memory_object_stream[
+            list[StoredRecord]
+        ](self.queue_size)
+        self._task_group = anyio.create_task_group()
+        await self._task_group.__aenter__()
+        self._task_group.start_soon(self._run)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> bool | None:
+        assert self._task_group is not None
+        # closing the stream lets the sender drain what is left and exit, but
+        # give up on it after one more timeout rather than delay shutdown
+        self._send.close()
+        self._task_group.cancel_scope.deadline = anyio.current_time() + self.timeout
+        try:
+            return await self._task_group.__aexit__(exc_type, exc, tb)
+        finally:
+            await self.redis.aclose()
+            if self.dropped:
+                logger.warning(f"Dropped {self.dropped} record events in total")
+
+    def publish(self, records: list[StoredRecord]) -> None:
+        """Queue events for `records`, dropping them if the queue is full."""
+        if not records:
+            return
+        try:
+            self._send.send_nowait(records)
+        except anyio.WouldBlock:
+            if not self.dropped:
+                logger.warning("Record event queue is full, dropping events")
+            self.dropped += len(records)
+            METRICS.error("events")
+
+    async def _send_events(self, records: list[StoredRecord]) -> None:
+        with anyio.move_on_after(self.timeout) as scope:
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for record in records:
+                        pipe.xadd(
+                            self.stream,
+                            RecordEvent.from_record(record).to_fields(),
+                            maxlen=self.maxlen,
+                            approximate=True,
+                        )
+                    await pipe.execute()
+            except Exception as e:
+                METRICS.error("events")
+                logger.error(f"Error publishing {len(records)} record events: {e}")
+        if scope.cancelled_caught:
+            METRICS.error("events")
+            logger.error(f"Timed out publishing {len(records)} record events")
+
+    async def _run(self) -> None:
+        async with self._receive:
+            async for records in self._receive:
+                # send everything that queued up during the last send at once
+                batch = list(records)
+                while True:
+                    try:
+                        batch.extend(self._receive.receive_nowait())
+                    except (anyio.WouldBlock, anyio.EndOfStream):
+                        break
+                await self._send_events(batch)
+
+
+def record_event_publisher_from_settings(
+    settings: Settings,
+) -> RecordEventPublisher | None:
+    """Build the publisher configured in `settings`, if events are enabled."""
+    if not settings.record_events:
+        return None
+    return RecordEventPublisher(
+        settings.redis_url,
+        settings.record_events_stream,
+        settings.record_events_maxlen,
+        settings.record_events_queue_size,
+        settings.record_events_timeout,
+    )
+
+
+class DidDebouncer:
+    """
+    Decide when the repositories that had events are ready to process.
+
+    A DID is due `debounce` seconds after its latest event, so a burst of
+    writes to one repository is processed once, at the end of the burst. A
+    repository that never goes quiet is still due `max_delay` seconds after
+    its first pending event.
+    """
+
+    def __init__(self, debounce: float, max_delay: float) -> None:
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending: dict[str, tuple[float, float]] = {}  # did -> (first, latest)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _due_at(self, first: float, latest: float) -> float:
+        return min(latest + self.debounce, first + self.max_delay)
+
+    def add(self, did: str, now: float) -> None:
+        first, _ = self._pending.get(did, (now, now))
+        self._pending[did] = (first, now)
+
+    def next_due(self) -> float | None:
+        """When the next DID becomes due, or None if nothing is pending."""
+        return min(
+            (self._due_at(*times) for times in self._pending.values()), default=None
+        )
+
+    def take_due(self, now: float) -> list[str]:
+        """Remove and return the DIDs that are due at `now`."""
+        due = [
+            did for did, times in self._pending.items() if self._due_at(*times) <= now
+        ]
+        for did in due:
+            del self._pending[did]
+        return due
+
+
+async def latest_event_id(redis_url: str, stream: str) -> bytes | str:
+    """The ID of the newest event in `stream`, or "0" if it is empty."""
+    redis = Redis.from_url(redis_url)
+    try:
+        entries = await redis.xrevrange(stream, count=1)
+    finally:
+        await redis.aclose()
+    return entries[0][0] if entries else "0"
+
+
+async def listen_for_record_events(
+    redis_url: str,
+    stream: str,
+    on_batch: Callable[[list[str]], Awaitable[None]],
+    debounce: float,
+    max_delay: float,
+    after: bytes | str = "$",
+) -> None:
+    """
+    Read record events forever, calling `on_batch` with each batch of due DIDs.
+
+    Only events published after the event ID `after` are read, by default
+    those published after the listener starts. Records stored before then
+    are left to a catch-up pass by the caller, which should take `after`
+    from `latest_event_id` before starting it so no event falls in between.
+    """
+    redis = Redis.from_url(redis_url)
+    debouncer = DidDebouncer(debounce, max_delay)
+    METRICS.track_queue("events", lambda: len(debouncer))
+    last_id = after
+    try:
+        while True:
+            now = time.monotonic()
+            if dids := debouncer.take_due(now):
+                await on_batch(dids)
+                continue
+
+            due = debouncer.next_due()
+            # XREAD treats a block of 0 as forever, so always wait at least 1ms
+            block = (
+                max(1, math.ceil((due - now) * 1000))
+                if due is not None
+                else _IDLE_BLOCK_MS
+            )
+            try:
+                response = await redis.xread(
+                    {stream: last_id}, count=_READ_COUNT, block=block
+                )
+            except Exception as e:
+                METRICS.error("events")
+                logger.error(f"Error reading record events from {stream}: {e}")
+                await anyio.sleep(1)
+                continue
+
+            for _, entries in response or []:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    try:
+                        event = RecordEvent.from_fields(fields)
+                    except (KeyError, ValueError) as e:
+                        logger.error(f"Skipping malformed record event {entry_id}: {e}")
+                        continue
+                    debouncer.add(event.did, time.monotonic())
+    finally:
+        await redis.aclose()
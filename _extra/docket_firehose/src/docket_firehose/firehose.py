@@ -2,12 +2,17 @@
 
 import anyio
 
+from docket_firehose.metrics import metrics_exporter_from_settings
+from docket_firehose.settings import Settings
 from docket_firehose.tasks.firehose import consume_firehose
 
+settings = Settings()
+
 
 async def main(record_types: frozenset[str] = frozenset(["app.mcp.server"])) -> None:
-    """Run the firehose consumer."""
-    await consume_firehose(record_types)
+    """Run the firehose consumer, exporting its metrics while it runs."""
+    async with metrics_exporter_from_settings(settings, "firehose"):
+        await consume_firehose(record_types)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+"""Prometheus metrics for the firehose consumer and worker."""
+
+import logging
+import time
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Callable, Iterator
+from datetime import UTC, datetime
+from types import TracebackType
+from typing import Self
+
+import anyio
+from anyio.abc import TaskGroup
+from prometheus_client import CollectorRegistry, start_http_server, write_to_textfile
+from prometheus_client.core import (
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    HistogramMetricFamily,
+    Metric,
+)
+
+from docket_firehose.decode import MatchedRecord
+from docket_firehose.settings import Settings
+
+logger = logging.getLogger("metrics")
+
+#: upper bounds of the stage timing buckets, in seconds
+BUCKETS = (
+    0.00001,
+    0.00003,
+    0.0001,
+    0.0003,
+    0.001,
+    0.003,
+    0.01,
+    0.03,
+    0.1,
+    0.3,
+    1.0,
+    3.0,
+    10.0,
+    30.0,
+)
+
+#: the timed stages: parsing a frame, choosing the ops of watched
+#: collections, decoding their CAR blocks, writing records and a processing pass
+STAGES = ("parse", "filter", "car_decode", "write", "process")
+
+
+class StageHistogram:
+    """Bucketed timings of one stage, cheap enough to update for every frame."""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        buckets: list[tuple[str, int]] = []
+        total = 0
+        for bound, count in zip((*map(str, BUCKETS), "+Inf"), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+
+class Metrics:
+    """
+    The counters, stage timings and gauges of one process.
+
+    Updates are plain attribute writes rather than `prometheus_client`
+    metrics, which take a lock on every update. Prometheus reads them through
+    `collect` when it scrapes, so gauges such as consumer lag and queue
+    depths are only computed then.
+    """
+
+    def __init__(self) -> None:
+        self.frames = 0
+        self.commits = 0
+        self.matched: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.records_processed = 0
+        self.stages = {stage: StageHistogram() for stage in STAGES}
+        self.last_commit_time: str | None = None
+        self.queues: dict[str, Callable[[], int]] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self.stages[stage].observe(seconds)
+
+    def error(self, stage: str) -> None:
+        self.errors[stage] += 1
+
+    def track_queue(self, name: str, depth: Callable[[], int]) -> None:
+        """Report `depth()` as the depth of queue `name` on every scrape."""
+        self.queues[name] = depth
+
+    @property
+    def lag_seconds(self) -> float | None:
+        """Wall clock time minus the time of the latest commit seen."""
+        if self.last_commit_time is None:
+            return None
+        try:
+            commit_time = datetime.fromisoformat(self.last_commit_time)
+        except ValueError:
+            return None
+        if commit_time.tzinfo is None:
+            commit_time = commit_time.replace(tzinfo=UTC)
+        return (datetime.now(UTC) - commit_time).total_seconds()
+
+    def collect(self) -> Iterator[Metric]:
+        yield CounterMetricFamily(
+            "firehose_frames", "Frames received from the relay", value=self.frames
+        )
+        yield CounterMetricFamily(
+            "firehose_commits", "Commit events received", value=self.commits
+        )
+
+        matched = CounterMetricFamily(
+            "firehose_matched_records",
+            "Records of watched collections found in commits",
+            labels=["collection"],
+        )
+        for collection, count in self.matched.items():
+            matched.add_metric([collection], count)
+        yield matched
+
+        errors = CounterMetricFamily(
+            "firehose_errors", "Errors by where they happened", labels=["stage"]
+        )
+        for stage, count in self.errors.items():
+            errors.add_metric([stage], count)
+        yield errors
+
+        yield CounterMetricFamily(
+            "reputation_records_processed",
+            "Stored records folded into reputation scores",
+            value=self.records_processed,
+        )
+
+        stages = HistogramMetricFamily(
+            "firehose_stage_seconds",
+            "Time spent per item in each stage",
+            labels=["stage"],
+        )
+        for stage, histogram in self.stages.items():
+            stages.add_metric([stage], histogram.cumulative(), histogram.sum)
+        yield stages
+
+        if (lag := self.lag_seconds) is not None:
+            yield GaugeMetricFamily(
+                "firehose_lag_seconds",
+                "Wall clock time minus the time of the latest commit",
+                value=lag,
+            )
+
+        queues = GaugeMetricFamily(
+            "firehose_queue_depth", "Items waiting in each queue", labels=["queue"]
+        )
+        for name, depth in self.queues.items():
+            try:
+                queues.add_metric([name], depth())
+            except Exception:
+                continue
+        yield queues
+
+
+#: the metrics of this process
+METRICS = Metrics()
+
+REGISTRY = CollectorRegistry()
+REGISTRY.register(METRICS)
+
+
+async def dump_metrics(path: anyio.Path) -> None:
+    """Write the current metrics to `path` in the Prometheus text format."""
+    await path.parent.mkdir(parents=True, exist_ok=True)
+    await anyio.to_thread.run_sync(write_to_textfile, str(path), REGISTRY)
+
+
+class MetricsExporter:
+    """
+    Serve the metrics over HTTP and write them to a file while running.
+
+    The HTTP endpoint listens on `port` unless it is 0. The file, if given,
+    is rewritten every `interval` seconds and once more on exit.
+    """
+
+    def __init__(self, port: int, path: anyio.Path | None, interval: float) -> None:
+        self.port = port
+        self.path = path
+        self.interval = interval
+        self._server = None
+        self._task_group: TaskGroup | None = None
+
+    async def __aenter__(self) -> Self:
+        if self.port:
+            self._server, _ = start_http_server(self.port, registry=REGISTRY)
+            logger.info(f"Serving metrics on port {self.port}")
+        self._task_group = anyio.create_task_group()
+        await self._task_group.__aenter__()
+        if self.path is not None:
+            self._task_group.start_soon(self._dump_periodically, self.path)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> bool | None:
+        assert self._task_group is not None
+        self._task_group.cancel_scope.cancel()
+        try:
+            return await self._task_group.__aexit__(exc_type, exc, tb)
+        finally:
+            if self.path is not None:
+                with anyio.CancelScope(shield=True):
+                    await dump_metrics(self.path)
+            if self._server is not None:
+                self._server.shutdown()
+
+    async def _dump_periodically(self, path: anyio.Path) -> None:
+        while True:
+            await anyio.sleep(self.interval)
+            try:
+                await dump_metrics(path)
+            except Exception as e:
+                logger.error(f"Error writing metrics to {path}: {e}")
+
+
+def metrics_exporter_from_settings(settings: Settings, name: str) -> MetricsExporter:
+    """Build the exporter for the process `name`, e.g. "firehose" or "worker"."""
+    return MetricsExporter(
+        settings.metrics_port,
+        settings.metrics_dir / f"{name}.prom" if settings.metrics_dir else None,
+        settings.metrics_interval,
+    )
+
+
+class SavedRecordLog:
+    """
+    Log saved records as a periodic summary instead of a line per record.
+
+    Each summary counts the records saved per collection since the last one
+    and names one of them as an example.
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float) -> None:
+        self.logger = logger
+        self.interval = interval
+        self.counts: Counter[str] = Counter()
+        self.example: str | None = None
+        self._since = time.monotonic()
+
+    def add(self, matched: list[MatchedRecord]) -> None:
+        for match in matched:
+            self.counts[match.collection] += 1
+        if self.example is None and matched:
+            self.example = str(matched[0].record.get("name", "unknown"))
+        if time.monotonic() - self._since >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Log what was saved since the last summary, if anything."""
+        now = time.monotonic()
+        if self.counts:
+            counts = ", ".join(f"{n} {c}" for c, n in self.counts.most_common())
+            self.logger.info(
+                f"Saved {counts} in the last {now - self._since:.0f}s "
+                f"(e.g. {self.example})"
+            )
+        self.counts.clear()
+        self.example = None
+        self._since = now
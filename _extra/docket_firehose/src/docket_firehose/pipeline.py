@@ -0,0 +1,260 @@
+"""Multi-process decode pipeline for the firehose consumer."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from types import TracebackType
+from typing import Self
+
+import anyio
+from anyio.abc import TaskGroup
+from atproto import models, parse_subscribe_repos_message
+from atproto_firehose.models import MessageFrame
+
+from docket_firehose.decode import (
+    DecodeTimings,
+    MatchedRecord,
+    commit_body_matches,
+    decode_commit_records,
+)
+from docket_firehose.metrics import METRICS
+
+logger = logging.getLogger("pipeline")
+
+
+@dataclass(slots=True)
+class DecodedFrame:
+    """The result of decoding one frame in a worker process."""
+
+    seq: int | None
+    repo: str | None = None
+    time: str | None = None
+    records: list[MatchedRecord] = field(default_factory=list)
+    timings: DecodeTimings = field(default_factory=DecodeTimings)
+    error: str | None = None  # why the frame couldn't be decoded
+
+
+def decode_frame(message: MessageFrame, record_types: frozenset[str]) -> DecodedFrame:
+    """Parse a frame and decode any watched records. Runs in a worker process."""
+    timings = DecodeTimings()
+    start = time.perf_counter()
+    parsed = parse_subscribe_repos_message(message)
+    timings.parse = time.perf_counter() - start
+    seq = getattr(parsed, "seq", None)
+    if not isinstance(parsed, models.ComAtprotoSyncSubscribeRepos.Commit):
+        return DecodedFrame(seq=seq, timings=timings)
+
+    return DecodedFrame(
+        seq=seq,
+        repo=parsed.repo,
+        time=parsed.time,
+        records=decode_commit_records(parsed, record_types, timings),
+        timings=timings,
+    )
+
+
+def decode_frames(
+    messages: list[MessageFrame], record_types: frozenset[str]
+) -> list[DecodedFrame]:
+    """Decode a batch of frames in a worker process, keeping errors per frame."""
+    decoded = []
+    for message in messages:
+        try:
+            decoded.append(decode_frame(message, record_types))
+        except Exception as e:
+            decoded.append(DecodedFrame(seq=message.body.get("seq"), error=f"{e!r}"))
+    return decoded
+
+
+def skip_decoding(
+    message: MessageFrame, record_types: frozenset[str]
+) -> DecodedFrame | None:
+    """
+    Describe a frame without parsing it if it has no watched records.
+
+    Returns None for the frames that do need `decode_frame`.
+    """
+    start = time.perf_counter()
+    body = message.body
+    if message.type != "#commit":
+        return DecodedFrame(seq=body.get("seq"))
+    if commit_body_matches(body, record_types):
+        return None
+    return DecodedFrame(
+        seq=body.get("seq"),
+        repo=body.get("repo"),
+        time=body.get("time"),
+        timings=DecodeTimings(filter=time.perf_counter() - start),
+    )
+
+
+@dataclass(slots=True)
+class _Pending:
+    """A frame waiting for the pool to decode it."""
+
+    message: MessageFrame | None
+    decoded: DecodedFrame | None = None
+
+
+class DecodePipeline:
+    """
+    Decode firehose frames in a process pool while committing results in order.
+
+    Most frames have no watched records, and checking a frame's op paths
+    without parsing it is far cheaper than a round trip to a worker, so
+    `submit` checks every frame itself and only frames with watched records
+    are sent to the pool. While none of those are being decoded, the other
+    frames are handed straight to `on_frame`. Otherwise they wait behind the
+    frames being decoded, and `submit` blocks once `queue_size` frames are
+    waiting, so a slow pipeline pushes back on the reader instead of
+    buffering without bound.
+
+    Frames to decode are sent to the pool in batches, at most one per worker
+    at a time. A frame that arrives while every worker is busy joins the next
+    batch, so batches grow with the load and a lone frame is sent right away.
+
+    Because results are committed strictly in arrival order, `committed_seq`
+    is always the highest seq for which every earlier frame has also been
+    committed, which makes it safe to resume from. The exception is a frame
+    that fails to decode: it is logged, counted in `dropped` and the decode
+    error metric, and skipped, so the cursor moves past it with the next
+    frame, as it does when decoding inline. Decoding the same bytes again
+    after a restart would fail the same way.
+    """
+
+    def __init__(
+        self,
+        record_types: frozenset[str],
+        on_frame: Callable[[DecodedFrame], Awaitable[None]],
+        workers: int,
+        queue_size: int,
+    ) -> None:
+        self.record_types = record_types
+        self.on_frame = on_frame
+        self.workers = workers
+        self.queue_size = queue_size
+        self.committed_seq: int | None = None
+        self.dropped = 0
+
+        self._pool: ProcessPoolExecutor | None = None
+        self._task_group: TaskGroup | None = None
+        # frames in arrival order, from the oldest one not yet committed
+        self._waiting: deque[DecodedFrame | _Pending] = deque()
+        self._next_batch: list[_Pending] = []
+        self._batches_in_pool = 0
+        self._committing = False
+        self._committed = anyio.Event()
+
+    async def __aenter__(self) -> Self:
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._task_group = anyio.create_task_group()
+        await self._task_group.__aenter__()
+        logger.info(f"Decode pipeline started with {self.workers} workers")
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> bool | None:
+        assert self._task_group is not None and self._pool is not None
+        # each batch sends the next one when it is done, so waiting for the
+        # batches in the pool drains everything submitted
+        try:
+            return await self._task_group.__aexit__(exc_type, exc, tb)
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            logger.info(
+                f"Decode pipeline stopped at seq {self.committed_seq}"
+                + (f", {self.dropped} frames failed to decode" if self.dropped else "")
+            )
+
+    @property
+    def queue_depth(self) -> int:
+        """Frames waiting to be committed."""
+        return len(self._waiting)
+
+    async def submit(self, message: MessageFrame) -> None:
+        """Commit or queue a raw frame, waiting if the queue is full."""
+        decoded = skip_decoding(message, self.record_types)
+        while True:
+            if decoded is not None and not self._waiting and not self._committing:
+                # nothing is ahead of it, so it can be committed right away
+                await self._commit(decoded)
+                return
+            if len(self._waiting) < self.queue_size:
+                break
+            await self._committed.wait()
+
+        # whatever is ahead of it commits it: a frame being decoded commits
+        # the frames behind it once it's done, and so does a commit under way
+        if decoded is not None:
+            self._waiting.append(decoded)
+        else:
+            pending = _Pending(message)
+            self._waiting.append(pending)
+            self._next_batch.append(pending)
+            self._send_batch()
+
+    def _send_batch(self) -> None:
+        if self._next_batch and self._batches_in_pool < self.workers:
+            assert self._task_group is not None
+            self._batches_in_pool += 1
+            self._task_group.start_soon(self._decode, self._next_batch)
+            self._next_batch = []
+
+    async def _decode(self, batch: list[_Pending]) -> None:
+        loop = asyncio.get_running_loop()
+        messages = [pending.message for pending in batch]
+        try:
+            results = await loop.run_in_executor(
+                self._pool, decode_frames, messages, self.record_types
+            )
+        except Exception as e:
+            # the whole batch is lost, e.g. because a worker died
+            results = [
+                DecodedFrame(message.body.get("seq"), error=f"{e!r}")
+                for message in messages
+            ]
+        for pending, decoded in zip(batch, results):
+            pending.message, pending.decoded = None, decoded
+
+        self._batches_in_pool -= 1
+        self._send_batch()
+        await self._commit_ready()
+
+    async def _commit_ready(self) -> None:
+        """Commit waiting frames, oldest first, up to one not yet decoded."""
+        # a single caller at a time keeps the commits in order
+        if self._committing:
+            return
+        self._committing = True
+        try:
+            while self._waiting:
+                head = self._waiting[0]
+                decoded = head.decoded if isinstance(head, _Pending) else head
+                if decoded is None:
+                    break
+                self._waiting.popleft()
+                await self._commit(decoded)
+        finally:
+            self._committing = False
+            self._committed.set()
+            self._committed = anyio.Event()
+
+    async def _commit(self, decoded: DecodedFrame) -> None:
+        if decoded.error is not None:
+            self.dropped += 1
+            METRICS.error("decode")
+            logger.error(
+                f"Skipping frame {decoded.seq}, which failed to decode: {decoded.error}"
+            )
+            return
+        await self.on_frame(decoded)
+        if decoded.seq is not None:
+            self.committed_seq = decoded.seq
@@ -0,0 +1,68 @@
+"""Entry point for processing saved records outside of the worker."""
+
+import argparse
+from functools import partial
+
+import anyio
+
+from docket_firehose.logging import setup_logging
+from docket_firehose.reputation import partitioned_reputation_from_settings
+from docket_firehose.settings import Settings
+from docket_firehose.tasks.process import process_saved_records
+
+settings = Settings()
+
+
+async def main(
+    record_type: str,
+    full_rebuild: bool = False,
+    recompute_scores: bool = False,
+    partition: int | None = None,
+) -> None:
+    """Process saved records once, in one partition or all of them."""
+    setup_logging()
+    await process_saved_records(
+        record_type,
+        full_rebuild=full_rebuild,
+        partitions=[partition] if partition is not None else None,
+    )
+
+    if recompute_scores:
+        reputation = partitioned_reputation_from_settings(settings)
+        try:
+            await reputation.recompute_scores()
+        finally:
+            await reputation.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process saved firehose records")
+    parser.add_argument(
+        "--record-type", default=settings.record_type, help="Record type to process"
+    )
+    parser.add_argument(
+        "--full-rebuild",
+        action="store_true",
+        help="Ignore the watermark and recompute reputation from all stored records",
+    )
+    parser.add_argument(
+        "--recompute-scores",
+        action="store_true",
+        help="Recompute every stored score, e.g. after changing scoring settings",
+    )
+    parser.add_argument(
+        "--partition",
+        type=int,
+        choices=range(settings.reputation_partitions),
+        help="Only process this reputation partition (default: all of them)",
+    )
+    args = parser.parse_args()
+    anyio.run(
+        partial(
+            main,
+            args.record_type,
+            args.full_rebuild,
+            args.recompute_scores,
+            args.partition,
+        )
+    )
@@ -0,0 +1,176 @@
+"""Record raw firehose frames and replay them without a relay."""
+
+import logging
+import struct
+import time
+from collections.abc import Awaitable, Callable, Iterable, Iterator
+from pathlib import Path
+from typing import Any, Protocol
+from urllib.parse import urlencode
+
+import anyio
+import anyio.lowlevel
+from atproto_firehose.models import Frame, MessageFrame
+from websockets.client import connect
+
+logger = logging.getLogger("replay")
+
+RELAY_URI = "wss://bsky.network/xrpc/com.atproto.sync.subscribeRepos"
+
+# each frame is a 4-byte big-endian length followed by the raw websocket payload
+_LENGTH = struct.Struct(">I")
+_MAX_FRAME_BYTES = 5 * 1024 * 1024
+
+OnMessage = Callable[[MessageFrame], Awaitable[None]]
+OnError = Callable[[BaseException], Awaitable[None]]
+
+
+class FirehoseClient(Protocol):
+    """The parts of `AsyncFirehoseSubscribeReposClient` the consumer relies on."""
+
+    async def start(
+        self, on_message_callback: OnMessage, on_callback_error_callback: OnError
+    ) -> None: ...
+
+    async def stop(self) -> None: ...
+
+    def update_params(self, params: dict[str, Any]) -> None: ...
+
+
+def read_frames(path: Path) -> Iterator[bytes]:
+    """Read raw frames from a recording."""
+    data = path.read_bytes()
+    offset = 0
+    while offset + _LENGTH.size <= len(data):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        offset += _LENGTH.size
+        if offset + length > len(data):
+            logger.warning(f"Ignoring truncated frame at {path}:{offset}")
+            return
+        yield data[offset : offset + length]
+        offset += length
+
+
+def write_frames(path: Path, frames: Iterable[bytes], append: bool = False) -> None:
+    """Write raw frames to a recording."""
+    with path.open("ab" if append else "wb") as f:
+        for frame in frames:
+            f.write(_LENGTH.pack(len(frame)))
+            f.write(frame)
+
+
+async def record_frames(
+    path: anyio.Path,
+    max_frames: int | None = None,
+    max_seconds: float | None = None,
+    cursor: int | None = None,
+    uri: str = RELAY_URI,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Capture raw frames from the relay into `path` until a limit is reached.
+
+    Frames are stored exactly as they came off the websocket, so a recording
+    exercises the same decoding as the live consumer. Returns the number of
+    frames written.
+    """
+    path = anyio.Path(path)
+    await path.parent.mkdir(parents=True, exist_ok=True)
+    await path.write_bytes(b"")
+    if cursor is not None:
+        uri = f"{uri}?{urlencode({'cursor': cursor})}"
+
+    count = 0
+    batch: list[bytes] = []
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    logger.info(f"Recording frames from {uri} to {path}")
+    async with connect(uri, max_size=_MAX_FRAME_BYTES) as websocket:
+        while max_frames is None or count < max_frames:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            frame = await websocket.recv()
+            if isinstance(frame, str):
+                continue
+            batch.append(frame)
+            count += 1
+            if len(batch) >= batch_size:
+                await anyio.to_thread.run_sync(write_frames, Path(path), batch, True)
+                batch = []
+
+    if batch:
+        await anyio.to_thread.run_sync(write_frames, Path(path), batch, True)
+    logger.info(f"Recorded {count} frames")
+    return count
+
+
+class ReplayClient:
+    """
+    A stand-in for the firehose client that plays back recorded frames.
+
+    Frames are delivered as fast as the handler takes them, or at `rate`
+    frames per second if given. A `cursor` param skips frames up to and
+    including that seq, as the relay would. The time the handler spends on
+    each frame is kept in `latencies`.
+    """
+
+    def __init__(
+        self,
+        frames: Iterable[bytes],
+        rate: float | None = None,
+        params: dict[str, Any] | None = None,
+    ) -> None:
+        self.frames = frames
+        self.rate = rate
+        self.params = dict(params or {})
+        self.delivered = 0
+        self.latencies: list[float] = []
+        self._stopped = False
+
+    @classmethod
+    def from_file(cls, path: Path, **kwargs: Any) -> "ReplayClient":
+        return cls(read_frames(path), **kwargs)
+
+    def update_params(self, params: dict[str, Any]) -> None:
+        self.params = dict(params)
+
+    async def stop(self) -> None:
+        self._stopped = True
+
+    async def start(
+        self,
+        on_message_callback: OnMessage,
+        on_callback_error_callback: OnError | None = None,
+    ) -> None:
+        cursor = self.params.get("cursor")
+        started = time.perf_counter()
+        for raw in self.frames:
+            if self._stopped:
+                break
+            try:
+                frame = Frame.from_bytes(raw)
+            except Exception as e:
+                logger.error(f"Skipping undecodable frame: {e}")
+                continue
+            if not isinstance(frame, MessageFrame):
+                continue
+            if cursor is not None and frame.body.get("seq", cursor + 1) <= cursor:
+                continue
+
+            if self.rate:
+                delay = started + self.delivered / self.rate - time.perf_counter()
+                if delay > 0:
+                    await anyio.sleep(delay)
+            else:
+                # let other tasks run between frames, as a websocket read would
+                await anyio.lowlevel.checkpoint()
+
+            handled = time.perf_counter()
+            try:
+                await on_message_callback(frame)
+            except Exception as e:
+                if on_callback_error_callback is not None:
+                    await on_callback_error_callback(e)
+                else:
+                    logger.error(f"Error handling frame: {e}", exc_info=True)
+            self.latencies.append(time.perf_counter() - handled)
+            self.delivered += 1
@@ -0,0 +1,356 @@
+"""SQLite storage for server reputation data."""
+
+import heapq
+import sqlite3
+import zlib
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from functools import partial
+from pathlib import Path
+from typing import Any, TypeVar
+
+import anyio
+
+from docket_firehose.settings import Settings
+from docket_firehose.storage import Position
+from docket_firehose.utils import US_PER_DAY
+
+T = TypeVar("T")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS servers (
+    did TEXT NOT NULL,
+    rkey TEXT NOT NULL,
+    name TEXT NOT NULL,
+    first_seen INTEGER NOT NULL,  -- epoch microseconds
+    last_seen INTEGER NOT NULL,  -- epoch microseconds
+    reputation_score REAL NOT NULL,
+    PRIMARY KEY (did, rkey)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS servers_reputation_score ON servers (reputation_score);
+CREATE INDEX IF NOT EXISTS servers_last_seen ON servers (last_seen);
+CREATE TABLE IF NOT EXISTS log_watermarks (
+    record_type TEXT NOT NULL,
+    log TEXT NOT NULL,  -- '' for the main log
+    segment TEXT NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    PRIMARY KEY (record_type, log)
+) WITHOUT ROWID;
+"""
+
+
+def longevity_score(
+    first_seen: int,
+    last_seen: int,
+    base_score: float,
+    max_age_score: float,
+    max_age_days: int,
+) -> float:
+    """
+    Calculate a 0-1 score based on server longevity, from epoch-microsecond
+    timestamps:
+    - A base score for being registered
+    - Up to max_age_score more based on age in whole days (max at max_age_days)
+
+    This is the one implementation of the formula. The processor calls it,
+    and it is registered as the SQL function `longevity_score(first_seen,
+    last_seen)`, since SQLite's ROUND and integer division don't agree with
+    Python's `round` and `//`.
+    """
+    age_days = (last_seen - first_seen) // US_PER_DAY
+    age_score = min(max_age_score, (age_days / max_age_days) * max_age_score)
+    return round(base_score + age_score, 3)
+
+
+_UPSERT = """
+INSERT INTO servers (did, rkey, name, first_seen, last_seen, reputation_score)
+VALUES (:did, :rkey, :name, :first_seen, :last_seen, :reputation_score)
+ON CONFLICT (did, rkey) DO UPDATE SET
+    name = excluded.name,
+    first_seen = excluded.first_seen,
+    last_seen = excluded.last_seen,
+    reputation_score = excluded.reputation_score
+"""
+
+
+@dataclass(slots=True)
+class ServerObservation:
+    """What one processing pass saw of a server."""
+
+    did: str
+    rkey: str
+    name: str
+    first_seen: int  # epoch microseconds
+    last_seen: int  # epoch microseconds
+
+
+@dataclass(slots=True)
+class ServerReputation:
+    """A server's stored reputation."""
+
+    did: str
+    rkey: str
+    name: str
+    first_seen: int
+    last_seen: int
+    reputation_score: float
+
+
+class ReputationStore:
+    """
+    Reputation data in a SQLite database in WAL mode.
+
+    Servers are keyed by (did, rkey). Each processing pass reads the servers
+    it touched, merges and scores them, then writes them back along with the
+    log position it reached in one transaction, so scores and watermark can
+    never disagree. Calls run in a worker thread one at a time.
+    """
+
+    def __init__(
+        self,
+        path: anyio.Path,
+        base_score: float,
+        max_age_score: float,
+        max_age_days: int,
+    ) -> None:
+        self.path = Path(path)
+        self.score_params = {
+            "base_score": base_score,
+            "max_age_score": max_age_score,
+            "max_age_days": max_age_days,
+        }
+        self._limiter = anyio.CapacityLimiter(1)
+        self._connection: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.create_function(
+                "longevity_score",
+                2,
+                partial(longevity_score, **self.score_params),
+                deterministic=True,
+            )
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        return await anyio.to_thread.run_sync(fn, *args, limiter=self._limiter)
+
+    def _get_watermark(self, record_type: str) -> Position | None:
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT log, segment, byte_offset FROM log_watermarks "
+                "WHERE record_type = ? ORDER BY log",
+                (record_type,),
+            )
+            .fetchall()
+        )
+        return tuple(rows) or None
+
+    def _get_many(
+        self, keys: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], ServerReputation]:
+        connection = self._connect()
+        found: dict[tuple[str, str], ServerReputation] = {}
+        for did, rkey in keys:
+            row = connection.execute(
+                "SELECT did, rkey, name, first_seen, last_seen, reputation_score "
+                "FROM servers WHERE did = ? AND rkey = ?",
+                (did, rkey),
+            ).fetchone()
+            if row:
+                found[(did, rkey)] = ServerReputation(*row)
+        return found
+
+    def _upsert(
+        self,
+        servers: list[ServerReputation],
+        record_type: str,
+        position: Position | None,
+        previous: Position | None,
+    ) -> bool:
+        connection = self._connect()
+        with connection:
+            # hold the write lock from the check to the commit
+            connection.execute("BEGIN IMMEDIATE")
+            if self._get_watermark(record_type) != previous:
+                return False
+            connection.executemany(_UPSERT, map(asdict, servers))
+            if position is not None:
+                connection.execute(
+                    "DELETE FROM log_watermarks WHERE record_type = ?", (record_type,)
+                )
+                connection.executemany(
+                    "INSERT INTO log_watermarks (record_type, log, segment, "
+                    "byte_offset) VALUES (?, ?, ?, ?)",
+                    [(record_type, *reached) for reached in position],
+                )
+        return True
+
+    def _recompute_scores(self) -> None:
+        connection = self._connect()
+        with connection:
+            connection.execute(
+                "UPDATE servers SET reputation_score = "
+                "longevity_score(first_seen, last_seen)"
+            )
+
+    def _clear(self) -> None:
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM servers")
+            connection.execute("DELETE FROM log_watermarks")
+
+    def _top(self, limit: int) -> list[ServerReputation]:
+        rows = (
+            self._connect()
+            .execute(
+                "SELECT did, rkey, name, first_seen, last_seen, reputation_score "
+                "FROM servers ORDER BY reputation_score DESC LIMIT ?",
+                (limit,),
+            )
+            .fetchall()
+        )
+        return [ServerReputation(*row) for row in rows]
+
+    def _close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    async def get_watermark(self, record_type: str) -> Position | None:
+        """Return the log position processing of `record_type` stopped at."""
+        return await self._run(self._get_watermark, record_type)
+
+    async def get_many(
+        self, keys: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], ServerReputation]:
+        """Return the stored servers among `keys`, by (did, rkey)."""
+        return await self._run(self._get_many, keys)
+
+    async def upsert(
+        self,
+        servers: list[ServerReputation],
+        record_type: str,
+        position: Position | None,
+        previous: Position | None,
+    ) -> bool:
+        """
+        Write servers and move the watermark from `previous` in one transaction.
+
+        Returns False without writing anything if the watermark is no longer
+        `previous`, i.e. another pass over the same records finished first.
+        """
+        return await self._run(self._upsert, servers, record_type, position, previous)
+
+    async def recompute_scores(self) -> None:
+        """Recompute every stored score in SQL, e.g. after scoring settings change."""
+        await self._run(self._recompute_scores)
+
+    async def clear(self) -> None:
+        """Drop all servers and watermarks."""
+        await self._run(self._clear)
+
+    async def top(self, limit: int = 100) -> list[ServerReputation]:
+        """Return the highest-scoring servers."""
+        return await self._run(self._top, limit)
+
+    async def aclose(self) -> None:
+        await self._run(self._close)
+
+
+def partition_for(did: str, partitions: int) -> int:
+    """The partition that owns a DID's servers, the same in every process."""
+    return zlib.crc32(did.encode()) % partitions
+
+
+def partition_path(path: anyio.Path, partition: int, partitions: int) -> anyio.Path:
+    """
+    The database of one partition.
+
+    A single partition keeps the plain `path`. Otherwise the partition count
+    is part of the name, so changing it starts new databases, which have no
+    watermark and so are rebuilt from the stored records.
+    """
+    if partitions == 1:
+        return path
+    return path.with_name(f"{path.stem}.{partition}-of-{partitions}{path.suffix}")
+
+
+class PartitionedReputation:
+    """
+    One view over the reputation stores of every partition.
+
+    Each DID belongs to exactly one partition, so no server is ever in two
+    stores and every read can be answered by routing keys to their owners or
+    by merging per-partition results.
+    """
+
+    def __init__(self, stores: list[ReputationStore]) -> None:
+        self.stores = stores
+
+    def store_for(self, did: str) -> ReputationStore:
+        return self.stores[partition_for(did, len(self.stores))]
+
+    async def get_many(
+        self, keys: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], ServerReputation]:
+        """Return the stored servers among `keys`, by (did, rkey)."""
+        by_partition: dict[int, list[tuple[str, str]]] = {}
+        for key in keys:
+            by_partition.setdefault(partition_for(key[0], len(self.stores)), []).append(
+                key
+            )
+        found: dict[tuple[str, str], ServerReputation] = {}
+        for partition, partition_keys in by_partition.items():
+            found.update(await self.stores[partition].get_many(partition_keys))
+        return found
+
+    async def top(self, limit: int = 100) -> list[ServerReputation]:
+        """Return the highest-scoring servers across every partition."""
+        tops = [await store.top(limit) for store in self.stores]
+        merged = heapq.merge(
+            *tops, key=lambda server: server.reputation_score, reverse=True
+        )
+        return list(merged)[:limit]
+
+    async def recompute_scores(self) -> None:
+        """Recompute every stored score in every partition."""
+        for store in self.stores:
+            await store.recompute_scores()
+
+    async def aclose(self) -> None:
+        for store in self.stores:
+            await store.aclose()
+
+
+def reputation_store_from_settings(
+    settings: Settings, partition: int = 0
+) -> ReputationStore:
+    """Build the reputation store of one partition configured in `settings`."""
+    return ReputationStore(
+        partition_path(
+            settings.reputation_db, partition, settings.reputation_partitions
+        ),
+        base_score=settings.base_reputation_score,
+        max_age_score=settings.max_age_score,
+        max_age_days=settings.max_age_days,
+    )
+
+
+def partitioned_reputation_from_settings(
+    settings: Settings,
+) -> PartitionedReputation:
+    """Build the view over every partition configured in `settings`."""
+    return PartitionedReputation(
+        [
+            reputation_store_from_settings(settings, partition)
+            for partition in range(settings.reputation_partitions)
+        ]
+    )
@@ -1,5 +1,7 @@
 """Settings for the docket firehose package."""
 
+from typing import Literal
+
 import anyio
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -12,15 +14,58 @@ class Settings(BaseSettings):
     # Paths
     base_data_path: anyio.Path = anyio.Path("/app/data")
     firehose_data_path: anyio.Path = base_data_path / "firehose"
-    reputation_file: anyio.Path = base_data_path / "reputation.json"
+    reputation_db: anyio.Path = base_data_path / "reputation.db"
+    cursor_file: anyio.Path = firehose_data_path / "cursor"
 
     # Redis
     redis_url: str = "redis://redis:6379/0"
 
+    # Firehose consumer
+    firehose_workers: int = 0  # decode processes, 0 decodes inline
+    firehose_queue_size: int = 1000  # frames waiting behind ones being decoded
+
+    # Record storage
+    segment_max_bytes: int = 32 * 1024 * 1024
+    fsync_every: int = 100  # records
+    fsync_interval: float = 1.0  # seconds
+    # commits waiting to be written before the reader blocks
+    write_queue_size: int = 1000
+    write_batch_size: int = 1000  # records coalesced into one write
+
+    # Cursor checkpoints
+    cursor_backend: Literal["file", "redis"] = "file"
+    cursor_key: str = "firehose:cursor"
+    cursor_flush_every: int = 1000  # events
+    cursor_flush_interval: float = 5.0  # seconds
+
+    # Record events, which tell the worker to process new records
+    record_events: bool = True
+    record_events_stream: str = "firehose:records"
+    record_events_maxlen: int = 10_000  # events kept in the stream
+    record_events_queue_size: int = 1000  # batches waiting to be published
+    record_events_timeout: float = 5.0  # seconds one publish may take
+    record_events_debounce: float = 2.0  # seconds a repository must be quiet
+    record_events_max_delay: float = 10.0  # seconds before a busy repo is processed
+
+    # Backfill
+    backfill_checkpoint_file: anyio.Path = firehose_data_path / "backfill.json"
+    backfill_concurrency: int = 32  # repositories crawled at once
+    backfill_per_pds_concurrency: int = 4  # requests in flight to one PDS
+    backfill_relay_url: str = "https://bsky.network/xrpc"
+    backfill_mode: Literal["records", "car"] = "records"  # listRecords or getRepo
+
+    # Metrics
+    metrics_port: int = 0  # Prometheus text endpoint, 0 disables it
+    metrics_dir: anyio.Path | None = base_data_path / "metrics"  # <process>.prom
+    metrics_interval: float = 15.0  # seconds between metric file writes
+    summary_log_interval: float = 60.0  # seconds between saved record summaries
+
     # Record types
     record_type: str = "app.mcp.server"
 
     # Reputation scoring
+    reputation_partitions: int = 1  # databases, split by a hash of the DID
+    process_interval: float = 60.0  # seconds between passes of every partition
     base_reputation_score: float = 0.1
     max_age_score: float = 0.9
     max_age_days: int = 30
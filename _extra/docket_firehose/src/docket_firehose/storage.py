@@ -0,0 +1,318 @@
+"""Append-only segmented log storage for firehose records."""
+
+import fcntl
+import json
+import logging
+import os
+import struct
+import time
+from collections.abc import AsyncIterator
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import BinaryIO, Protocol
+
+import anyio
+
+from docket_firehose.settings import Settings
+
+logger = logging.getLogger("storage")
+
+# each log entry is a 4-byte big-endian length followed by compact JSON
+_LENGTH = struct.Struct(">I")
+
+#: the log the firehose consumer writes, kept directly in the collection's
+#: directory; any other log lives in a subdirectory named after it
+MAIN_LOG = ""
+
+#: where to resume reading a collection: the (log, segment name, byte offset)
+#: reached in each of its logs, sorted by log
+Position = tuple[tuple[str, str, int], ...]
+
+
+@dataclass(slots=True)
+class StoredRecord:
+    """A record as it is kept in the log, along with where it came from."""
+
+    seq: int
+    did: str
+    collection: str
+    rkey: str
+    cid: str
+    time: str
+    record: dict
+
+    def to_bytes(self) -> bytes:
+        return json.dumps(asdict(self), separators=(",", ":")).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "StoredRecord":
+        return cls(**json.loads(data))
+
+
+class RecordStore(Protocol):
+    """Where the consumer writes matched records and the processor reads them."""
+
+    #: how many times appended records have been made durable, by `append`
+    #: itself or by `flush`
+    syncs: int
+    #: seconds after which the next `append` syncs whatever is waiting
+    fsync_interval: float
+
+    async def append(self, records: list[StoredRecord]) -> None: ...
+
+    async def flush(self) -> None: ...
+
+    async def aclose(self) -> None: ...
+
+    def read(
+        self, collection: str, after: Position | None = None
+    ) -> AsyncIterator[tuple[Position, StoredRecord]]: ...
+
+
+def _collection_dir(root: Path, collection: str) -> Path:
+    return root / collection.replace(".", "_")
+
+
+def _log_dir(collection_dir: Path, log: str) -> Path:
+    return collection_dir / log if log != MAIN_LOG else collection_dir
+
+
+def _segments(directory: Path) -> list[Path]:
+    return sorted(directory.glob("*.log")) if directory.is_dir() else []
+
+
+def _logs(collection_dir: Path) -> dict[str, list[Path]]:
+    """The segments of every log of a collection, by log name."""
+    logs = {MAIN_LOG: _segments(collection_dir)}
+    if collection_dir.is_dir():
+        for directory in collection_dir.iterdir():
+            if directory.is_dir():
+                logs[directory.name] = _segments(directory)
+    return {log: segments for log, segments in sorted(logs.items()) if segments}
+
+
+class _SegmentWriter:
+    """
+    Appends to the active segment of one log of a collection, rotating as needed.
+
+    A log has one writer at a time, so that only its last segment is ever
+    still growing, which is what lets readers resume from a single position
+    per log. The writer holds a lock on the log's directory for as long as it
+    is open, and a second process trying to write the same log fails.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock: BinaryIO | None = None
+        self._log: BinaryIO | None = None
+        self._date = ""
+        self._size = 0
+
+    def _acquire(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        lock = (self.directory / "writer.lock").open("ab")
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            raise RuntimeError(
+                f"{self.directory} is already being written by another process"
+            ) from None
+        self._lock = lock
+
+    def _open(self, date: str) -> None:
+        self._close_segment()
+        if self._lock is None:
+            self._acquire()
+        # never reopen an existing segment, so a torn tail from a crash is
+        # left behind in a closed segment instead of in the middle of a live one
+        existing = [p.name for p in self.directory.glob(f"{date}.*.log")]
+        number = max((int(name.split(".")[1]) for name in existing), default=-1) + 1
+        log = self.directory / f"{date}.{number:04d}.log"
+        self._log = log.open("ab")
+        self._date = date
+        self._size = 0
+
+    def append(self, entries: list[bytes]) -> None:
+        date = datetime.now(UTC).strftime("%Y-%m-%d")
+        if self._log is None or date != self._date or self._size >= self.max_bytes:
+            self._open(date)
+        assert self._log is not None
+
+        for payload in entries:
+            self._log.write(_LENGTH.pack(len(payload)))
+            self._log.write(payload)
+            self._size += _LENGTH.size + len(payload)
+
+    def sync(self) -> None:
+        if self._log is not None:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def _close_segment(self) -> None:
+        self.sync()
+        if self._log is not None:
+            self._log.close()
+        self._log = None
+
+    def close(self) -> None:
+        self._close_segment()
+        if self._lock is not None:
+            # closing the file releases the lock
+            self._lock.close()
+            self._lock = None
+
+
+def _read_segment(
+    path: Path, start: int, is_active: bool
+) -> list[tuple[int, StoredRecord]]:
+    """Read complete entries from `start`, returning (end offset, record) pairs."""
+    with path.open("rb") as f:
+        f.seek(start)
+        data = f.read()
+
+    entries: list[tuple[int, StoredRecord]] = []
+    offset = 0
+    while offset + _LENGTH.size <= len(data):
+        (length,) = _LENGTH.unpack_from(data, offset)
+        end = offset + _LENGTH.size + length
+        if end > len(data):
+            break
+        entries.append(
+            (start + end, StoredRecord.from_bytes(data[offset + _LENGTH.size : end]))
+        )
+        offset = end
+
+    if offset < len(data) and not is_active:
+        logger.warning(f"Skipping torn entry at {path}:{start + offset}")
+    return entries
+
+
+class SegmentLogStore:
+    """
+    Record storage as rotating, append-only segment files per collection.
+
+    Segments live under `root/<collection>/` and are named
+    `YYYY-MM-DD.NNNN.log`, so they sort in write order. That directory holds
+    the main log, which the firehose consumer writes; a store opened with
+    another `log` name, such as the backfill's, writes to its own
+    `root/<collection>/<log>/` instead, so two processes never append to the
+    same log. Reads cover every log and keep a position in each. A new segment is
+    started each UTC day, once the active one passes `max_segment_bytes`, and
+    whenever a writer starts.
+
+    Writes are buffered and only fsynced once `fsync_every` records or
+    `fsync_interval` seconds have accumulated, or when `flush` is called.
+    """
+
+    def __init__(
+        self,
+        root: anyio.Path,
+        max_segment_bytes: int = 32 * 1024 * 1024,
+        fsync_every: int = 100,
+        fsync_interval: float = 1.0,
+        log: str = MAIN_LOG,
+    ) -> None:
+        self.root = Path(root)
+        self.log = log
+        self.max_segment_bytes = max_segment_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        self._writers: dict[str, _SegmentWriter] = {}
+        self.syncs = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _append(self, records: list[StoredRecord]) -> None:
+        by_collection: dict[str, list[bytes]] = {}
+        for record in records:
+            try:
+                payload = record.to_bytes()
+            except (TypeError, ValueError) as e:
+                logger.error(f"Cannot store {record.collection}/{record.rkey}: {e}")
+                continue
+            by_collection.setdefault(record.collection, []).append(payload)
+
+        for collection, entries in by_collection.items():
+            writer = self._writers.get(collection)
+            if writer is None:
+                writer = self._writers[collection] = _SegmentWriter(
+                    _log_dir(_collection_dir(self.root, collection), self.log),
+                    self.max_segment_bytes,
+                )
+            writer.append(entries)
+
+        self._unsynced += len(records)
+        if (
+            self._unsynced >= self.fsync_every
+            or time.monotonic() - self._last_sync >= self.fsync_interval
+        ):
+            self._sync()
+
+    def _sync(self) -> None:
+        for writer in self._writers.values():
+            writer.sync()
+        self.syncs += 1
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+    async def append(self, records: list[StoredRecord]) -> None:
+        """Append records to the active segments of their collections."""
+        if records:
+            await anyio.to_thread.run_sync(self._append, records)
+
+    async def flush(self) -> None:
+        """Make everything appended so far durable."""
+        await anyio.to_thread.run_sync(self._sync)
+
+    async def aclose(self) -> None:
+        await anyio.to_thread.run_sync(self._close)
+
+    async def read(
+        self, collection: str, after: Position | None = None
+    ) -> AsyncIterator[tuple[Position, StoredRecord]]:
+        """
+        Yield stored records, with the position after each one.
+
+        Each log is read in write order, one log after another. Pass a
+        position previously yielded as `after` to pick up where an earlier
+        read left off in every log.
+        """
+        reached = {log: (segment, offset) for log, segment, offset in after or ()}
+        logs = await anyio.to_thread.run_sync(
+            _logs, _collection_dir(self.root, collection)
+        )
+        for log, segments in logs.items():
+            resume = reached.get(log)
+            for i, segment in enumerate(segments):
+                if resume and segment.name < resume[0]:
+                    continue
+                start = resume[1] if resume and segment.name == resume[0] else 0
+                entries = await anyio.to_thread.run_sync(
+                    _read_segment, segment, start, i == len(segments) - 1
+                )
+                for end, record in entries:
+                    reached[log] = (segment.name, end)
+                    position = tuple((name, *reached[name]) for name in sorted(reached))
+                    yield position, record
+
+
+def record_store_from_settings(
+    settings: Settings, log: str = MAIN_LOG
+) -> SegmentLogStore:
+    """Build the record store configured in `settings`, writing to `log`."""
+    return SegmentLogStore(
+        settings.firehose_data_path,
+        max_segment_bytes=settings.segment_max_bytes,
+        fsync_every=settings.fsync_every,
+        fsync_interval=settings.fsync_interval,
+        log=log,
+    )
@@ -0,0 +1,69 @@
+"""Backfill task: crawl repositories into the firehose record store."""
+
+from collections.abc import Iterable
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Literal
+
+from docket_firehose.crawler import BACKFILL_LOG, Backfill, BackfillCheckpoint
+from docket_firehose.events import record_event_publisher_from_settings
+from docket_firehose.settings import Settings
+from docket_firehose.storage import record_store_from_settings
+from docket_firehose.writer import RecordWriter
+
+settings = Settings()
+
+
+async def backfill_repos(
+    collections: Iterable[str] = (settings.record_type,),
+    dids: Iterable[str] | None = None,
+    car_files: Iterable[Path] | None = None,
+    mode: Literal["records", "car"] = settings.backfill_mode,
+) -> None:
+    """
+    Docket task that stores every existing record of `collections`.
+
+    Records are written to the same store the firehose consumer uses, in a
+    log of their own so that the consumer keeps sole ownership of its log,
+    and announced to the worker the same way, so the processor picks them up like
+    any others. Progress is checkpointed per repository and collection;
+    running again resumes where the last run stopped.
+
+    Args:
+        collections: Record types to fetch
+        dids: Repositories to crawl, or None to crawl every repository the
+            relay lists as holding one of `collections`
+        car_files: Repository exports on disk to read instead of crawling
+        mode: Page through `listRecords` ("records") or fetch each repository
+            once with `getRepo` ("car")
+    """
+    store = record_store_from_settings(settings, log=BACKFILL_LOG)
+    publisher = record_event_publisher_from_settings(settings)
+    writer = RecordWriter(
+        store,
+        queue_size=settings.write_queue_size,
+        batch_size=settings.write_batch_size,
+        on_written=publisher.publish if publisher is not None else None,
+    )
+    checkpoint = BackfillCheckpoint(
+        settings.backfill_checkpoint_file, sync=writer.flush
+    )
+    await checkpoint.load()
+
+    try:
+        async with publisher or nullcontext(), writer:
+            backfill = Backfill(
+                collections,
+                writer.put,
+                checkpoint,
+                concurrency=settings.backfill_concurrency,
+                per_pds_concurrency=settings.backfill_per_pds_concurrency,
+                relay_url=settings.backfill_relay_url,
+                mode=mode,
+            )
+            if car_files is not None:
+                await backfill.ingest(car_files)
+            else:
+                await backfill.run(dids)
+    finally:
+        await store.aclose()
@@ -1,20 +1,27 @@
 """ATProto firehose consumer task."""
 
-import json
 import logging
+import time
+from contextlib import nullcontext
 from datetime import UTC, datetime
 
-import anyio
 from atproto import (
-    CAR,
     AsyncFirehoseSubscribeReposClient,
     models,
     parse_subscribe_repos_message,
 )
 from atproto_firehose.models import MessageFrame
 
+from docket_firehose.cursor import CursorCheckpointer, cursor_store_from_settings
+from docket_firehose.decode import DecodeTimings, MatchedRecord, decode_commit_records
+from docket_firehose.events import record_event_publisher_from_settings
 from docket_firehose.logging import setup_logging
+from docket_firehose.metrics import METRICS, SavedRecordLog
+from docket_firehose.pipeline import DecodedFrame, DecodePipeline
+from docket_firehose.replay import FirehoseClient
 from docket_firehose.settings import Settings
+from docket_firehose.storage import StoredRecord, record_store_from_settings
+from docket_firehose.writer import RecordWriter
 
 logger = logging.getLogger("firehose")
 settings = Settings()
@@ -22,16 +29,10 @@ settings = Settings()
 setup_logging()
 
 
-async def _get_save_path(record_type: str) -> anyio.Path:
-    """Get the save path for a given record type."""
-    date_str = datetime.now(UTC).strftime("%Y-%m-%d")
-    save_path = settings.firehose_data_path / record_type.replace(".", "_") / date_str
-    await anyio.Path(save_path).mkdir(parents=True, exist_ok=True)
-    return save_path
-
-
 async def consume_firehose(
-    record_types: frozenset[str], max_runtime: int | None = None
+    record_types: frozenset[str],
+    max_runtime: int | None = None,
+    client: FirehoseClient | None = None,
 ) -> None:
     """
     Docket task that consumes the ATProto firehose and processes records of specified types.
@@ -39,45 +40,101 @@ async def consume_firehose(
     Args:
         record_types: Set of record types to monitor
         max_runtime: Optional maximum runtime in seconds
+        client: Optional client to read frames from instead of the relay,
+            e.g. a `ReplayClient`
     """
     logger.info(f"Starting firehose consumer for: {', '.join(record_types)}")
-    client = AsyncFirehoseSubscribeReposClient()
+    cursor_store = cursor_store_from_settings(settings)
+    cursor = await cursor_store.load()
+    if cursor is not None:
+        logger.info(f"Resuming from cursor {cursor}")
+
+    params = {"cursor": cursor} if cursor is not None else None
+    if client is None:
+        client = AsyncFirehoseSubscribeReposClient(params=params)
+    elif params is not None:
+        client.update_params(params)
+    store = record_store_from_settings(settings)
+    # tell the worker about stored records so it can score them right away
+    publisher = record_event_publisher_from_settings(settings)
+    writer = RecordWriter(
+        store,
+        queue_size=settings.write_queue_size,
+        batch_size=settings.write_batch_size,
+        on_written=publisher.publish if publisher is not None else None,
+    )
+    checkpoint = CursorCheckpointer(
+        cursor_store,
+        client,
+        sync=writer.flush,
+        flush_every=settings.cursor_flush_every,
+        flush_interval=settings.cursor_flush_interval,
+    )
+    saved_log = SavedRecordLog(logger, settings.summary_log_interval)
     start_time = datetime.now(UTC)
 
-    async def process_commit(
-        commit: models.ComAtprotoSyncSubscribeRepos.Commit,
+    def observe(commit_time: str | None, timings: DecodeTimings) -> None:
+        """Count a decoded frame and its timings."""
+        METRICS.frames += 1
+        METRICS.observe("parse", timings.parse)
+        if commit_time is not None:
+            METRICS.commits += 1
+            METRICS.last_commit_time = commit_time
+            METRICS.observe("filter", timings.filter)
+            if timings.car_decode:
+                METRICS.observe("car_decode", timings.car_decode)
+
+    async def save_records(
+        seq: int, repo: str, commit_time: str, matched: list[MatchedRecord]
     ) -> None:
-        """Process a commit message, looking for specified record types."""
-        if not commit.blocks:
-            return
-
-        car = CAR.from_bytes(
-            commit.blocks
-            if isinstance(commit.blocks, bytes)
-            else commit.blocks.encode()
+        """Queue matched records for the writer."""
+        for match in matched:
+            METRICS.matched[match.collection] += 1
+        await writer.put(
+            [
+                StoredRecord(
+                    seq=seq,
+                    did=repo,
+                    collection=match.collection,
+                    rkey=match.rkey,
+                    cid=match.cid,
+                    time=commit_time,
+                    record=match.record,
+                )
+                for match in matched
+            ]
         )
+        saved_log.add(matched)
+
+    async def process_decoded(decoded: DecodedFrame) -> None:
+        """Save the records a pipeline worker decoded from a frame."""
+        observe(decoded.time, decoded.timings)
+        if decoded.seq is None:
+            return
+        if decoded.records and decoded.repo and decoded.time:
+            await save_records(decoded.seq, decoded.repo, decoded.time, decoded.records)
+        await checkpoint.advance(decoded.seq)
 
-        async with anyio.create_task_group() as tg:
-            for record in car.blocks.values():
-                if isinstance(record, dict) and record.get("$type") in record_types:
-                    record_type = record["$type"]
-                    save_path = await _get_save_path(record_type)
-                    filepath = (
-                        save_path
-                        / f"{datetime.now(UTC).strftime('%H%M%S')}_{commit.seq}.json"
-                    )
-                    tg.start_soon(
-                        anyio.Path(filepath).write_text, json.dumps(record, indent=2)
-                    )
-                    logger.info(
-                        f"Saved {record_type} record: {record.get('name', 'unknown')}"
-                    )
+    pipeline: DecodePipeline | None = None
 
     async def message_handler(message: MessageFrame) -> None:
         """Handle incoming firehose messages."""
-        commit = parse_subscribe_repos_message(message)
-        if isinstance(commit, models.ComAtprotoSyncSubscribeRepos.Commit):
-            await process_commit(commit)
+        if pipeline is not None:
+            await pipeline.submit(message)
+        else:
+            timings = DecodeTimings()
+            start = time.perf_counter()
+            parsed = parse_subscribe_repos_message(message)
+            timings.parse = time.perf_counter() - start
+            if isinstance(parsed, models.ComAtprotoSyncSubscribeRepos.Commit):
+                matched = decode_commit_records(parsed, record_types, timings)
+                observe(parsed.time, timings)
+                if matched:
+                    await save_records(parsed.seq, parsed.repo, parsed.time, matched)
+            else:
+                observe(None, timings)
+            if (seq := getattr(parsed, "seq", None)) is not None:
+                await checkpoint.advance(seq)
 
         if max_runtime and (datetime.now(UTC) - start_time).seconds > max_runtime:
             logger.info("Max runtime reached")
@@ -85,11 +142,28 @@ async def consume_firehose(
 
     async def error_handler(error: BaseException) -> None:
         """Handle errors from the firehose."""
+        METRICS.error("firehose")
         logger.error(f"Firehose error: {error}", exc_info=True)
 
     try:
-        logger.info("Connecting to firehose...")
-        await client.start(message_handler, error_handler)
+        async with publisher or nullcontext(), writer:
+            METRICS.track_queue("write", lambda: writer.queue_depth)
+            try:
+                logger.info("Connecting to firehose...")
+                if settings.firehose_workers:
+                    async with DecodePipeline(
+                        record_types,
+                        process_decoded,
+                        workers=settings.firehose_workers,
+                        queue_size=settings.firehose_queue_size,
+                    ) as pipeline:
+                        METRICS.track_queue("decode", lambda: pipeline.queue_depth)
+                        await client.start(message_handler, error_handler)
+                else:
+                    await client.start(message_handler, error_handler)
+            finally:
+                await checkpoint.flush()
+                saved_log.flush()
     except KeyboardInterrupt:
         logger.info("Shutting down gracefully...")
         await client.stop()
@@ -97,4 +171,5 @@ async def consume_firehose(
         logger.error(f"Fatal error: {e}", exc_info=True)
         raise
     finally:
-        logger.info("Firehose consumer stopped")
+        await store.aclose()
+        logger.info(f"Firehose consumer stopped at seq {checkpoint.flushed_seq}")
@@ -1,101 +1,259 @@
 """Task for processing saved firehose records and calculating basic reputation scores."""
 
-import json
 import logging
-from datetime import datetime
+import time
 
+import numpy as np
+
+from docket_firehose.metrics import METRICS
+from docket_firehose.reputation import (
+    ServerObservation,
+    ServerReputation,
+    longevity_score,
+    partition_for,
+    reputation_store_from_settings,
+)
 from docket_firehose.settings import Settings
-from docket_firehose.utils import load_json_file, parse_timestamp, save_json_file
+from docket_firehose.storage import (
+    Position,
+    SegmentLogStore,
+    record_store_from_settings,
+)
+from docket_firehose.utils import US_PER_DAY, iso_to_epoch_us
 
 logger = logging.getLogger("processor")
 settings = Settings()
 
 
+def _score(first_seen: int, last_seen: int) -> float:
+    return longevity_score(
+        first_seen,
+        last_seen,
+        base_score=settings.base_reputation_score,
+        max_age_score=settings.max_age_score,
+        max_age_days=settings.max_age_days,
+    )
+
+
 def calculate_longevity_score(first_seen: str, last_seen: str) -> float:
     """
-    Calculate a 0-1 score based on server longevity.
-    For now, we'll use a simple formula:
-    - Base score for being registered (from settings)
-    - Up to max_age_score additional score based on age (max at max_age_days)
+    Calculate a 0-1 score based on server longevity (see `longevity_score`),
+    with the scoring settings, from ISO 8601 timestamps.
     """
     try:
-        first = datetime.fromisoformat(first_seen)
-        last = datetime.fromisoformat(last_seen)
-        age_days = (last - first).days
+        return _score(iso_to_epoch_us(first_seen), iso_to_epoch_us(last_seen))
+    except Exception as e:
+        logger.error(f"Error calculating longevity score: {e}")
+        return 0.0
+
+
+def calculate_longevity_scores(
+    first_seen: np.ndarray, last_seen: np.ndarray
+) -> np.ndarray:
+    """
+    Calculate `calculate_longevity_score` for many servers at once.
+
+    Takes arrays of epoch-microsecond timestamps. The score only depends on
+    the age in whole days, so the scalar function is called once per
+    distinct age and the results are broadcast back.
+    """
+    age_days = (
+        np.asarray(last_seen, dtype=np.int64) - np.asarray(first_seen, dtype=np.int64)
+    ) // US_PER_DAY
+
+    # every age past max_age_days hits the max_age_score cap, so clipping is exact
+    ages, inverse = np.unique(
+        np.minimum(age_days, settings.max_age_days), return_inverse=True
+    )
+    scores = [_score(0, age * US_PER_DAY) for age in ages.tolist()]
+    return np.array(scores, dtype=np.float64)[inverse]
 
-        # Base score for registration
-        base_score = settings.base_reputation_score
 
-        # Additional score based on age
-        age_score = min(
-            settings.max_age_score,
-            (age_days / settings.max_age_days) * settings.max_age_score,
+def _merge(
+    observations: dict[tuple[str, str], ServerObservation],
+    existing: dict[tuple[str, str], ServerReputation],
+) -> list[ServerReputation]:
+    """Merge this run's observations into stored servers and rescore them once."""
+    merged: list[ServerReputation] = []
+    for key, seen in observations.items():
+        server = existing.get(key)
+        if server is None:
+            server = ServerReputation(
+                did=seen.did,
+                rkey=seen.rkey,
+                name=seen.name,
+                first_seen=seen.first_seen,
+                last_seen=seen.last_seen,
+                reputation_score=0.0,
+            )
+        else:
+            server.first_seen = min(server.first_seen, seen.first_seen)
+            if seen.last_seen >= server.last_seen:
+                server.last_seen = seen.last_seen
+                server.name = seen.name
+        merged.append(server)
+
+    if merged:
+        scores = calculate_longevity_scores(
+            np.fromiter((s.first_seen for s in merged), np.int64, len(merged)),
+            np.fromiter((s.last_seen for s in merged), np.int64, len(merged)),
         )
+        for server, score in zip(merged, scores.tolist()):
+            server.reputation_score = score
+    return merged
 
-        return round(base_score + age_score, 3)
-    except Exception as e:
-        logger.error(f"Error calculating longevity score: {e}")
-        return 0.0
 
+def _log_offsets(position: Position | None) -> dict[str, tuple[str, int]]:
+    return {log: (segment, offset) for log, segment, offset in position or ()}
 
-async def process_saved_records(record_type: str = settings.record_type) -> None:
+
+def _earliest(positions: list[Position | None]) -> Position | None:
+    """The position that isn't past any of `positions` in any log."""
+    offsets = [_log_offsets(position) for position in positions]
+    # a log missing from any of them has to be read from its start
+    logs = set(offsets[0]).intersection(*offsets[1:])
+    return tuple((log, *min(o[log] for o in offsets)) for log in sorted(logs)) or None
+
+
+async def _observe(
+    store: SegmentLogStore,
+    record_type: str,
+    watermarks: dict[int, Position | None],
+) -> tuple[
+    dict[int, dict[tuple[str, str], ServerObservation]], dict[int, int], Position | None
+]:
+    """
+    Fold the records stored after each partition's watermark into observations.
+
+    The log is read once, from the earliest of `watermarks`, and each record
+    goes to the partition owning its DID if it comes after that partition's
+    watermark. Records of partitions not in `watermarks` are skipped.
+
+    Returns the observations by partition and server, how many records each
+    partition's observations came from, and the position reached.
+    """
+    partitions = settings.reputation_partitions
+    servers: dict[int, dict[tuple[str, str], ServerObservation]] = {
+        partition: {} for partition in watermarks
+    }
+    processed = dict.fromkeys(watermarks, 0)
+    after = _earliest(list(watermarks.values()))
+    read_from = {
+        partition: _log_offsets(watermark)
+        for partition, watermark in watermarks.items()
+    }
+    reached = _log_offsets(after)
+    position = after
+    async for position, stored in store.read(record_type, after=after):
+        # the record came from the one log whose offset moved
+        log, end = next(
+            (log, (segment, offset))
+            for log, segment, offset in position
+            if reached.get(log) != (segment, offset)
+        )
+        reached[log] = end
+        partition = partition_for(stored.did, partitions) if partitions > 1 else 0
+        if partition not in read_from or end <= read_from[partition].get(log, ("", 0)):
+            continue
+        processed[partition] += 1
+        try:
+            seen = iso_to_epoch_us(stored.time)
+            name = stored.record.get("name", "unknown")
+            server = servers[partition].get((stored.did, stored.rkey))
+            if server is None:
+                servers[partition][(stored.did, stored.rkey)] = ServerObservation(
+                    did=stored.did,
+                    rkey=stored.rkey,
+                    name=name,
+                    first_seen=seen,
+                    last_seen=seen,
+                )
+            else:
+                server.first_seen = min(server.first_seen, seen)
+                if seen >= server.last_seen:
+                    server.last_seen = seen
+                    server.name = name
+        except Exception as e:
+            METRICS.error("process")
+            logger.error(f"Error processing record at seq {stored.seq}: {e}")
+    return servers, processed, position
+
+
+async def process_saved_records(
+    record_type: str = settings.record_type,
+    full_rebuild: bool = False,
+    partitions: list[int] | None = None,
+) -> None:
     """
     Process saved firehose records and update reputation scores.
     Currently tracks:
     - First seen date
     - Last seen date
     - Basic longevity-based reputation score
+
+    Only records stored since the last run are read, starting from the
+    watermark kept in the reputation database. Each server touched by the
+    new records is merged and rescored once, however many records it had,
+    and the results are written along with the new watermark in a single
+    transaction.
+    With `full_rebuild`, existing reputation data is dropped and every stored
+    record is processed again.
+
+    When `settings.reputation_partitions` is above one, servers are kept in
+    one database per partition, each with its own watermark, and this only
+    updates `partitions` (default: all of them). The log is still read only
+    once, from the earliest of their watermarks, and each record goes to the
+    partition owning its DID. If two passes over one partition overlap, the
+    one that finishes second finds the watermark moved and processes that
+    partition again from it.
     """
-    logger.info(f"Processing records for type: {record_type}")
-
-    # Load existing reputation data
-    reputation_data = await load_json_file(settings.reputation_file)
-
-    # Process all record files
-    base_path = settings.firehose_data_path / record_type.replace(".", "_")
-    if await base_path.exists():
-        async for date_dir in base_path.iterdir():
-            if await date_dir.is_dir():
-                async for record_file in date_dir.glob("*.json"):
-                    try:
-                        content = await record_file.read_text()
-                        data = json.loads(content)
-                        server_did = data.get("did")
-                        if not server_did:
-                            continue
-
-                        # Parse record timestamp from filename (HHMMSS_seq.json)
-                        timestamp = parse_timestamp(date_dir.name, record_file.name[:6])
-
-                        # Update server data
-                        if server_did not in reputation_data:
-                            reputation_data[server_did] = {
-                                "first_seen": timestamp,
-                                "last_seen": timestamp,
-                                "name": data.get("name", "unknown"),
-                            }
-                        else:
-                            # Update last_seen if this record is newer
-                            if timestamp > reputation_data[server_did]["last_seen"]:
-                                reputation_data[server_did]["last_seen"] = timestamp
-
-                        # Calculate reputation score
-                        reputation_data[server_did]["reputation_score"] = (
-                            calculate_longevity_score(
-                                reputation_data[server_did]["first_seen"],
-                                reputation_data[server_did]["last_seen"],
-                            )
-                        )
-
-                        logger.info(
-                            f"Updated reputation for {data.get('name', 'unknown')} "
-                            f"(DID: {server_did[:8]}...) - "
-                            f"Score: {reputation_data[server_did]['reputation_score']}"
-                        )
-
-                    except Exception as e:
-                        logger.error(f"Error processing {record_file}: {e}")
-
-    # Save updated reputation data
-    await save_json_file(settings.reputation_file, reputation_data)
-    logger.info("Processing complete")
+    if partitions is None:
+        partitions = list(range(settings.reputation_partitions))
+    logger.info(
+        f"Processing records for type: {record_type} "
+        f"(partitions {', '.join(map(str, partitions))} "
+        f"of {settings.reputation_partitions})"
+    )
+
+    start = time.perf_counter()
+    reputations = {
+        partition: reputation_store_from_settings(settings, partition)
+        for partition in partitions
+    }
+    store = record_store_from_settings(settings)
+    processed = updated = 0
+    try:
+        if full_rebuild:
+            logger.info("Rebuilding reputation data from all stored records")
+            for reputation in reputations.values():
+                await reputation.clear()
+
+        pending = sorted(reputations)
+        while pending:
+            watermarks = {
+                partition: await reputations[partition].get_watermark(record_type)
+                for partition in pending
+            }
+            observed, counts, position = await _observe(store, record_type, watermarks)
+            retry: list[int] = []
+            for partition, servers in observed.items():
+                reputation = reputations[partition]
+                existing = await reputation.get_many(list(servers))
+                merged = _merge(servers, existing)
+                previous = watermarks[partition]
+                if await reputation.upsert(merged, record_type, position, previous):
+                    processed += counts[partition]
+                    updated += len(servers)
+                else:
+                    retry.append(partition)
+                    logger.info(
+                        f"Partition {partition} was processed concurrently, retrying"
+                    )
+            pending = retry
+    finally:
+        for reputation in reputations.values():
+            await reputation.aclose()
+
+    METRICS.records_processed += processed
+    METRICS.observe("process", time.perf_counter() - start)
+    logger.info(f"Processing complete, {processed} new records for {updated} servers")
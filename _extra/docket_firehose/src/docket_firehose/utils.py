@@ -2,12 +2,16 @@
 
 import json
 import logging
-from datetime import UTC, datetime
+from datetime import UTC, datetime, timedelta
 
 import anyio
 
 logger = logging.getLogger("utils")
 
+_EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+US_PER_DAY = 86_400_000_000
+
 
 async def load_json_file(path: anyio.Path) -> dict:
     """Load JSON data from a file asynchronously."""
@@ -28,10 +32,9 @@ async def save_json_file(path: anyio.Path, data: dict) -> None:
         logger.error(f"Error saving JSON to {path}: {e}")
 
 
-def parse_timestamp(date_str: str, time_str: str) -> str:
-    """Parse timestamp from date and time strings and return ISO format."""
-    return (
-        datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H%M%S")
-        .replace(tzinfo=UTC)
-        .isoformat()
-    )
+def iso_to_epoch_us(timestamp: str) -> int:
+    """Convert an ISO 8601 timestamp to integer microseconds since the epoch."""
+    moment = datetime.fromisoformat(timestamp)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=UTC)
+    return (moment - _EPOCH) // timedelta(microseconds=1)
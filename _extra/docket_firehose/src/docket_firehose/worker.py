@@ -1,12 +1,14 @@
 """Worker for processing saved firehose records."""
 
 import logging
-from datetime import UTC, datetime, timedelta
 
 import anyio
 from docket import Docket, Worker
 
+from docket_firehose.events import latest_event_id, listen_for_record_events
 from docket_firehose.logging import setup_logging
+from docket_firehose.metrics import metrics_exporter_from_settings
+from docket_firehose.reputation import partition_for
 from docket_firehose.settings import Settings
 from docket_firehose.tasks.process import process_saved_records
 
@@ -15,23 +17,73 @@ settings = Settings()
 
 
 async def main() -> None:
-    """Run the Docket worker to process saved records."""
+    """
+    Run the Docket worker to process saved records.
+
+    A pass over every reputation partition runs at startup to catch up on
+    records stored while the worker was down. After that, whenever
+    repositories that had record events go quiet (see `DidDebouncer`), a
+    pass is scheduled over the partitions that own them. Each pass reads the
+    log once, from the earliest watermark of its partitions, and only folds
+    records stored since the last pass of each.
+
+    Every partition also gets a pass each `process_interval` seconds, which
+    picks up records whose events were lost, and is the only way records
+    are processed when `record_events` is off.
+    """
+    partitions = settings.reputation_partitions
     setup_logging()
     logger.info("Starting worker")
 
-    async with Docket(name="firehose-processor", url=settings.redis_url) as docket:
+    async with (
+        metrics_exporter_from_settings(settings, "worker"),
+        Docket(name="firehose-processor", url=settings.redis_url) as docket,
+    ):
         logger.info("Connected to Redis, registering tasks...")
         docket.register(process_saved_records)
         logger.info("Tasks registered")
 
-        now = datetime.now(UTC)
-        await docket.add(process_saved_records)()
-        await docket.add(process_saved_records, when=now + timedelta(minutes=5))()
-        logger.info("Initial tasks scheduled")
+        async def process_all() -> None:
+            await docket.add(process_saved_records)()
+
+        async def poll() -> None:
+            while True:
+                await anyio.sleep(settings.process_interval)
+                await process_all()
+
+        after: bytes | str = "$"
+        if settings.record_events:
+            # events published from here on are read, so none are missed
+            # between the catch-up pass and the listener starting
+            after = await latest_event_id(
+                settings.redis_url, settings.record_events_stream
+            )
+        await process_all()
+        logger.info(f"Catch-up pass scheduled for {partitions} partitions")
+
+        async def process_batch(dids: list[str]) -> None:
+            due = sorted({partition_for(did, partitions) for did in dids})
+            await docket.add(process_saved_records)(partitions=due)
+            logger.info(
+                f"Pass scheduled for new records from {len(dids)} repositories "
+                f"in {len(due)} partitions"
+            )
 
-        async with Worker(docket, concurrency=1) as worker:
-            logger.info("Ready")
-            await worker.run_forever()
+        async with Worker(docket, concurrency=partitions) as worker:
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(poll)
+                if settings.record_events:
+                    tg.start_soon(
+                        listen_for_record_events,
+                        settings.redis_url,
+                        settings.record_events_stream,
+                        process_batch,
+                        settings.record_events_debounce,
+                        settings.record_events_max_delay,
+                        after,
+                    )
+                logger.info("Ready")
+                await worker.run_forever()
 
 
 if __name__ == "__main__":
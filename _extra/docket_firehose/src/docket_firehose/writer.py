@@ -0,0 +1,183 @@
+"""Bounded, batching record writer for the firehose consumer."""
+
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Self
+
+import anyio
+from anyio.abc import TaskGroup
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+
+from docket_firehose.metrics import METRICS
+from docket_firehose.storage import RecordStore, StoredRecord
+
+logger = logging.getLogger("writer")
+
+
+@dataclass(slots=True)
+class WriterStats:
+    """Counters for the record writer."""
+
+    records: int = 0
+    batches: int = 0
+    last_write_seconds: float = 0.0
+    max_write_seconds: float = 0.0
+    total_write_seconds: float = 0.0
+
+    @property
+    def mean_write_seconds(self) -> float:
+        return self.total_write_seconds / self.batches if self.batches else 0.0
+
+
+class RecordWriter:
+    """
+    Write matched records from a single long-lived task.
+
+    `put` queues one commit's records and returns straight away unless
+    `queue_size` commits are already waiting, in which case it blocks, so a
+    burst slows the firehose reader down instead of piling up work. The
+    writer takes whatever has queued up since its last write, up to
+    `batch_size` records, and appends it to the store in one call.
+
+    `flush` waits until everything queued before it has been written and
+    made durable, which makes it suitable as the cursor checkpoint's `sync`.
+
+    If `on_written` is given, written records are passed to it once the
+    store has made them durable, so anything told about a record can read it
+    from the store straight away. That happens on the store's own periodic
+    sync, or after `store.fsync_interval` seconds without new records. It is
+    called from the writer task and must return without waiting, e.g. by
+    queueing the records for another task.
+    """
+
+    def __init__(
+        self,
+        store: RecordStore,
+        queue_size: int,
+        batch_size: int,
+        on_written: Callable[[list[StoredRecord]], None] | None = None,
+    ) -> None:
+        self.store = store
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.on_written = on_written
+        self.stats = WriterStats()
+
+        self._task_group: TaskGroup | None = None
+        # written records on_written hasn't been given yet
+        self._unpublished: list[StoredRecord] = []
+        self._send: MemoryObjectSendStream[list[StoredRecord] | anyio.Event]
+        self._receive: MemoryObjectReceiveStream[list[StoredRecord] | anyio.Event]
+
+    @property
+    def queue_depth(self) -> int:
+        """Commits waiting to be written."""
+        return self._send.statistics().current_buffer_used
+
+    async def __aenter__(self) -> Self:
+        self._send, self._receive = anyio.create_memory_object_stream[
+            list[StoredRecord] | anyio.Event
+        ](self.queue_size)
+        self._task_group = anyio.create_task_group()
+        await self._task_group.__aenter__()
+        self._task_group.start_soon(self._run)
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> bool | None:
+        assert self._task_group is not None
+        # closing the stream lets the writer drain what is left and exit
+        await self._send.aclose()
+        try:
+            return await self._task_group.__aexit__(exc_type, exc, tb)
+        finally:
+            logger.info(
+                f"Record writer wrote {self.stats.records} records in "
+                f"{self.stats.batches} batches "
+                f"(mean {self.stats.mean_write_seconds * 1000:.1f}ms, "
+                f"max {self.stats.max_write_seconds * 1000:.1f}ms)"
+            )
+
+    async def put(self, records: list[StoredRecord]) -> None:
+        """Queue records for writing, waiting if the queue is full."""
+        if records:
+            await self._send.send(records)
+
+    async def flush(self) -> None:
+        """Wait until everything queued so far is written and durable."""
+        done = anyio.Event()
+        await self._send.send(done)
+        await done.wait()
+
+    async def _write(self, batch: list[StoredRecord]) -> None:
+        if not batch:
+            return
+        syncs = self.store.syncs
+        start = time.perf_counter()
+        await self.store.append(batch)
+        elapsed = time.perf_counter() - start
+        METRICS.observe("write", elapsed)
+
+        self.stats.records += len(batch)
+        self.stats.batches += 1
+        self.stats.last_write_seconds = elapsed
+        self.stats.max_write_seconds = max(self.stats.max_write_seconds, elapsed)
+        self.stats.total_write_seconds += elapsed
+
+        if self.on_written is not None:
+            self._unpublished.extend(batch)
+            if self.store.syncs != syncs:
+                self._publish()
+
+    def _publish(self) -> None:
+        """Pass the written records on, once the store has synced them."""
+        if self._unpublished:
+            assert self.on_written is not None
+            self.on_written(self._unpublished)
+            self._unpublished = []
+
+    async def _sync(self) -> None:
+        await self.store.flush()
+        self._publish()
+
+    async def _receive_item(self) -> list[StoredRecord] | anyio.Event:
+        """The next queued item, syncing unpublished records if none comes soon."""
+        if self._unpublished:
+            with anyio.move_on_after(self.store.fsync_interval):
+                return await self._receive.receive()
+            await self._sync()
+        return await self._receive.receive()
+
+    async def _run(self) -> None:
+        async with self._receive:
+            while True:
+                try:
+                    item = await self._receive_item()
+                except anyio.EndOfStream:
+                    break
+                batch: list[StoredRecord] = []
+                while True:
+                    if isinstance(item, anyio.Event):
+                        await self._write(batch)
+                        batch = []
+                        await self._sync()
+                        item.set()
+                    else:
+                        batch.extend(item)
+                        if len(batch) >= self.batch_size:
+                            await self._write(batch)
+                            batch = []
+                    try:
+                        item = self._receive.receive_nowait()
+                    except (anyio.WouldBlock, anyio.EndOfStream):
+                        break
+                await self._write(batch)
+            if self._unpublished:
+                await self._sync()
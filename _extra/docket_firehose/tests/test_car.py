@@ -0,0 +1,117 @@
+import hashlib
+
+import libipld
+import pytest
+
+from docket_firehose.car import RepoRecordExtractor, aextract_records
+
+pytestmark = pytest.mark.anyio
+
+WATCHED = "app.mcp.server"
+DID = "did:plc:test"
+
+
+def varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def cid(block: bytes) -> bytes:
+    # CIDv1, dag-cbor, sha2-256
+    return bytes([0x01, 0x71, 0x12, 0x20]) + hashlib.sha256(block).digest()
+
+
+def mst_node(keys: list[str], records: dict[str, bytes]) -> bytes:
+    entries = []
+    previous = b""
+    for key in keys:
+        encoded = key.encode()
+        prefix = 0
+        while prefix < min(len(previous), len(encoded)) and (
+            previous[prefix] == encoded[prefix]
+        ):
+            prefix += 1
+        entries.append(
+            {"k": encoded[prefix:], "p": prefix, "t": None, "v": cid(records[key])}
+        )
+        previous = encoded
+    return libipld.encode_dag_cbor({"e": entries, "l": None})
+
+
+def repo_export() -> tuple[bytes, dict[str, dict]]:
+    """
+    A small `getRepo` export, and the watched records in it by MST key.
+
+    Its blocks are ordered so that some watched records come before the MST
+    node listing them and some after. One post mentions the watched
+    collection, and one watched record is too big for a two-byte length.
+    """
+    records = {
+        f"{WATCHED}/a": {"$type": WATCHED, "name": "a"},
+        f"{WATCHED}/b": {"$type": WATCHED, "name": "b" * 20_000},
+        f"{WATCHED}/c": {"$type": WATCHED, "name": "c"},
+        f"{WATCHED}.attestation/a": {"$type": f"{WATCHED}.attestation"},
+        "app.bsky.feed.post/a": {"$type": "app.bsky.feed.post", "text": WATCHED},
+        "app.bsky.feed.post/b": {"$type": "app.bsky.feed.post", "text": "hi"},
+    }
+    blocks = {key: libipld.encode_dag_cbor(record) for key, record in records.items()}
+    keys = sorted(blocks)
+    first, second = mst_node(keys[:3], blocks), mst_node(keys[3:], blocks)
+    commit = libipld.encode_dag_cbor(
+        {"data": cid(first), "did": DID, "rev": "3l3qo2vutsw2b", "version": 3}
+    )
+
+    order = [
+        commit,
+        blocks[f"{WATCHED}/a"],
+        blocks["app.bsky.feed.post/a"],
+        first,
+        second,
+        blocks[f"{WATCHED}/b"],
+        blocks["app.bsky.feed.post/b"],
+        blocks[f"{WATCHED}.attestation/a"],
+        blocks[f"{WATCHED}/c"],
+    ]
+    header = libipld.encode_dag_cbor({"version": 1, "roots": [cid(commit)]})
+    car = varint(len(header)) + header
+    for block in order:
+        car += varint(len(cid(block)) + len(block)) + cid(block) + block
+
+    wanted = {
+        key: record
+        for key, record in records.items()
+        if key.partition("/")[0] == WATCHED
+    }
+    return car, wanted
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 1 << 20])
+async def test_streamed_extraction(chunk_size):
+    car, wanted = repo_export()
+
+    async def chunks():
+        for start in range(0, len(car), chunk_size):
+            yield car[start : start + chunk_size]
+
+    matched = await aextract_records(chunks(), [WATCHED])
+
+    assert {f"{m.collection}/{m.rkey}": m.record for m in matched} == wanted
+    blocks = {key: libipld.encode_dag_cbor(record) for key, record in wanted.items()}
+    assert all(
+        m.cid == libipld.encode_cid(cid(blocks[f"{m.collection}/{m.rkey}"]))
+        for m in matched
+    )
+
+
+def test_commit_did_and_truncated_export():
+    car, _ = repo_export()
+
+    extractor = RepoRecordExtractor([WATCHED])
+    extractor.feed(car[:-10])
+    assert extractor.did == DID
+    with pytest.raises(ValueError):
+        extractor.finish()
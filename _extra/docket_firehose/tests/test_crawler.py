@@ -0,0 +1,20 @@
+from datetime import UTC, datetime, timedelta
+
+from docket_firehose.crawler import stored_record
+
+
+def test_backfilled_records_are_timed_by_the_crawl():
+    before = datetime.now(UTC)
+    stored = stored_record(
+        "did:plc:test",
+        "app.mcp.server",
+        "self",
+        "cid",
+        {"$type": "app.mcp.server", "createdAt": "2001-01-01T00:00:00Z"},
+    )
+
+    # the claimed date is kept as data, but not trusted as when it was seen
+    assert stored.record["createdAt"] == "2001-01-01T00:00:00Z"
+    assert (
+        before <= datetime.fromisoformat(stored.time) <= before + timedelta(minutes=1)
+    )
@@ -0,0 +1,130 @@
+import anyio
+import pytest
+
+from docket_firehose import cursor
+from docket_firehose.cursor import (
+    CursorCheckpointer,
+    FileCursorStore,
+    RedisCursorStore,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class MemoryCursorStore:
+    def __init__(self, events: list[str] | None = None) -> None:
+        self.saved: list[int] = []
+        self.events = events if events is not None else []
+
+    async def load(self) -> int | None:
+        return self.saved[-1] if self.saved else None
+
+    async def save(self, seq: int) -> None:
+        self.events.append(f"save {seq}")
+        self.saved.append(seq)
+
+
+class Client:
+    def __init__(self) -> None:
+        self.params: dict = {}
+
+    def update_params(self, params: dict) -> None:
+        self.params = params
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.values.get(key)
+
+    async def set(self, key: str, value: int) -> None:
+        self.values[key] = str(value).encode()
+
+
+async def test_file_store_round_trip(tmp_path):
+    store = FileCursorStore(anyio.Path(tmp_path / "state" / "cursor"))
+    assert await store.load() is None
+
+    await store.save(42)
+    await store.save(43)
+    assert await store.load() == 43
+    assert sorted(p.name for p in (tmp_path / "state").iterdir()) == ["cursor"]
+
+    (tmp_path / "state" / "cursor").write_text("not a seq")
+    assert await store.load() is None
+
+
+async def test_redis_store_round_trip():
+    store = RedisCursorStore("redis://localhost:1", "cursor")
+    store.redis = FakeRedis()
+    assert await store.load() is None
+    await store.save(42)
+    assert await store.load() == 42
+
+
+async def test_flushes_every_flush_every_events():
+    store, client = MemoryCursorStore(), Client()
+    checkpoint = CursorCheckpointer(store, client, flush_every=3, flush_interval=60)
+
+    for seq in range(1, 8):
+        await checkpoint.advance(seq)
+    assert store.saved == [3, 6]
+    assert checkpoint.flushed_seq == 6
+    assert client.params == {"cursor": 6}
+
+    await checkpoint.flush()
+    await checkpoint.flush()
+    assert store.saved == [3, 6, 7]
+
+
+async def test_flushes_after_flush_interval(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(cursor.time, "monotonic", lambda: now)
+    store = MemoryCursorStore()
+    checkpoint = CursorCheckpointer(store, Client(), flush_every=100, flush_interval=5)
+
+    await checkpoint.advance(1)
+    now += 4.9
+    await checkpoint.advance(2)
+    assert store.saved == []
+    now += 0.1
+    await checkpoint.advance(3)
+    assert store.saved == [3]
+
+
+async def test_cursor_is_saved_only_after_sync_returns():
+    events: list[str] = []
+    store = MemoryCursorStore(events)
+    synced = anyio.Event()
+
+    async def sync() -> None:
+        events.append("sync started")
+        await synced.wait()
+        events.append("sync done")
+
+    checkpoint = CursorCheckpointer(
+        store, Client(), flush_every=1, flush_interval=60, sync=sync
+    )
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(checkpoint.advance, 1)
+        await anyio.sleep(0.01)
+        assert events == ["sync started"]
+        synced.set()
+    assert events == ["sync started", "sync done", "save 1"]
+
+
+async def test_cursor_is_not_saved_when_sync_fails():
+    async def sync() -> None:
+        raise OSError("disk full")
+
+    store, client = MemoryCursorStore(), Client()
+    checkpoint = CursorCheckpointer(
+        store, client, flush_every=1, flush_interval=60, sync=sync
+    )
+    await checkpoint.advance(1)
+
+    assert store.saved == []
+    assert checkpoint.flushed_seq is None
+    assert client.params == {}
@@ -0,0 +1,167 @@
+import hashlib
+
+import libipld
+import pytest
+from atproto import parse_subscribe_repos_message
+from atproto_firehose.models import Frame
+
+from docket_firehose.decode import (
+    cid_length,
+    commit_body_matches,
+    decode_commit_records,
+    iter_car_blocks,
+    matching_ops,
+)
+
+WATCHED = "app.mcp.server"
+RECORD_TYPES = frozenset([WATCHED])
+
+
+def cid(block: bytes) -> bytes:
+    # CIDv1, dag-cbor, sha2-256
+    return bytes([0x01, 0x71, 0x12, 0x20]) + hashlib.sha256(block).digest()
+
+
+def car(*blocks: bytes) -> bytes:
+    header = libipld.encode_dag_cbor({"version": 1, "roots": []})
+    data = bytes([len(header)]) + header
+    for block in blocks:
+        data += bytes([len(cid(block)) + len(block)]) + cid(block) + block
+    return data
+
+
+def commit_body(writes: list[tuple[str, str, dict | None]], **fields) -> dict:
+    """A `#commit` body with one op and block per (action, path, record)."""
+    blocks = [libipld.encode_dag_cbor(record) for _, _, record in writes if record]
+    cids = iter(cid(block) for block in blocks)
+    return {
+        "seq": 1,
+        "repo": "did:plc:test",
+        "rev": "rev",
+        "since": None,
+        "time": "2025-01-01T00:00:00Z",
+        "commit": cid(b"commit"),
+        "blocks": car(*blocks),
+        "ops": [
+            {"action": action, "path": path, "cid": next(cids) if record else None}
+            for action, path, record in writes
+        ],
+        "blobs": [],
+        "rebase": False,
+        "tooBig": False,
+    } | fields
+
+
+def parse(body: dict):
+    return parse_subscribe_repos_message(
+        Frame.from_bytes(
+            libipld.encode_dag_cbor({"op": 1, "t": "#commit"})
+            + libipld.encode_dag_cbor(body)
+        )
+    )
+
+
+def server(name: str) -> dict:
+    return {"$type": WATCHED, "name": name}
+
+
+@pytest.mark.parametrize(
+    "op, matches",
+    [
+        (("create", f"{WATCHED}/a", server("a")), True),
+        (("update", f"{WATCHED}/a", server("a")), True),
+        (("delete", f"{WATCHED}/a", None), False),
+        (("create", "app.bsky.feed.post/a", {"$type": "app.bsky.feed.post"}), False),
+        # a collection that only starts with a watched one
+        (("create", f"{WATCHED}.attestation/a", server("a")), False),
+        (("create", WATCHED, server("a")), True),
+    ],
+)
+def test_single_op(op, matches):
+    body = commit_body([op])
+
+    assert commit_body_matches(body, RECORD_TYPES) is matches
+    assert len(matching_ops(parse(body), RECORD_TYPES)) == int(matches)
+
+
+def test_multi_op_commit():
+    body = commit_body(
+        [
+            ("create", "app.bsky.feed.post/a", {"$type": "app.bsky.feed.post"}),
+            ("create", f"{WATCHED}/a", server("a")),
+            ("delete", f"{WATCHED}/old", None),
+            # listed under a watched collection, but of another type
+            ("create", f"{WATCHED}/odd", {"$type": "app.bsky.feed.like"}),
+            ("update", f"{WATCHED}/b", server("b")),
+        ]
+    )
+    commit = parse(body)
+
+    assert commit_body_matches(body, RECORD_TYPES)
+    assert [op.path for op in matching_ops(commit, RECORD_TYPES)] == [
+        f"{WATCHED}/a",
+        f"{WATCHED}/odd",
+        f"{WATCHED}/b",
+    ]
+    matched = decode_commit_records(commit, RECORD_TYPES)
+    assert [(m.rkey, m.record) for m in matched] == [
+        ("a", server("a")),
+        ("b", server("b")),
+    ]
+    assert matched[0].cid == libipld.encode_cid(
+        cid(libipld.encode_dag_cbor(server("a")))
+    )
+
+
+@pytest.mark.parametrize(
+    "fields",
+    [{"blocks": b""}, {"tooBig": True}, {"ops": []}],
+)
+def test_commits_without_records_to_decode(fields):
+    body = commit_body([("create", f"{WATCHED}/a", server("a"))], **fields)
+
+    assert not commit_body_matches(body, RECORD_TYPES)
+    assert decode_commit_records(parse(body), RECORD_TYPES) == []
+
+
+def test_iter_car_blocks():
+    blocks = [libipld.encode_dag_cbor(server(str(i))) for i in range(3)]
+
+    assert [(c, bytes(b)) for c, b in iter_car_blocks(car(*blocks))] == [
+        (cid(block), block) for block in blocks
+    ]
+    assert list(iter_car_blocks(car())) == []
+
+
+def test_cid_length():
+    digest = hashlib.sha256(b"block").digest()
+
+    assert cid_length(bytes([0x12, 0x20]) + digest, 0) == 34
+    assert cid_length(cid(b"block"), 0) == 36
+    # a two-byte codec varint takes the general path
+    assert cid_length(bytes([0x01, 0xA9, 0x02, 0x12, 0x20]) + digest, 0) == 37
+
+
+@pytest.mark.parametrize(
+    "data, error",
+    [
+        (b"", IndexError),
+        # a varint that never ends
+        (b"\xff\xff", IndexError),
+        # the header runs past the end
+        (b"\x05\xa0", ValueError),
+        # the last section is cut short
+        (car(libipld.encode_dag_cbor(server("a")))[:-1], ValueError),
+    ],
+)
+def test_malformed_car(data, error):
+    with pytest.raises(error):
+        list(iter_car_blocks(data))
+
+
+def test_malformed_blocks_fail_to_decode():
+    body = commit_body([("create", f"{WATCHED}/a", server("a"))])
+    body["blocks"] = body["blocks"][:-1]
+
+    with pytest.raises(ValueError):
+        decode_commit_records(parse(body), RECORD_TYPES)
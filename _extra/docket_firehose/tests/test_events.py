@@ -0,0 +1,45 @@
+import time
+
+import anyio
+import pytest
+
+from docket_firehose.events import RecordEventPublisher
+from docket_firehose.storage import StoredRecord
+
+pytestmark = pytest.mark.anyio
+
+
+class StalledPipeline:
+    """A Redis pipeline whose commands never complete."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    def xadd(self, *args, **kwargs):
+        pass
+
+    async def execute(self):
+        await anyio.sleep_forever()
+
+
+def record(rkey: str) -> StoredRecord:
+    return StoredRecord(1, "did:plc:test", "app.mcp.server", rkey, "cid", "", {})
+
+
+async def test_stalled_redis_does_not_block_publish():
+    publisher = RecordEventPublisher(
+        "redis://localhost:1", "events", maxlen=100, queue_size=2, timeout=0.2
+    )
+    publisher.redis.pipeline = lambda transaction: StalledPipeline()
+
+    start = time.monotonic()
+    async with publisher:
+        for i in range(10):
+            publisher.publish([record(str(i))])
+        assert time.monotonic() - start < 0.1
+        assert publisher.dropped > 0
+    # shutdown gives up on the stalled send after one timeout
+    assert time.monotonic() - start < 1
@@ -0,0 +1,144 @@
+import logging
+from datetime import UTC, datetime, timedelta
+
+import anyio
+import pytest
+from prometheus_client import CollectorRegistry, Histogram
+from prometheus_client.parser import text_string_to_metric_families
+
+from docket_firehose import metrics
+from docket_firehose.decode import MatchedRecord
+from docket_firehose.metrics import (
+    BUCKETS,
+    METRICS,
+    Metrics,
+    MetricsExporter,
+    SavedRecordLog,
+    StageHistogram,
+)
+
+pytestmark = pytest.mark.anyio
+
+# on, just below and just above bucket bounds, and past the last one
+TIMINGS = [0.0, 0.00001, 0.0000101, 0.0009999, 0.001, 0.5, 30.0, 30.1, 1000.0]
+
+
+def registry_of(collector) -> CollectorRegistry:
+    registry = CollectorRegistry()
+    registry.register(collector)
+    return registry
+
+
+def test_stage_histogram_buckets_like_prometheus():
+    ours = StageHistogram()
+    theirs = Histogram("stage_seconds", "", buckets=BUCKETS, registry=None)
+    for seconds in TIMINGS:
+        ours.observe(seconds)
+        theirs.observe(seconds)
+
+    (family,) = theirs.collect()
+    expected = [
+        (sample.labels["le"], int(sample.value))
+        for sample in family.samples
+        if sample.name.endswith("_bucket")
+    ]
+    assert [(float(le), n) for le, n in ours.cumulative()] == [
+        (float(le), n) for le, n in expected
+    ]
+    assert ours.cumulative()[-1] == ("+Inf", len(TIMINGS))
+    assert ours.sum == pytest.approx(sum(TIMINGS))
+
+
+def test_collect():
+    collected = Metrics()
+    collected.frames = 10
+    collected.commits = 7
+    collected.matched["app.mcp.server"] += 2
+    collected.error("cursor")
+    collected.error("cursor")
+    collected.records_processed = 5
+    collected.observe("parse", 0.002)
+    collected.last_commit_time = (datetime.now(UTC) - timedelta(seconds=30)).isoformat()
+    collected.track_queue("write", lambda: 3)
+    collected.track_queue("broken", lambda: 1 // 0)
+    registry = registry_of(collected)
+
+    def sample(name: str, **labels: str) -> float | None:
+        return registry.get_sample_value(name, labels)
+
+    assert sample("firehose_frames_total") == 10
+    assert sample("firehose_commits_total") == 7
+    assert sample("firehose_matched_records_total", collection="app.mcp.server") == 2
+    assert sample("firehose_errors_total", stage="cursor") == 2
+    assert sample("reputation_records_processed_total") == 5
+    assert sample("firehose_stage_seconds_bucket", stage="parse", le="0.001") == 0
+    assert sample("firehose_stage_seconds_bucket", stage="parse", le="0.003") == 1
+    assert sample("firehose_stage_seconds_count", stage="write") == 0
+    assert 30 <= sample("firehose_lag_seconds") < 40
+    # a queue that can't report its depth is left out of the scrape
+    assert sample("firehose_queue_depth", queue="write") == 3
+    assert sample("firehose_queue_depth", queue="broken") is None
+
+
+@pytest.mark.parametrize(
+    "last_commit_time, lag",
+    [(None, None), ("not a time", None), ("2025-01-01T00:00:00", 1.0)],
+)
+def test_lag_seconds(monkeypatch, last_commit_time, lag):
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2025, 1, 1, 0, 0, 1, tzinfo=tz)
+
+    monkeypatch.setattr(metrics, "datetime", FrozenDatetime)
+    collected = Metrics()
+    collected.last_commit_time = last_commit_time
+
+    # commit times without a zone are taken as UTC
+    assert collected.lag_seconds == lag
+
+
+async def test_exporter_writes_the_file_periodically_and_on_exit(tmp_path):
+    path = tmp_path / "metrics" / "firehose.prom"
+
+    def frames() -> float:
+        (family,) = (
+            family
+            for family in text_string_to_metric_families(path.read_text())
+            if family.name == "firehose_frames"
+        )
+        return family.samples[0].value
+
+    start = METRICS.frames
+    async with MetricsExporter(port=0, path=anyio.Path(path), interval=0.05):
+        await anyio.sleep(0.2)
+        assert frames() == start
+        METRICS.frames += 1
+    assert frames() == start + 1
+
+
+def test_saved_record_log(monkeypatch, caplog):
+    now = 1000.0
+    monkeypatch.setattr(metrics.time, "monotonic", lambda: now)
+    log = SavedRecordLog(logging.getLogger("test"), interval=60)
+
+    def matched(collection: str, name: str) -> MatchedRecord:
+        return MatchedRecord(collection, name, "cid", {"name": name})
+
+    with caplog.at_level(logging.INFO, logger="test"):
+        log.add([matched("app.mcp.server", "first"), matched("app.mcp.tool", "t")])
+        log.add([matched("app.mcp.server", "second")])
+        now += 59
+        log.add([])
+        assert caplog.messages == []
+
+        now += 1
+        log.add([])
+        assert caplog.messages == [
+            "Saved 2 app.mcp.server, 1 app.mcp.tool in the last 60s (e.g. first)"
+        ]
+
+        # an empty period logs nothing
+        now += 60
+        log.flush()
+        assert len(caplog.messages) == 1
@@ -0,0 +1,71 @@
+import hashlib
+
+import anyio
+import libipld
+import pytest
+from atproto_firehose.models import Frame
+
+from docket_firehose.pipeline import DecodePipeline
+
+pytestmark = pytest.mark.anyio
+
+WATCHED = "app.mcp.server"
+
+
+def cid(block: bytes) -> bytes:
+    # CIDv1, dag-cbor, sha2-256
+    return bytes([0x01, 0x71, 0x12, 0x20]) + hashlib.sha256(block).digest()
+
+
+def commit_frame(seq: int, collection: str, broken: bool = False) -> Frame:
+    record = libipld.encode_dag_cbor({"$type": collection, "name": f"server-{seq}"})
+    header = libipld.encode_dag_cbor({"version": 1, "roots": []})
+    car = bytes([len(header)]) + header
+    car += bytes([len(cid(record)) + len(record)]) + cid(record) + record
+    body = {
+        "seq": seq,
+        "repo": "did:plc:test",
+        "rev": "rev",
+        "since": None,
+        "time": "2025-01-01T00:00:00Z",
+        "commit": cid(record),
+        "blocks": b"\xff\xff" if broken else car,
+        "ops": [
+            {"action": "create", "path": f"{collection}/{seq}", "cid": cid(record)}
+        ],
+        "blobs": [],
+        "rebase": False,
+        "tooBig": False,
+    }
+    return Frame.from_bytes(
+        libipld.encode_dag_cbor({"op": 1, "t": "#commit"})
+        + libipld.encode_dag_cbor(body)
+    )
+
+
+async def test_frames_are_committed_in_order():
+    frames = [
+        commit_frame(seq, WATCHED if seq % 7 == 0 else "app.bsky.feed.post", seq == 21)
+        for seq in range(200)
+    ]
+    committed: list[int] = []
+    names: list[str] = []
+
+    async def on_frame(decoded):
+        committed.append(decoded.seq)
+        names.extend(match.record["name"] for match in decoded.records)
+        if decoded.seq % 3 == 0:
+            await anyio.sleep(0)
+
+    with anyio.fail_after(30):
+        async with DecodePipeline(
+            frozenset([WATCHED]), on_frame, workers=2, queue_size=5
+        ) as pipeline:
+            for frame in frames:
+                await pipeline.submit(frame)
+
+    # the frame that fails to decode is skipped and counted
+    assert committed == [seq for seq in range(200) if seq != 21]
+    assert pipeline.dropped == 1
+    assert pipeline.committed_seq == 199
+    assert names == [f"server-{seq}" for seq in range(0, 200, 7) if seq != 21]
@@ -0,0 +1,126 @@
+from datetime import UTC, datetime, timedelta
+
+import anyio
+import numpy as np
+import pytest
+
+from docket_firehose.crawler import BACKFILL_LOG, BACKFILL_SEQ
+from docket_firehose.metrics import METRICS
+from docket_firehose.reputation import partitioned_reputation_from_settings
+from docket_firehose.storage import MAIN_LOG, SegmentLogStore, StoredRecord
+from docket_firehose.tasks import process
+from docket_firehose.utils import US_PER_DAY
+
+pytestmark = pytest.mark.anyio
+
+COLLECTION = "app.mcp.server"
+DIDS = [f"did:plc:{i}" for i in range(40)]
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+
+def record(did: str, day: int, seq: int) -> StoredRecord:
+    return StoredRecord(
+        seq=seq,
+        did=did,
+        collection=COLLECTION,
+        rkey="self",
+        cid="cid",
+        time=f"2025-01-{day:02d}T00:00:00Z",
+        record={"name": f"{did} on day {day}"},
+    )
+
+
+async def write(root: anyio.Path, log: str, records: list[StoredRecord]) -> None:
+    store = SegmentLogStore(root, log=log)
+    try:
+        await store.append(records)
+    finally:
+        await store.aclose()
+
+
+async def servers() -> dict:
+    stores = partitioned_reputation_from_settings(process.settings)
+    try:
+        return await stores.get_many([(did, "self") for did in DIDS])
+    finally:
+        await stores.aclose()
+
+
+async def test_partitions_read_the_log_once(tmp_path, monkeypatch):
+    root = anyio.Path(tmp_path / "firehose")
+    monkeypatch.setattr(process.settings, "firehose_data_path", root)
+    monkeypatch.setattr(process.settings, "reputation_partitions", 4)
+    monkeypatch.setattr(
+        process.settings, "reputation_db", anyio.Path(tmp_path / "partitioned.db")
+    )
+    await write(root, MAIN_LOG, [record(did, 5, i) for i, did in enumerate(DIDS)])
+    await write(root, BACKFILL_LOG, [record(did, 1, BACKFILL_SEQ) for did in DIDS])
+
+    reads = 0
+    read = SegmentLogStore.read
+
+    def counted(self, *args, **kwargs):
+        nonlocal reads
+        reads += 1
+        return read(self, *args, **kwargs)
+
+    monkeypatch.setattr(SegmentLogStore, "read", counted)
+
+    processed = METRICS.records_processed
+    # partition 0 gets ahead of the others, so the next pass starts from
+    # different watermarks
+    await process.process_saved_records(COLLECTION, partitions=[0])
+    await process.process_saved_records(COLLECTION)
+    await write(
+        root, MAIN_LOG, [record(did, 20, 100 + i) for i, did in enumerate(DIDS[::3])]
+    )
+    await process.process_saved_records(COLLECTION)
+    assert reads == 3
+    # and no record was folded twice
+    assert METRICS.records_processed - processed == 2 * len(DIDS) + len(DIDS[::3])
+    partitioned = await servers()
+
+    monkeypatch.setattr(process.settings, "reputation_partitions", 1)
+    monkeypatch.setattr(
+        process.settings, "reputation_db", anyio.Path(tmp_path / "single.db")
+    )
+    await process.process_saved_records(COLLECTION)
+    assert partitioned == await servers()
+
+    assert len(partitioned) == len(DIDS)
+    assert all(s.last_seen > s.first_seen for s in partitioned.values())
+    assert partitioned["did:plc:0", "self"].name == "did:plc:0 on day 20"
+
+
+@pytest.mark.parametrize(
+    ("base_score", "max_age_score", "max_age_days"),
+    [(0.1, 0.85, 60), (0.1, 0.9, 30), (0.15, 0.7, 7)],
+)
+def test_vectorized_scores_match_the_scalar_function(
+    monkeypatch, base_score, max_age_score, max_age_days
+):
+    monkeypatch.setattr(process.settings, "base_reputation_score", base_score)
+    monkeypatch.setattr(process.settings, "max_age_score", max_age_score)
+    monkeypatch.setattr(process.settings, "max_age_days", max_age_days)
+
+    # every whole age from before first_seen to past the cap, each a
+    # microsecond either side of the day boundary, where flooring and
+    # rounding halves (e.g. 0.1 + 15 / 60 * 0.85 = 0.3125) go wrong first
+    first_seen = 1_700_000_000_123_456
+    last_seen = np.array(
+        [
+            first_seen + days * US_PER_DAY + offset
+            for days in range(-2, max_age_days + 3)
+            for offset in (-1, 0, 1)
+        ]
+    )
+    first = np.full_like(last_seen, first_seen)
+
+    def iso(us: int) -> str:
+        return (EPOCH + timedelta(microseconds=us)).isoformat()
+
+    scalar = [
+        process.calculate_longevity_score(iso(first_seen), iso(last))
+        for last in last_seen.tolist()
+    ]
+    assert process.calculate_longevity_scores(first, last_seen).tolist() == scalar
@@ -0,0 +1,60 @@
+from datetime import UTC, datetime, timedelta
+
+import anyio
+import pytest
+
+from docket_firehose.reputation import ReputationStore, ServerReputation
+from docket_firehose.tasks import process
+from docket_firehose.utils import US_PER_DAY
+
+pytestmark = pytest.mark.anyio
+
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+FIRST_SEEN = 1_700_000_000_000_000
+
+
+def _iso(us: int) -> str:
+    return (EPOCH + timedelta(microseconds=us)).isoformat()
+
+
+@pytest.mark.parametrize(
+    ("base_score", "max_age_score", "max_age_days"),
+    [(0.1, 0.85, 60), (0.15, 0.9, 30), (0.05, 0.7, 7)],
+)
+async def test_recomputed_scores_match_python(
+    tmp_path, monkeypatch, base_score, max_age_score, max_age_days
+):
+    monkeypatch.setattr(process.settings, "base_reputation_score", base_score)
+    monkeypatch.setattr(process.settings, "max_age_score", max_age_score)
+    monkeypatch.setattr(process.settings, "max_age_days", max_age_days)
+
+    # every whole age up to past the cap, each just before and just after a
+    # day boundary, where flooring and rounding are easiest to get wrong
+    last_seen = [
+        FIRST_SEEN + days * US_PER_DAY + offset
+        for days in range(max_age_days + 5)
+        for offset in (-1, 0, 1)
+    ]
+    servers = [
+        ServerReputation(f"did:plc:{i}", "self", "", FIRST_SEEN, last, 0.0)
+        for i, last in enumerate(last_seen)
+    ]
+
+    store = ReputationStore(
+        anyio.Path(tmp_path / "reputation.db"), base_score, max_age_score, max_age_days
+    )
+    try:
+        assert await store.upsert(servers, "app.mcp.server", None, None)
+        await store.recompute_scores()
+        stored = await store.get_many([(s.did, s.rkey) for s in servers])
+    finally:
+        await store.aclose()
+
+    expected = process.calculate_longevity_scores(
+        [s.first_seen for s in servers], [s.last_seen for s in servers]
+    ).tolist()
+    assert [stored[s.did, s.rkey].reputation_score for s in servers] == expected
+    assert expected == [
+        process.calculate_longevity_score(_iso(s.first_seen), _iso(s.last_seen))
+        for s in servers
+    ]
@@ -0,0 +1,95 @@
+import pytest
+
+from docket_firehose.crawler import BACKFILL_LOG, BACKFILL_SEQ
+from docket_firehose.reputation import ReputationStore
+from docket_firehose.storage import SegmentLogStore, StoredRecord
+
+pytestmark = pytest.mark.anyio
+
+COLLECTION = "app.mcp.server"
+
+
+def record(rkey: str, seq: int) -> StoredRecord:
+    return StoredRecord(
+        seq=seq,
+        did="did:plc:test",
+        collection=COLLECTION,
+        rkey=rkey,
+        cid="cid",
+        time="2025-01-01T00:00:00Z",
+        record={"name": rkey},
+    )
+
+
+async def read(store: SegmentLogStore, after=None):
+    position, rkeys = after, []
+    async for position, stored in store.read(COLLECTION, after=after):
+        rkeys.append(stored.rkey)
+    return position, rkeys
+
+
+async def test_backfill_does_not_hide_later_firehose_records(tmp_path):
+    consumer = SegmentLogStore(tmp_path)
+    backfill = SegmentLogStore(tmp_path, log=BACKFILL_LOG)
+    try:
+        await consumer.append([record("a", 1)])
+        await consumer.flush()
+        await backfill.append([record("b", BACKFILL_SEQ)])
+        await backfill.flush()
+
+        position, rkeys = await read(consumer)
+        assert sorted(rkeys) == ["a", "b"]
+
+        await consumer.append([record("c", 2)])
+        await consumer.flush()
+        assert (await read(consumer, position))[1] == ["c"]
+    finally:
+        await consumer.aclose()
+        await backfill.aclose()
+
+
+async def test_one_writer_per_log(tmp_path):
+    first = SegmentLogStore(tmp_path)
+    second = SegmentLogStore(tmp_path)
+    try:
+        await first.append([record("a", 1)])
+        with pytest.raises(RuntimeError, match="already being written"):
+            await second.append([record("b", 2)])
+    finally:
+        await first.aclose()
+        await second.aclose()
+
+
+async def test_watermark_round_trip(tmp_path):
+    store = SegmentLogStore(tmp_path)
+    backfill = SegmentLogStore(tmp_path, log=BACKFILL_LOG)
+    reputation = ReputationStore(tmp_path / "reputation.db", 0.1, 0.9, 30)
+    try:
+        await store.append([record("a", 1)])
+        await backfill.append([record("b", BACKFILL_SEQ)])
+        await store.flush()
+        await backfill.flush()
+        position, _ = await read(store)
+
+        assert await reputation.upsert([], COLLECTION, position, None)
+        assert await reputation.get_watermark(COLLECTION) == position
+        assert not await reputation.upsert([], COLLECTION, position, None)
+    finally:
+        await store.aclose()
+        await backfill.aclose()
+        await reputation.aclose()
+
+
+async def test_only_log_segments_are_written(tmp_path):
+    store = SegmentLogStore(tmp_path)
+    try:
+        await store.append([record("a", 1), record("b", 2)])
+        await store.flush()
+    finally:
+        await store.aclose()
+
+    assert sorted(p.suffix for p in tmp_path.rglob("*") if p.is_file()) == [
+        ".lock",
+        ".log",
+    ]
+    assert (await read(store))[1] == ["a", "b"]
@@ -0,0 +1,102 @@
+import anyio
+import pytest
+
+from docket_firehose.storage import StoredRecord
+from docket_firehose.writer import RecordWriter
+
+pytestmark = pytest.mark.anyio
+
+
+class MemoryStore:
+    """A record store that syncs every `fsync_every` records, like the real one."""
+
+    def __init__(self, fsync_every: int = 100, fsync_interval: float = 10.0) -> None:
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.batches: list[list[str]] = []
+        self.written = 0
+        self.durable = 0
+        self.syncs = 0
+        self.open = anyio.Event()
+        self.open.set()
+
+    async def append(self, records: list[StoredRecord]) -> None:
+        await self.open.wait()
+        self.batches.append([record.rkey for record in records])
+        self.written += len(records)
+        if self.written - self.durable >= self.fsync_every:
+            await self.flush()
+
+    async def flush(self) -> None:
+        self.durable = self.written
+        self.syncs += 1
+
+
+def record(rkey: str) -> StoredRecord:
+    return StoredRecord(1, "did:plc:test", "app.mcp.server", rkey, "cid", "", {})
+
+
+async def test_queued_commits_are_batched():
+    store = MemoryStore()
+    store.open = anyio.Event()
+    async with RecordWriter(store, queue_size=10, batch_size=3) as writer:
+        # commits queue up while the first one's append is stuck
+        for i in range(6):
+            await writer.put([record(str(i))])
+        await anyio.sleep(0.01)
+        store.open.set()
+    assert store.batches == [["0"], ["1", "2", "3"], ["4", "5"]]
+
+
+async def test_put_blocks_when_the_queue_is_full():
+    store = MemoryStore()
+    store.open = anyio.Event()
+    async with RecordWriter(store, queue_size=2, batch_size=1) as writer:
+        # the writer holds the first commit while its append is stuck
+        for i in range(3):
+            await writer.put([record(str(i))])
+        await anyio.sleep(0.01)
+        assert writer.queue_depth == 2
+        with anyio.move_on_after(0.1) as scope:
+            await writer.put([record("3")])
+        assert scope.cancelled_caught
+        store.open.set()
+    assert [rkey for batch in store.batches for rkey in batch] == ["0", "1", "2"]
+
+
+async def test_flush_waits_for_earlier_records_to_be_durable():
+    store = MemoryStore()
+    async with RecordWriter(store, queue_size=10, batch_size=2) as writer:
+        for i in range(5):
+            await writer.put([record(str(i))])
+        await writer.flush()
+        assert store.durable == 5
+        await writer.put([record("5")])
+    assert store.written == 6
+
+
+async def test_records_are_passed_on_after_the_store_syncs_them():
+    store = MemoryStore(fsync_every=3, fsync_interval=0.2)
+    published: list[list[str]] = []
+
+    def on_written(records: list[StoredRecord]) -> None:
+        assert store.durable == store.written
+        published.append([record.rkey for record in records])
+
+    async with RecordWriter(
+        store, queue_size=10, batch_size=1, on_written=on_written
+    ) as writer:
+        await writer.put([record("0")])
+        await anyio.sleep(0.05)
+        # written, but waiting for the store's own sync, not flushed per batch
+        assert (store.batches, store.syncs, published) == ([["0"]], 0, [])
+
+        for i in (1, 2):
+            await writer.put([record(str(i))])
+        await anyio.sleep(0.05)
+        assert (store.syncs, published) == (1, [["0", "1", "2"]])
+
+        # nothing more arrives, so the writer syncs the rest itself
+        await writer.put([record("3")])
+        await anyio.sleep(0.5)
+        assert (store.syncs, published) == (2, [["0", "1", "2"], ["3"]])
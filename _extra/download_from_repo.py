@@ -7,7 +7,7 @@ import argparse
 from functools import partial
 
 import anyio
-from atproto import Client, models
+from atproto import AsyncClient, models
 
 BASE_PATH = anyio.Path(__file__).parent / "data"
 
@@ -27,17 +27,29 @@ async def _save_record(
     print(f"saved: {filepath}")
 
 
-async def download_repo_for_did(did: str, collection: str, limit: int = 5) -> None:
-    """Download records for a specific DID and collection."""
+async def download_repo_for_did(
+    did: str, collection: str, limit: int = 5, client: AsyncClient | None = None
+) -> None:
+    """Download records for a specific DID and collection.
+
+    A client created here is closed again before returning; a client passed
+    in is left open for the caller to reuse.
+    """
+    if client is None:
+        client = AsyncClient()
+        try:
+            return await download_repo_for_did(did, collection, limit, client)
+        finally:
+            await client.request.close()
+
     collection_path = await _get_collection_path(did, collection)
-    client = Client()
 
     cursor = None
     total_fetched = 0
     batch_size = min(50, limit) if limit > 0 else 50
 
     while total_fetched < limit or limit == 0:
-        response = client.com.atproto.repo.list_records(
+        response = await client.com.atproto.repo.list_records(
             {
                 "repo": did,
                 "collection": collection,
@@ -63,17 +75,32 @@ async def download_repo_for_did(did: str, collection: str, limit: int = 5) -> No
 
 
 async def download_collections(
-    did: str, collections: list[str], limit: int = 5
+    dids: list[str], collections: list[str], limit: int = 5, concurrency: int = 8
 ) -> None:
-    async with anyio.create_task_group() as tg:
-        for collection in collections:
-            tg.start_soon(download_repo_for_did, did, collection, limit)
+    """Download each collection of each DID, `concurrency` requests at a time."""
+    client = AsyncClient()
+    limiter = anyio.CapacityLimiter(concurrency)
+
+    async def download(did: str, collection: str) -> None:
+        async with limiter:
+            await download_repo_for_did(did, collection, limit, client)
+
+    try:
+        async with anyio.create_task_group() as tg:
+            for did in dids:
+                for collection in collections:
+                    tg.start_soon(download, did, collection)
+    finally:
+        await client.request.close()
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Download ATProto repository records")
     parser.add_argument(
-        "--did", default="did:plc:xbtmt2zjwlrfegqvch7fboei", help="DID to download from"
+        "--did",
+        nargs="+",
+        default=["did:plc:xbtmt2zjwlrfegqvch7fboei"],
+        help="DIDs to download from",
     )
     parser.add_argument(
         "--collection",
@@ -91,6 +118,13 @@ if __name__ == "__main__":
     parser.add_argument(
         "--collections", "-C", nargs="+", help="Multiple collections to download"
     )
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Requests to make at once"
+    )
     args = parser.parse_args()
     collections = args.collections if args.collections else [args.collection]
-    anyio.run(partial(download_collections, args.did, collections, args.limit))
+    anyio.run(
+        partial(
+            download_collections, args.did, collections, args.limit, args.concurrency
+        )
+    )
@@ -2,42 +2,135 @@
 # dependencies = ["cloudpickle"]
 # ///
 
+import hashlib
 import importlib.util
-import re
+import io
+import json
+import os
+import pickle
+import shutil
+import struct
 import subprocess
 import sys
 import tomllib
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import IO, Any
+
+import cloudpickle
+
+# one environment per distinct dependency block, shared by every script with it
+ENV_CACHE_DIR = Path(
+    os.environ.get("MCPROTO_ENV_CACHE_DIR", "~/.cache/mcproto/envs")
+).expanduser()
+
+# installed into every environment, so its worker can receive functions
+_WORKER_DEPENDENCIES = ["cloudpickle"]
+
+_HEADER = struct.Struct(">I")
+
+
+def _block_type(line: str) -> str | None:
+    """The type of a `# /// <type>` line that opens a metadata block."""
+    if not line.startswith("# /// "):
+        return None
+    block_type = line[6:]
+    if block_type and all(
+        c.isascii() and (c.isalnum() or c == "-") for c in block_type
+    ):
+        return block_type
+    return None
+
+
+def _metadata_block(lines: Iterable[str], block_type: str) -> list[str] | None:
+    """Return the comment lines of the first `# /// <block_type>` block.
+
+    A single pass over the lines that stops at the end of the block. After
+    an opening line every line must be `#` or start with `# `, and a block
+    closes at the last `# ///` before the first line that isn't. Blocks of
+    other types are skipped the same way, so they hide any block nested
+    inside them, as in the PEP 723 reference implementation.
+    """
+    current: str | None = None
+    block: list[str] = []
+    end: int | None = None
+    for line in lines:
+        if current is not None:
+            if line == "#" or line.startswith("# "):
+                # the content can't be empty
+                if line == "# ///" and block:
+                    end = len(block)
+                block.append(line)
+                continue
+            if end is not None and current == block_type:
+                return block[:end]
+            current = None
+        if (current := _block_type(line)) is not None:
+            block, end = [], None
+    if end is not None and current == block_type:
+        return block[:end]
+    return None
 
 
 def parse_script_metadata(script_content: str) -> dict[str, Any] | None:
-    metadata_pattern = (
-        r"(?m)^# /// (?P<type>[a-zA-Z0-9-]+)$\s(?P<content>(^#(| .*)$\s)+)^# ///$"
-    )
-    matches = [
-        match
-        for match in re.finditer(metadata_pattern, script_content)
-        if match.group("type") == "script"
-    ]
-    if not matches:
+    lines = (line.rstrip("\r\n") for line in io.StringIO(script_content))
+    block = _metadata_block(lines, "script")
+    if block is None:
         return None
+    return tomllib.loads("\n".join(line[2:] for line in block))
+
+
+# path -> ((mtime, size), metadata) of every script read so far
+_metadata_cache: dict[Path, tuple[tuple[int, int], dict[str, Any] | None]] = {}
+
 
-    match = matches[0]
-    content_lines = match.group("content").splitlines()
-    toml_content = ""
-    for line in content_lines:
-        if line.startswith("# "):
-            toml_content += line[2:] + "\n"
-        elif line == "#":
-            toml_content += "\n"
+def read_script_metadata(path: Path) -> dict[str, Any] | None:
+    """Parse a script's metadata, reusing the result while the file is unchanged.
 
-    return tomllib.loads(toml_content)
+    Only the lines up to the end of the metadata block are read.
+    """
+    path = path.absolute()
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    if (cached := _metadata_cache.get(path)) and cached[0] == version:
+        return cached[1]
+
+    with path.open(encoding="utf-8") as f:
+        block = _metadata_block((line.rstrip("\r\n") for line in f), "script")
+    metadata = (
+        tomllib.loads("\n".join(line[2:] for line in block))
+        if block is not None
+        else None
+    )
+    _metadata_cache[path] = (version, metadata)
+    return metadata
+
+
+def read_directory_metadata(
+    directory: Path, pattern: str = "*.py", max_workers: int | None = None
+) -> dict[Path, dict[str, Any] | Exception | None]:
+    """Read the metadata of every matching script, several files at a time.
+
+    A script whose metadata can't be read maps to the exception instead.
+    """
+
+    def read(path: Path) -> dict[str, Any] | Exception | None:
+        try:
+            return read_script_metadata(path)
+        except (OSError, UnicodeDecodeError, tomllib.TOMLDecodeError) as e:
+            return e
+
+    paths = sorted(directory.glob(pattern))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(read, paths)))
 
 
 def load_module(path: Path | str) -> Any:
     path = Path(path)
-    spec = importlib.util.spec_from_file_location(path.stem, path)
+    # a unique name, so scripts loaded into one worker don't replace each other
+    name = f"{path.stem}_{hashlib.sha256(str(path).encode()).hexdigest()[:8]}"
+    spec = importlib.util.spec_from_file_location(name, path)
     if not spec or not spec.loader:
         raise ImportError(f"Could not load {path}")
 
@@ -46,23 +139,200 @@ def load_module(path: Path | str) -> Any:
     return module
 
 
+def environment_key(metadata: dict[str, Any] | None) -> str:
+    """Hash what determines a script's environment: its dependencies and Python."""
+    metadata = metadata or {}
+    requirements = {
+        "dependencies": sorted(
+            " ".join(dep.split()) for dep in metadata.get("dependencies", [])
+        ),
+        "requires-python": metadata.get("requires-python"),
+    }
+    canonical = json.dumps(requirements, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def _python_in(env_dir: Path) -> Path:
+    if sys.platform == "win32":
+        return env_dir / "Scripts" / "python.exe"
+    return env_dir / "bin" / "python"
+
+
+def ensure_environment(
+    metadata: dict[str, Any] | None, cache_dir: Path = ENV_CACHE_DIR
+) -> Path:
+    """Return the Python of the cached environment for `metadata`, building it once."""
+    env_dir = cache_dir / environment_key(metadata)
+    python = _python_in(env_dir)
+    if python.exists():
+        return python
+
+    metadata = metadata or {}
+    # build beside the cache entry and move it in, so a half-built environment
+    # is never picked up and concurrent builders don't collide
+    build_dir = cache_dir / f"{env_dir.name}.{os.getpid()}.tmp"
+    shutil.rmtree(build_dir, ignore_errors=True)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    venv = ["uv", "venv", "--quiet", str(build_dir)]
+    if requires_python := metadata.get("requires-python"):
+        venv += ["--python", requires_python]
+    try:
+        subprocess.run(venv, check=True, capture_output=True, text=True)
+        subprocess.run(
+            [
+                "uv",
+                "pip",
+                "install",
+                "--quiet",
+                "--python",
+                str(_python_in(build_dir)),
+                *_WORKER_DEPENDENCIES,
+                *metadata.get("dependencies", []),
+            ],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        build_dir.rename(env_dir)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Cannot build environment: {e.stderr}") from e
+    except OSError:
+        # someone else finished building the same environment first
+        if not python.exists():
+            raise
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+    return python
+
+
+def _send(stream: IO[bytes], payload: bytes) -> None:
+    stream.write(_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def _receive(stream: IO[bytes]) -> bytes | None:
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        return None
+    return stream.read(_HEADER.unpack(header)[0])
+
+
+class ScriptWorker:
+    """A long-lived interpreter in one environment that loads scripts on request.
+
+    Modules imported by one script stay imported, so scripts sharing an
+    environment only pay for their common dependencies once.
+    """
+
+    def __init__(self, python: Path) -> None:
+        self.python = python
+        self.process = subprocess.Popen(
+            [str(python), __file__, "--worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def inspect(self, script_path: Path, inspector: Callable[[Any], Any]) -> Any:
+        """Load `script_path` in the worker and return `inspector(module)`.
+
+        `inspector` runs in the worker, so it should return plain data rather
+        than objects from the script's dependencies.
+        """
+        assert self.process.stdin and self.process.stdout
+        _send(
+            self.process.stdin,
+            cloudpickle.dumps((str(script_path.resolve()), inspector)),
+        )
+        reply = _receive(self.process.stdout)
+        if reply is None:
+            raise RuntimeError(f"Worker for {self.python} exited")
+        ok, value = pickle.loads(reply)
+        if not ok:
+            raise RuntimeError(f"Cannot inspect {script_path}: {value}")
+        return value
+
+    def close(self) -> None:
+        if self.process.stdin:
+            self.process.stdin.close()
+        self.process.wait()
+
+
+class WorkerPool:
+    """One `ScriptWorker` per environment, created the first time it's needed."""
+
+    def __init__(self, cache_dir: Path = ENV_CACHE_DIR) -> None:
+        self.cache_dir = cache_dir
+        self.workers: dict[str, ScriptWorker] = {}
+
+    def inspect(self, script_path: Path, inspector: Callable[[Any], Any]) -> Any:
+        metadata = read_script_metadata(script_path)
+        key = environment_key(metadata)
+        if key not in self.workers:
+            python = ensure_environment(metadata, self.cache_dir)
+            self.workers[key] = ScriptWorker(python)
+        return self.workers[key].inspect(script_path, inspector)
+
+    def inspect_many(
+        self, script_paths: Iterable[Path], inspector: Callable[[Any], Any]
+    ) -> dict[Path, Any]:
+        """Inspect each script, or record the exception that stopped it."""
+        results: dict[Path, Any] = {}
+        for script_path in script_paths:
+            try:
+                results[script_path] = self.inspect(script_path, inspector)
+            except Exception as e:
+                results[script_path] = e
+        return results
+
+    def close(self) -> None:
+        for worker in self.workers.values():
+            worker.close()
+        self.workers.clear()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def _serve() -> None:
+    """Answer `ScriptWorker.inspect` requests until stdin closes."""
+    # keep the protocol on the original stdout and send anything the
+    # scripts print to stderr instead
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = sys.stdin.buffer
+
+    while (request := _receive(requests)) is not None:
+        script_path, inspector = pickle.loads(request)
+        try:
+            reply = (True, inspector(load_module(script_path)))
+        except BaseException as e:
+            reply = (False, f"{type(e).__name__}: {e}")
+        _send(channel, cloudpickle.dumps(reply))
+
+
+def describe_server(module: Any) -> dict[str, Any]:
+    """Summarise a script's MCP server object, as in `mcp run`."""
+    for name in ("mcp", "server", "app"):
+        if (server := getattr(module, name, None)) is not None:
+            return {
+                "object": name,
+                "name": server.name,
+                "dependencies": getattr(server, "dependencies", []),
+            }
+    raise LookupError("No server object found")
+
+
 if __name__ == "__main__":
-    script_path = Path("servers/fetch.py")
-    metadata = parse_script_metadata(script_path.read_text())
-    print(f"Script metadata: {metadata}")
-
-    # Re-run this script with dependencies
-    if metadata and "dependencies" in metadata:
-        cmd = [sys.executable]  # current Python interpreter
-        for dep in metadata["dependencies"]:
-            cmd.extend(["--with", dep])
-        cmd.append(__file__)
-
-        result = subprocess.run(["uv", "run", *cmd[1:]], capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Error installing dependencies: {result.stderr}", file=sys.stderr)
-            sys.exit(1)
-
-    module = load_module(script_path)
-    print(f"Server object: {module.server}")
-    print(f"Server dependencies: {module.server.dependencies}")
+    if sys.argv[1:] == ["--worker"]:
+        _serve()
+        sys.exit()
+
+    target = Path(sys.argv[1] if len(sys.argv) > 1 else "servers")
+    scripts = sorted(target.glob("*.py")) if target.is_dir() else [target]
+
+    with WorkerPool() as pool:
+        for script_path, result in pool.inspect_many(scripts, describe_server).items():
+            print(f"{script_path}: {result}")
@@ -0,0 +1,60 @@
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.script_metadata import regex_parse
+from obj_from_process import parse_script_metadata, read_script_metadata
+
+SCRIPT = """\
+# /// script
+# dependencies = ["httpx"]
+# ///
+"""
+
+CASES = {
+    "basic": SCRIPT + "import httpx\n",
+    "no block": "import httpx\n",
+    "empty content": "# /// script\n# ///\n",
+    "blank content": "# /// script\n#\n# ///\n",
+    "at end of file": SCRIPT.rstrip("\n"),
+    "unclosed": "# /// script\n# dependencies = []\ncode\n",
+    "unclosed twice": "# /// script\n" * 3 + "code\n",
+    "closed after code": "# /// script\ncode\n# ///\n",
+    # the block runs to the last closing line, so neither parses as TOML
+    "closing line in the content": "# /// script\n# a = 1\n# ///\n# b = 2\n# ///\n",
+    "two adjacent blocks": SCRIPT + '# /// script\n# dependencies = ["rich"]\n# ///\n',
+    "two blocks": SCRIPT + '\n# /// script\n# dependencies = ["rich"]\n# ///\n',
+    "other type first": "# /// tool\n# x = 1\n# ///\n" + SCRIPT,
+    "nested in another type": (
+        "# /// tool\n# /// script\n# dependencies = []\n# ///\n# ///\n" + SCRIPT
+    ),
+    "only nested": "# /// tool\n# /// script\n# a = 1\n# ///\n# ///\n",
+    "bad type": "# /// sc ript\n# a = 1\n# ///\n" + SCRIPT,
+    "indented": "  # /// script\n  # a = 1\n  # ///\n",
+}
+
+
+def outcome(parse: Callable[[Any], Any], content: Any) -> Any:
+    """What `parse` returns, or the type of what it raises."""
+    try:
+        return parse(content)
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize("content", CASES.values(), ids=CASES.keys())
+def test_matches_the_regex(content):
+    assert outcome(parse_script_metadata, content) == outcome(regex_parse, content)
+
+
+@pytest.mark.parametrize("content", CASES.values(), ids=CASES.keys())
+def test_crlf_files_match_the_regex(tmp_path, content):
+    path = tmp_path / "server.py"
+    path.write_bytes(content.replace("\n", "\r\n").encode())
+
+    assert outcome(read_script_metadata, path) == outcome(regex_parse, path.read_text())
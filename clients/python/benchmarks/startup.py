@@ -0,0 +1,83 @@
+"""Check that the mcproto CLI starts quickly.
+
+Imports `mcproto_client._cli` under `python -X importtime` several times and
+exits non-zero if the median import time is over budget, or if any of the
+slow dependencies that should only load once a registration runs were
+imported at startup. `tests/test_startup.py` checks the same budget as part
+of the test suite; this script also reports the slowest imports and the
+wall time of `mcproto --help`.
+
+Usage:
+    uv run benchmarks/startup.py
+    uv run benchmarks/startup.py --budget-ms 100 --runs 10
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+MODULE = "mcproto_client._cli"
+
+# only needed once servers are actually being registered
+DEFERRED = ("atproto", "atproto_client", "mcp", "httpx")
+
+
+def import_times() -> dict[str, int]:
+    """Import MODULE in a fresh interpreter and return cumulative times in us."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def help_seconds() -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", f"import sys; from {MODULE} import main; main()", "-h"],
+        capture_output=True,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    runs = [import_times() for _ in range(args.runs)]
+    import_ms = statistics.median(run[MODULE] for run in runs) / 1000
+    help_ms = statistics.median(help_seconds() for _ in range(args.runs)) * 1000
+
+    slowest = sorted(runs[-1].items(), key=lambda item: item[1], reverse=True)
+    print(f"import {MODULE}: {import_ms:.1f}ms (budget {args.budget_ms:.0f}ms)")
+    print(f"mcproto --help:  {help_ms:.1f}ms wall")
+    print("slowest imports:")
+    for name, us in slowest[1:11]:
+        print(f"  {us / 1000:8.1f}ms  {name}")
+
+    loaded = sorted({name.split(".")[0] for name in runs[-1]} & set(DEFERRED))
+    failures = []
+    if import_ms > args.budget_ms:
+        failures.append(f"import took {import_ms:.1f}ms")
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+    if failures:
+        raise SystemExit("over budget: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
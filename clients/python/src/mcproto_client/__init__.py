@@ -1,5 +1,38 @@
-from ._git import source_url_from_file_path
-from .atproto import register_server
-from .settings import Settings
+from importlib import import_module
+from typing import TYPE_CHECKING
 
-__all__ = ["source_url_from_file_path", "register_server", "Settings"]
+if TYPE_CHECKING:
+    from ._git import source_url_from_file_path
+    from .atproto import (
+        RegistrationResult,
+        ServerRegistration,
+        register_server,
+        register_servers,
+    )
+    from .settings import Settings
+
+__all__ = [
+    "source_url_from_file_path",
+    "register_server",
+    "register_servers",
+    "ServerRegistration",
+    "RegistrationResult",
+    "Settings",
+]
+
+# exports are imported on first use, so that `import mcproto_client` (and with
+# it the CLI) starts quickly
+_SUBMODULES = {
+    "source_url_from_file_path": "._git",
+    "register_server": ".atproto",
+    "register_servers": ".atproto",
+    "ServerRegistration": ".atproto",
+    "RegistrationResult": ".atproto",
+    "Settings": ".settings",
+}
+
+
+def __getattr__(name: str):
+    if name in _SUBMODULES:
+        return getattr(import_module(_SUBMODULES[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
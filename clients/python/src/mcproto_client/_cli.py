@@ -1,59 +1,156 @@
 """CLI for registering MCP servers with ATProto."""
 
 import argparse
+import asyncio
+import logging
 import sys
 import warnings
+from datetime import timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING
 
-from mcp.cli.cli import _import_server, _parse_file_path
-from mcp.server.fastmcp.utilities.logging import get_logger
+if TYPE_CHECKING:
+    from mcproto_client.atproto import ServerRegistration
 
-from mcproto_client._git import source_url_from_file_path
-from mcproto_client.atproto import register_server
-from mcproto_client.settings import Settings
+logger = logging.getLogger("mcproto")
 
-logger = get_logger("mcproto")
 
+def _parse_file_spec(file_spec: str) -> tuple[Path, str | None]:
+    """Split `path/to/server.py:object` like `mcp run` does, without importing mcp."""
+    # a Windows drive letter isn't an object separator
+    has_windows_drive = len(file_spec) > 1 and file_spec[1] == ":"
+    if ":" in (file_spec[2:] if has_windows_drive else file_spec):
+        file_str, server_object = file_spec.rsplit(":", 1)
+    else:
+        file_str, server_object = file_spec, None
 
-def main():
-    parser = argparse.ArgumentParser(description="Register an MCP server with ATProto")
-    parser.add_argument("file_spec", help="Python file containing MCP server")
-    parser.add_argument("--version", default="0.0.1", help="Server version")
-    args = parser.parse_args()
+    file_path = Path(file_str).expanduser().resolve()
+    if not file_path.is_file():
+        raise FileNotFoundError(f"No such file: {file_path}")
+    return file_path, server_object
+
+
+def _load_registration(
+    file_spec: str, version: str, static: bool = True
+) -> "ServerRegistration":
+    """Describe how to register the server in `file_spec`.
+
+    The server is read from its source when possible, and only imported when
+    it is defined in a way the source alone doesn't reveal.
+    """
+    from mcproto_client._git import source_url_from_file_path
+    from mcproto_client._static import StaticExtractionError, extract_server_from_file
+    from mcproto_client.atproto import ServerRegistration
+
+    file_path, server_object = _parse_file_spec(file_spec)
+    github_url = source_url_from_file_path(file_path)
+
+    server = None
+    description = None
+    if static:
+        try:
+            server = extract_server_from_file(file_path, server_object)
+            description = server.instructions
+        except StaticExtractionError as e:
+            logger.info(f"Importing {file_path.name} to describe it: {e}")
+
+    if server is None:
+        from mcp.cli.cli import _import_server
 
-    try:
         # Add parent directory to Python path so imports can be resolved
-        file_path, server_object = _parse_file_path(args.file_spec)
         file_dir = str(file_path.parent)
         if file_dir not in sys.path:
             sys.path.insert(0, file_dir)
 
         server = _import_server(file_path, server_object)
-        github_url = source_url_from_file_path(file_path)
-
-        description = server.__doc__
-        if not description:
-            warnings.warn(
-                f"No description found for server {server.name}, using default",
-                stacklevel=2,
-            )
-            description = f"Non-descript MCP server {server.name}"
+        description = getattr(server, "instructions", None) or server.__doc__
 
-        register_server(
-            server=server,
-            installation=f"uv run {github_url}",
-            description=description,
-            version=args.version,
+    if not description:
+        warnings.warn(
+            f"No description found for server {server.name}, using default",
+            stacklevel=2,
         )
-        try:
-            settings = Settings()  # type: ignore
-        except ValueError as e:
-            logger.error(f"Cannot register server: {str(e)}")
+        description = f"Non-descript MCP server {server.name}"
+
+    return ServerRegistration(
+        server=server,
+        installation=f"uv run {github_url}",
+        description=description,
+        version=version,
+        source_path=file_path,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Register MCP servers with ATProto")
+    parser.add_argument(
+        "file_spec",
+        help="Python file containing an MCP server, or a directory of them",
+    )
+    parser.add_argument("--version", default="0.0.1", help="Server version")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="How many servers to prepare at once",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rewrite records even if nothing about the server has changed",
+    )
+    parser.add_argument(
+        "--import",
+        dest="static",
+        action="store_false",
+        help="Always import servers instead of reading them from source",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # deferred so that --help and missing credentials fail fast
+    from mcproto_client.atproto import register_servers
+    from mcproto_client.settings import Settings
+
+    try:
+        settings = Settings()  # type: ignore
+    except ValueError as e:
+        logger.error(f"Cannot register server: {str(e)}")
+        sys.exit(1)
+
+    directory = Path(args.file_spec)
+    if directory.is_dir():
+        file_specs = [str(path) for path in sorted(directory.glob("*.py"))]
+        if not file_specs:
+            logger.error(f"No Python files found in {directory}")
             sys.exit(1)
+    else:
+        file_specs = [args.file_spec]
 
-        logger.info(
-            f"Successfully registered {server.name!r} with ATProto as {settings.handle!r}"
-        )
-        logger.info(f"View your newly registered server at {settings.registry_url}")
+    registrations: list[ServerRegistration] = []
+    failed = False
+    for file_spec in file_specs:
+        try:
+            registrations.append(
+                _load_registration(file_spec, args.version, static=args.static)
+            )
+        except (Exception, SystemExit) as e:
+            # one broken file shouldn't stop the rest of a directory registering
+            logger.error(f"Cannot load server from {file_spec}: {str(e)}")
+            failed = True
+
+    results = []
+    try:
+        if registrations:
+            results = asyncio.run(
+                register_servers(
+                    registrations,
+                    concurrency=args.concurrency,
+                    heartbeat_interval=timedelta(0)
+                    if args.force
+                    else timedelta(days=1),
+                )
+            )
     except ValueError as e:
         logger.error(f"Cannot register server: {str(e)}")
         sys.exit(1)
@@ -61,6 +158,21 @@ def main():
         logger.error(str(e))
         sys.exit(1)
 
+    for registration, result in zip(registrations, results):
+        if result.written:
+            logger.info(
+                f"Successfully registered {registration.server.name!r} "
+                f"with ATProto as {settings.handle!r}"
+            )
+        else:
+            logger.info(
+                f"{registration.server.name!r} is already registered and unchanged"
+            )
+    if registrations:
+        logger.info(f"View your newly registered servers at {settings.registry_url}")
+    if failed:
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
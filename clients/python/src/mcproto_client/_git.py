@@ -1,11 +1,22 @@
 """Git utilities for package URL resolution."""
 
+import asyncio
+import functools
+import hashlib
+import json
+import re
 import subprocess
 import urllib.parse
 import warnings
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-import httpx
+if TYPE_CHECKING:
+    import httpx
+
+_TIMEOUT = 10.0  # seconds
+_SHA = re.compile(r"[0-9a-f]{40}")
 
 
 def _run_git(args: list[str], cwd: str | Path) -> str:
@@ -14,38 +25,132 @@ def _run_git(args: list[str], cwd: str | Path) -> str:
     ).stdout.strip()
 
 
+@dataclass(frozen=True)
+class RepoMetadata:
+    """What registration needs to know about a local checkout."""
+
+    root: Path
+    remote_url: str | None  # remote.origin.url
+    branch: str  # "HEAD" when detached, like `git rev-parse --abbrev-ref HEAD`
+    head_sha: str | None
+
+
+def _find_git_root(directory: Path) -> Path | None:
+    for candidate in (directory, *directory.parents):
+        if (candidate / ".git").exists():
+            return candidate
+    return None
+
+
+def _git_dirs(root: Path) -> tuple[Path, Path]:
+    """Return the git dir and the common dir, which differ for worktrees."""
+    git_dir = root / ".git"
+    if git_dir.is_file():
+        # worktrees and submodules have a `.git` file pointing elsewhere
+        content = git_dir.read_text().strip()
+        git_dir = (root / content.removeprefix("gitdir:").strip()).resolve()
+    common_dir = git_dir
+    if (git_dir / "commondir").is_file():
+        common_dir = (git_dir / (git_dir / "commondir").read_text().strip()).resolve()
+    return git_dir, common_dir
+
+
+def _read_remote_url(config: Path, remote: str = "origin") -> str | None:
+    section = None
+    for line in config.read_text().splitlines():
+        line = line.strip()
+        if not line or line[0] in "#;":
+            continue
+        if line.startswith("["):
+            section = line.strip("[]").strip()
+            continue
+        key, _, value = line.partition("=")
+        if section == f'remote "{remote}"' and key.strip().lower() == "url":
+            return value.strip().strip('"')
+    return None
+
+
+def _resolve_ref(common_dir: Path, ref: str) -> str | None:
+    loose = common_dir / ref
+    if loose.is_file():
+        return loose.read_text().strip()
+    packed = common_dir / "packed-refs"
+    if packed.is_file():
+        for line in packed.read_text().splitlines():
+            sha, _, name = line.partition(" ")
+            if name == ref:
+                return sha
+    return None
+
+
+@functools.cache
+def _repo_metadata(root: Path) -> RepoMetadata:
+    """Read the remote, branch and HEAD of a checkout straight from `.git`."""
+    git_dir, common_dir = _git_dirs(root)
+    head = (git_dir / "HEAD").read_text().strip()
+    if head.startswith("ref:"):
+        ref = head.removeprefix("ref:").strip()
+        branch = ref.removeprefix("refs/heads/")
+        head_sha = _resolve_ref(common_dir, ref)
+    else:
+        branch, head_sha = "HEAD", head
+
+    if head_sha is None or not _SHA.fullmatch(head_sha):
+        # e.g. a reftable repository, whose refs aren't plain files
+        try:
+            head_sha = _run_git(["rev-parse", "HEAD"], root)
+        except (subprocess.CalledProcessError, OSError):
+            head_sha = None
+
+    config = common_dir / "config"
+    return RepoMetadata(
+        root=root,
+        remote_url=_read_remote_url(config) if config.is_file() else None,
+        branch=branch,
+        head_sha=head_sha,
+    )
+
+
+def repo_metadata(file_path: Path) -> RepoMetadata | None:
+    """Metadata of the checkout containing `file_path`, read once per git root."""
+    root = _find_git_root(Path(file_path).resolve().parent)
+    if root is None:
+        return None
+    try:
+        return _repo_metadata(root)
+    except OSError:
+        return None
+
+
 def _get_github_url(file_path: Path) -> str:
     """Get the GitHub URL for a file in the current repository.
 
     Raises:
         ValueError: If the repository is not hosted on GitHub or no remote is configured.
     """
-    try:
-        git_root = _run_git(["rev-parse", "--show-toplevel"], file_path.parent)
-        try:
-            remote = _run_git(["config", "--get", "remote.origin.url"], git_root)
-            branch = _run_git(["rev-parse", "--abbrev-ref", "HEAD"], git_root)
-
-            if remote.startswith("git@github.com:"):
-                remote = remote.replace("git@github.com:", "https://github.com/")
-            if remote.endswith(".git"):
-                remote = remote[:-4]
-            print(f"Processed remote: {remote}")
-
-            if not remote.startswith("https://github.com/"):
-                raise ValueError("Repository must be hosted on GitHub")
-
-            # If remote already contains a branch, use that instead of current branch
-            if "@" in remote:
-                remote, branch = remote.split("@")
-
-            rel_path = file_path.resolve().relative_to(Path(git_root).resolve())
-            url = f"{remote}/blob/{branch}/{rel_path}"
-            return url
-        except subprocess.CalledProcessError:
-            raise ValueError("No git remote configured")
-    except subprocess.CalledProcessError:
+    metadata = repo_metadata(file_path)
+    if metadata is None:
         raise ValueError("Not in a git repository")
+    if not metadata.remote_url:
+        raise ValueError("No git remote configured")
+
+    remote = metadata.remote_url
+    branch = metadata.branch
+    if remote.startswith("git@github.com:"):
+        remote = remote.replace("git@github.com:", "https://github.com/")
+    if remote.endswith(".git"):
+        remote = remote[:-4]
+
+    if not remote.startswith("https://github.com/"):
+        raise ValueError("Repository must be hosted on GitHub")
+
+    # If remote already contains a branch, use that instead of current branch
+    if "@" in remote:
+        remote, branch = remote.split("@")
+
+    rel_path = file_path.resolve().relative_to(metadata.root)
+    url = f"{remote}/blob/{branch}/{rel_path}"
+    return url
 
 
 def _github_to_raw_url(github_url: str) -> str:
@@ -95,30 +200,122 @@ def source_url_from_file_path(file_path: Path) -> str:
     return _github_to_raw_url(github_url)
 
 
-def extract_github_commit_sha(package_url: str) -> str | None:
-    """Extract commit SHA from GitHub URL or fetch latest if on main/master."""
-    try:
-        parsed = urllib.parse.urlparse(package_url)
-        if not parsed.hostname or "github.com" not in parsed.hostname:
+def _parse_github_source(package_url: str) -> tuple[str, str, str] | None:
+    """Find (owner, repo, ref) in an installation command or GitHub URL.
+
+    Understands raw.githubusercontent.com URLs as produced by
+    `source_url_from_file_path` and github.com URLs, with or without a
+    leading command such as `uv run`.
+    """
+    parsed = urllib.parse.urlparse(package_url.split()[-1] if package_url else "")
+    parts = [p for p in parsed.path.split("/") if p]
+    if len(parts) < 2:
+        return None
+    owner, repo = parts[0], parts[1].removesuffix(".git")
+
+    if parsed.hostname == "raw.githubusercontent.com":
+        # /{owner}/{repo}/refs/heads/{branch}/... or /{owner}/{repo}/{ref}/...
+        if len(parts) > 4 and parts[2] == "refs" and parts[3] in ("heads", "tags"):
+            return owner, repo, parts[4]
+        if len(parts) > 2:
+            return owner, repo, parts[2]
+    elif parsed.hostname == "github.com":
+        if len(parts) > 3 and parts[2] in ("commit", "tree", "blob"):
+            return owner, repo, parts[3]
+        return owner, repo, "HEAD"
+    return None
+
+
+class CommitShaResolver:
+    """Resolve the commit an installation command points at.
+
+    The local checkout is asked first when the source file is known, so a
+    registration from inside the repository needs no network at all.
+    Otherwise the GitHub API is called with a shared `httpx.AsyncClient`,
+    using conditional requests against an on-disk cache of ETags keyed by
+    owner/repo/ref; a 304 does not count against GitHub's rate limit.
+    Concurrent lookups of the same ref share one request.
+    """
+
+    def __init__(self, client: "httpx.AsyncClient", cache_dir: Path | None) -> None:
+        self.client = client
+        self.cache_dir = cache_dir
+        self._lookups: dict[tuple[str, str, str], asyncio.Task[str | None]] = {}
+
+    async def resolve(
+        self, package_url: str, file_path: Path | None = None
+    ) -> str | None:
+        source = _parse_github_source(package_url)
+        if source is None:
             return None
+        if _SHA.fullmatch(source[2]):
+            return source[2]
+
+        if file_path is not None:
+            metadata = await asyncio.to_thread(repo_metadata, file_path)
+            if metadata is not None and metadata.head_sha:
+                return metadata.head_sha
+
+        if source not in self._lookups:
+            self._lookups[source] = asyncio.create_task(self._fetch(*source))
+        return await self._lookups[source]
 
-        # Extract owner/repo from path
-        path_parts = [p for p in parsed.path.split("/") if p]
-        if len(path_parts) < 2:
+    def _cache_path(self, owner: str, repo: str, ref: str) -> Path | None:
+        if self.cache_dir is None:
             return None
+        key = hashlib.sha256(f"{owner}/{repo}@{ref}".lower().encode()).hexdigest()
+        return self.cache_dir / f"{key[:32]}.json"
 
-        owner, repo = path_parts[0:2]
+    async def _fetch(self, owner: str, repo: str, ref: str) -> str | None:
+        import httpx
 
-        # If URL contains commit/tree/blob, extract SHA
-        if len(path_parts) > 4 and path_parts[2] in ("commit", "tree", "blob"):
-            return path_parts[3]
+        cache_path = self._cache_path(owner, repo, ref)
+        cached: dict[str, str] = {}
+        if cache_path is not None and cache_path.exists():
+            try:
+                cached = json.loads(cache_path.read_text())
+            except (OSError, ValueError):
+                cached = {}
 
-        # Otherwise fetch latest commit from default branch
-        api_url = f"https://api.github.com/repos/{owner}/{repo}/commits/HEAD"
-        response = httpx.get(api_url)
-        if response.status_code == 200:
-            return response.json()["sha"]
+        headers = {"Accept": "application/vnd.github+json"}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
 
-    except Exception as e:
-        warnings.warn(f"Failed to extract/fetch commit SHA: {e}")
-    return None
+        api_url = f"https://api.github.com/repos/{owner}/{repo}/commits/{ref}"
+        try:
+            response = await self.client.get(api_url, headers=headers)
+        except httpx.HTTPError as e:
+            warnings.warn(f"Failed to fetch commit SHA for {owner}/{repo}@{ref}: {e}")
+            return None
+
+        if response.status_code == 304 and cached.get("sha"):
+            return cached["sha"]
+        if response.status_code != 200:
+            warnings.warn(
+                f"Failed to fetch commit SHA for {owner}/{repo}@{ref}: "
+                f"GitHub returned {response.status_code}"
+            )
+            return None
+
+        sha = response.json()["sha"]
+        if cache_path is not None and (etag := response.headers.get("etag")):
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                cache_path.write_text(json.dumps({"etag": etag, "sha": sha}))
+            except OSError as e:
+                warnings.warn(f"Cannot cache commit SHA to {cache_path}: {e}")
+        return sha
+
+
+async def extract_github_commit_sha(
+    package_url: str,
+    file_path: Path | None = None,
+    cache_dir: Path | None = None,
+) -> str | None:
+    """Resolve the commit SHA an installation command or GitHub URL points at."""
+    import httpx
+
+    async with httpx.AsyncClient(timeout=_TIMEOUT) as client:
+        return await CommitShaResolver(client, cache_dir).resolve(
+            package_url, file_path
+        )
@@ -0,0 +1,80 @@
+"""Reuse ATProto sessions across processes instead of logging in every time."""
+
+import hashlib
+import os
+import warnings
+from pathlib import Path
+
+from atproto import AsyncClient, models
+from atproto_client.client.session import Session, SessionEvent
+
+from .settings import Settings
+
+
+def _session_path(cache_dir: Path, handle: str) -> Path:
+    # the identifier may be an email address, so don't use it as a file name
+    key = hashlib.sha256(handle.lower().encode()).hexdigest()[:32]
+    return cache_dir / f"{key}.session"
+
+
+def _read_session(path: Path) -> str | None:
+    try:
+        return path.read_text().strip() or None
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        warnings.warn(f"Cannot read cached session from {path}: {e}")
+        return None
+
+
+def _write_session(path: Path, session_string: str) -> None:
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        # the session grants access to the account, so keep it private
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(session_string)
+        os.replace(tmp, path)
+    except OSError as e:
+        warnings.warn(f"Cannot cache session to {path}: {e}")
+
+
+def _client(path: Path | None) -> AsyncClient:
+    client = AsyncClient()
+    if path is not None:
+
+        async def on_session_change(event: SessionEvent, session: Session) -> None:
+            if event in (SessionEvent.CREATE, SessionEvent.REFRESH):
+                _write_session(path, session.export())
+
+        client.on_session_change(on_session_change)
+    return client
+
+
+async def login(
+    settings: Settings,
+) -> tuple[AsyncClient, models.AppBskyActorDefs.ProfileViewDetailed]:
+    """Return a logged in client, reusing the cached session if there is one.
+
+    The client refreshes an imported session by itself when its access token
+    is close to expiry. Every new or refreshed session is written back to the
+    cache keyed by `settings.handle`, so the password is only used when there
+    is no cached session or it can no longer be refreshed.
+    """
+    path = (
+        _session_path(settings.session_cache_dir, settings.handle)
+        if settings.session_cache_dir is not None
+        else None
+    )
+
+    if path is not None and (session_string := _read_session(path)):
+        client = _client(path)
+        try:
+            return client, await client.login(session_string=session_string)
+        except Exception as e:
+            warnings.warn(f"Cached session unusable, logging in again: {e}")
+
+    # start over with a clean client so the stale session isn't refreshed
+    client = _client(path)
+    return client, await client.login(settings.handle, settings.password)
@@ -0,0 +1,352 @@
+"""Describe FastMCP servers by reading their source instead of running it."""
+
+import ast
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pydantic_core import to_jsonable_python
+
+# variables tried in order when no server object is named, as in `mcp run`
+DEFAULT_SERVER_NAMES = ("mcp", "server", "app")
+
+_SIMPLE_TYPES: dict[str, dict[str, Any]] = {
+    "Any": {},
+    "str": {"type": "string"},
+    "int": {"type": "integer"},
+    "float": {"type": "number"},
+    "bool": {"type": "boolean"},
+    "None": {"type": "null"},
+    "list": {"items": {}, "type": "array"},
+    "List": {"items": {}, "type": "array"},
+    "dict": {"type": "object"},
+    "Dict": {"type": "object"},
+    "set": {"items": {}, "type": "array", "uniqueItems": True},
+    "Set": {"items": {}, "type": "array", "uniqueItems": True},
+}
+
+_LITERAL_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+class StaticExtractionError(Exception):
+    """The server can't be described without importing it."""
+
+
+@dataclass
+class StaticTool:
+    """A tool as `FastMCP.list_tools` would describe it."""
+
+    name: str
+    description: str
+    input_schema: dict[str, Any]
+
+    def to_record(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "inputSchema": self.input_schema,
+        }
+
+
+@dataclass
+class StaticServer:
+    """What a FastMCP server's source says about it."""
+
+    name: str
+    instructions: str | None = None
+    tools: list[StaticTool] = field(default_factory=list)
+
+
+def _dotted_name(node: ast.expr) -> str | None:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _literal(node: ast.expr, what: str) -> Any:
+    try:
+        return ast.literal_eval(node)
+    except ValueError as e:
+        raise StaticExtractionError(f"{what} is not a literal") from e
+
+
+def _compiler_cleandoc(doc: str) -> str:
+    """Dedent a docstring the way the compiler does from Python 3.13 on.
+
+    Unlike `inspect.cleandoc`, leading and trailing blank lines are kept.
+    """
+    first, newline, rest = doc.expandtabs().partition("\n")
+    lines = rest.split("\n") if newline else []
+    margin = min(
+        (len(line) - len(line.lstrip(" ")) for line in lines if line.strip(" ")),
+        default=0,
+    )
+    dedented = [
+        line[min(margin, len(line) - len(line.lstrip(" "))) :] for line in lines
+    ]
+    return "\n".join([first.lstrip(" "), *dedented])
+
+
+def _docstring(function: ast.FunctionDef | ast.AsyncFunctionDef) -> str:
+    """A function's `__doc__`, as the running interpreter would compile it."""
+    doc = ast.get_docstring(function, clean=False) or ""
+    return _compiler_cleandoc(doc) if sys.version_info >= (3, 13) else doc
+
+
+def _union(members: list[dict[str, Any]]) -> dict[str, Any]:
+    return {"anyOf": members}
+
+
+def _schema(annotation: ast.expr) -> dict[str, Any]:
+    """Build pydantic's JSON schema for a type annotation.
+
+    Raises:
+        StaticExtractionError: For types defined elsewhere, such as pydantic
+            models, whose schema can't be known without importing them
+    """
+    if isinstance(annotation, ast.Constant):
+        if annotation.value is None:
+            return {"type": "null"}
+        if isinstance(annotation.value, str):
+            # a forward reference such as `"int | None"`
+            try:
+                return _schema(ast.parse(annotation.value, mode="eval").body)
+            except SyntaxError as e:
+                raise StaticExtractionError(
+                    f"Cannot parse annotation {annotation.value!r}"
+                ) from e
+        raise StaticExtractionError(f"Unknown annotation {annotation.value!r}")
+
+    if isinstance(annotation, ast.BinOp) and isinstance(annotation.op, ast.BitOr):
+        return _union(_union_members(annotation))
+
+    if isinstance(annotation, ast.Subscript):
+        origin = _dotted_name(annotation.value)
+        args = (
+            list(annotation.slice.elts)
+            if isinstance(annotation.slice, ast.Tuple)
+            else [annotation.slice]
+        )
+        if origin == "Optional":
+            return _union([_schema(args[0]), {"type": "null"}])
+        if origin == "Union":
+            return _union([_schema(arg) for arg in args])
+        if origin == "Annotated":
+            schema = _schema(args[0])
+            for metadata in args[1:]:
+                if (
+                    not isinstance(metadata, ast.Call)
+                    or _dotted_name(metadata.func) != "Field"
+                    or metadata.args
+                    or any(k.arg != "description" for k in metadata.keywords)
+                ):
+                    # constraints and other metadata change the schema
+                    raise StaticExtractionError(
+                        f"Unknown metadata {ast.unparse(metadata)}"
+                    )
+                for keyword in metadata.keywords:
+                    schema["description"] = _literal(keyword.value, "Field description")
+            return schema
+        if origin == "Literal":
+            values = [_literal(arg, "Literal value") for arg in args]
+            schema: dict[str, Any] = {"enum": values}
+            kinds = {type(value) for value in values}
+            if len(kinds) == 1 and (kind := kinds.pop()) in _LITERAL_TYPES:
+                schema["type"] = _LITERAL_TYPES[kind]
+            return schema
+        if origin in ("list", "List", "Sequence"):
+            return {"items": _schema(args[0]), "type": "array"}
+        if origin in ("set", "Set"):
+            return {"items": _schema(args[0]), "type": "array", "uniqueItems": True}
+        if origin in ("dict", "Dict") and len(args) == 2:
+            return {"additionalProperties": _schema(args[1]), "type": "object"}
+        if origin in ("tuple", "Tuple"):
+            if len(args) == 2 and isinstance(args[1], ast.Constant):
+                # tuple[int, ...]
+                return {"items": _schema(args[0]), "type": "array"}
+            return {
+                "maxItems": len(args),
+                "minItems": len(args),
+                "prefixItems": [_schema(arg) for arg in args],
+                "type": "array",
+            }
+        raise StaticExtractionError(f"Unknown type {ast.unparse(annotation)}")
+
+    name = _dotted_name(annotation)
+    if name not in _SIMPLE_TYPES:
+        raise StaticExtractionError(f"Unknown type {ast.unparse(annotation)}")
+    return dict(_SIMPLE_TYPES[name])
+
+
+def _union_members(annotation: ast.expr) -> list[dict[str, Any]]:
+    if isinstance(annotation, ast.BinOp) and isinstance(annotation.op, ast.BitOr):
+        return _union_members(annotation.left) + _union_members(annotation.right)
+    return [_schema(annotation)]
+
+
+def _input_schema(function: ast.FunctionDef | ast.AsyncFunctionDef) -> dict[str, Any]:
+    """Build the arguments schema FastMCP generates from a tool's signature."""
+    arguments = function.args
+    if arguments.vararg or arguments.kwarg or arguments.posonlyargs:
+        raise StaticExtractionError(f"{function.name} has a variadic signature")
+
+    params = arguments.args + arguments.kwonlyargs
+    defaults: list[ast.expr | None] = [None] * (
+        len(arguments.args) - len(arguments.defaults)
+    )
+    defaults += arguments.defaults
+    defaults += arguments.kw_defaults
+
+    properties: dict[str, Any] = {}
+    required: list[str] = []
+    for param, default in zip(params, defaults):
+        annotation = param.annotation
+        # FastMCP passes the request context itself, it isn't a tool argument
+        if annotation is not None and _dotted_name(annotation) == "Context":
+            continue
+
+        if annotation is None:
+            # unannotated arguments are treated as strings
+            schema = {"title": param.arg, "type": "string"}
+        else:
+            schema = {
+                "title": param.arg.replace("_", " ").title(),
+                **_schema(annotation),
+            }
+        if default is None:
+            required.append(param.arg)
+        else:
+            schema["default"] = to_jsonable_python(
+                _literal(default, f"Default of {param.arg}")
+            )
+        properties[param.arg] = schema
+
+    input_schema: dict[str, Any] = {"properties": properties}
+    if required:
+        input_schema["required"] = required
+    input_schema["title"] = f"{function.name}Arguments"
+    input_schema["type"] = "object"
+    return input_schema
+
+
+def _find_server(
+    tree: ast.Module, server_object: str | None
+) -> tuple[str, StaticServer]:
+    """Find the module level `FastMCP(...)` the registration refers to."""
+    constructors: dict[str, ast.Call] = {}
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name)
+            and isinstance(node.value, ast.Call)
+            and _dotted_name(node.value.func) == "FastMCP"
+        ):
+            constructors[node.targets[0].id] = node.value
+
+    names = (server_object,) if server_object else DEFAULT_SERVER_NAMES
+    variable = next((name for name in names if name in constructors), None)
+    if variable is None:
+        raise StaticExtractionError("No FastMCP constructor found")
+
+    call = constructors[variable]
+    arguments = {keyword.arg: keyword.value for keyword in call.keywords}
+    if None in arguments:
+        raise StaticExtractionError("FastMCP is called with **kwargs")
+    if call.args:
+        arguments.setdefault("name", call.args[0])
+
+    name = _literal(arguments["name"], "Server name") if "name" in arguments else None
+    instructions = (
+        _literal(arguments["instructions"], "Server instructions")
+        if "instructions" in arguments
+        else None
+    )
+    return variable, StaticServer(name=name or "FastMCP", instructions=instructions)
+
+
+def _tool_decorator(decorator: ast.expr, variable: str) -> dict[str, ast.expr] | None:
+    """The arguments of `@<variable>.tool(...)`, or None for other decorators."""
+    if (
+        isinstance(decorator, ast.Call)
+        and isinstance(decorator.func, ast.Attribute)
+        and decorator.func.attr == "tool"
+        and isinstance(decorator.func.value, ast.Name)
+        and decorator.func.value.id == variable
+    ):
+        if decorator.args or any(k.arg is None for k in decorator.keywords):
+            raise StaticExtractionError("Tool decorator arguments are not literal")
+        return {str(keyword.arg): keyword.value for keyword in decorator.keywords}
+    return None
+
+
+def extract_server(source: str, server_object: str | None = None) -> StaticServer:
+    """Describe the FastMCP server defined in `source` without running it.
+
+    Finds the server's module level `FastMCP(...)` call and every module level
+    function decorated with its `.tool()`, and builds the same name,
+    description and input schema `FastMCP.list_tools` would report, as far
+    as that can be known from the annotations alone.
+
+    Raises:
+        StaticExtractionError: If the server or its tools are defined in a way
+            that only running the module would reveal
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        raise StaticExtractionError(f"Cannot parse server: {e}") from e
+
+    variable, server = _find_server(tree, server_object)
+
+    found = 0
+    for node in tree.body:
+        if not isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef):
+            continue
+        for decorator in node.decorator_list:
+            options = _tool_decorator(decorator, variable)
+            if options is None:
+                continue
+            found += 1
+            name = options.get("name")
+            description = options.get("description")
+            server.tools.append(
+                StaticTool(
+                    name=_literal(name, "Tool name") if name else node.name,
+                    description=(
+                        _literal(description, "Tool description")
+                        if description
+                        else _docstring(node)
+                    ),
+                    input_schema=_input_schema(node),
+                )
+            )
+
+    # tools added anywhere else, e.g. `mcp.add_tool(...)` or inside a function,
+    # would be missed
+    registrations = sum(
+        1
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Attribute)
+        and node.attr in ("tool", "add_tool")
+        and isinstance(node.value, ast.Name)
+        and node.value.id == variable
+    )
+    if registrations != found:
+        raise StaticExtractionError("Tools are registered dynamically")
+
+    return server
+
+
+def extract_server_from_file(
+    file_path: Path, server_object: str | None = None
+) -> StaticServer:
+    """Describe the FastMCP server in `file_path` without importing it."""
+    try:
+        source = file_path.read_text()
+    except (OSError, UnicodeDecodeError) as e:
+        raise StaticExtractionError(f"Cannot read {file_path}: {e}") from e
+    return extract_server(source, server_object)
@@ -1,42 +1,283 @@
 """ATProto integration for MCP server registration."""
 
+import asyncio
 import hashlib
-from datetime import datetime
-from typing import Any
+import json
+import warnings
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+from weakref import WeakKeyDictionary, ref
 
-from atproto import AsyncClient, models
-from mcp.server.fastmcp.server import FastMCP
-from mcp.server.lowlevel.server import Server
+from pydantic_core import to_jsonable_python
 
-from ._git import extract_github_commit_sha
+from ._git import CommitShaResolver
+from ._static import StaticServer
 from .settings import Settings
 
+# atproto and mcp take seconds to import, so they are only loaded once a
+# registration actually runs
+if TYPE_CHECKING:
+    from atproto import AsyncClient
+    from atproto_client.exceptions import BadRequestError
+    from mcp.server.fastmcp.server import FastMCP
+    from mcp.server.lowlevel.server import Server
+
+COLLECTION = "app.mcp.server"
+
+# the most writes a PDS accepts in one applyWrites call
+_MAX_WRITES_PER_CALL = 200
+
+# record fields that change on every registration, left out of the content hash
+_VOLATILE_FIELDS = frozenset({"lastRegisteredAt", "contentHash"})
+
 
 def make_valid_rkey(package: str) -> str:
     """Create a deterministic but valid rkey from package URL."""
     return hashlib.sha256(package.encode()).hexdigest()[:32]
 
 
-async def register_server(
+def _content_hash(record_content: dict[str, Any]) -> str:
+    """Hash what a record says about its server, in a canonical JSON form."""
+    content = {k: v for k, v in record_content.items() if k not in _VOLATILE_FIELDS}
+    canonical = json.dumps(
+        to_jsonable_python(content), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _tool_record(tool: dict[str, Any]) -> dict[str, Any]:
+    """Keep the fields `StaticTool.to_record` has, so both paths publish alike."""
+    return {
+        "name": tool["name"],
+        "description": tool.get("description") or "",
+        "inputSchema": tool.get("inputSchema") or {},
+    }
+
+
+@dataclass
+class ServerRegistration:
+    """One MCP server to register, as passed to `register_servers`."""
+
+    # a StaticServer describes a server read from source without importing it
+    server: "Server[Any] | FastMCP | StaticServer"
+    installation: str
+    description: str | None = None
+    version: str = "0.0.1"
+    # the server's file in a local checkout, used to find its commit without
+    # asking GitHub
+    source_path: Path | None = None
+
+
+@dataclass(frozen=True)
+class ExistingRecord:
+    """What we need to know about a server record that is already published."""
+
+    created_at: str | None
+    cid: str | None
+    content_hash: str | None = None
+    last_registered_at: str | None = None
+
+
+@dataclass(frozen=True)
+class RegistrationResult:
+    """The outcome of registering one server."""
+
+    rkey: str
+    # False when the stored record was already up to date
+    written: bool
+
+
+# rkey -> existing record (None if there is none), per publisher DID, shared by
+# every registration in this process
+_existing_records: dict[str, dict[str, ExistingRecord | None]] = {}
+
+
+def _is_record_not_found(error: "BadRequestError") -> bool:
+    content = error.response.content if error.response else None
+    return getattr(content, "error", None) == "RecordNotFound"
+
+
+async def _get_existing_record(
+    client: "AsyncClient", did: str, rkey: str
+) -> ExistingRecord | None:
+    """Look up the record at `rkey` directly, remembering the answer."""
+    from atproto import models
+    from atproto_client.exceptions import BadRequestError
+
+    cache = _existing_records.setdefault(did, {})
+    if rkey in cache:
+        return cache[rkey]
+
+    try:
+        response = await client.com.atproto.repo.get_record(
+            params=models.ComAtprotoRepoGetRecord.Params(
+                repo=did, collection=COLLECTION, rkey=rkey
+            ),
+        )
+    except BadRequestError as e:
+        if not _is_record_not_found(e):
+            raise
+        existing = None
+    else:
+        existing = ExistingRecord(
+            created_at=getattr(response.value, "createdAt", None),
+            cid=response.cid,
+            content_hash=getattr(response.value, "contentHash", None),
+            last_registered_at=getattr(response.value, "lastRegisteredAt", None),
+        )
+
+    cache[rkey] = existing
+    return existing
+
+
+# tool records per live low-level server, with the list_tools handler that
+# produced them, so that registering the same server again doesn't call it again
+_listed_tools: "WeakKeyDictionary[Any, tuple[Any, list[dict[str, Any]]]]" = (
+    WeakKeyDictionary()
+)
+
+
+async def _list_tools(server: "Server[Any] | FastMCP") -> list[dict[str, Any]]:
+    """List a server's tools in-process, as a client connecting to it would.
+
+    Low-level servers are asked through the handler their `@server.list_tools()`
+    registered. The result is kept for as long as that handler stays
+    registered. A FastMCP server's tools can be added and removed without
+    anything to key a cache on, and listing them is cheap, so they are listed
+    every time.
+    """
+    from mcp import types
+    from mcp.server.fastmcp.server import FastMCP
+
+    handler = None
+    if not isinstance(server, FastMCP):
+        handler = server.request_handlers.get(types.ListToolsRequest)
+        if handler is None:
+            return []
+        cached = _listed_tools.get(server)
+        if cached is not None and cached[0]() is handler:
+            return cached[1]
+
+    try:
+        if isinstance(server, FastMCP):
+            tools = await server.list_tools()
+        else:
+            assert handler is not None
+            result = await handler(types.ListToolsRequest(method="tools/list"))
+            tools = result.root.tools
+    except Exception as e:
+        # e.g. a handler that reads the request context of a live session
+        warnings.warn(
+            f"Cannot list tools of server {server.name}: {type(e).__name__}: {e}"
+        )
+        return []
+
+    records = to_jsonable_python(tools)
+    if handler is not None:
+        _listed_tools[server] = (ref(handler), records)
+    return records
+
+
+async def _build_record(
+    registration: ServerRegistration,
+    existing: ExistingRecord | None,
+    publisher_info: dict[str, str],
+    commits: CommitShaResolver,
+) -> dict[str, Any]:
+    """Build the record content for one server."""
+    now = datetime.now().isoformat()
+    commit_sha = await commits.resolve(
+        registration.installation, registration.source_path
+    )
+
+    server = registration.server
+    if isinstance(server, StaticServer):
+        tools = [tool.to_record() for tool in server.tools]
+    else:
+        # e.g. title, annotations and outputSchema, which static extraction
+        # can't know, would otherwise change the content hash between paths
+        tools = [_tool_record(tool) for tool in await _list_tools(server)]
+
+    record_content = {
+        "$type": COLLECTION,
+        "name": server.name,
+        "installation": registration.installation,
+        "version": registration.version,
+        "description": registration.description,
+        "tools": tools,
+        # preserve createdAt across re-registrations
+        "createdAt": (existing.created_at if existing else None) or now,
+        "lastRegisteredAt": now,
+        "publisher": publisher_info,
+        "language": "python",
+    }
+
+    # Only add commit SHA if available
+    if commit_sha:
+        record_content["commitSha"] = commit_sha
+
+    record_content["contentHash"] = _content_hash(record_content)
+    return record_content
+
+
+def _needs_write(
+    existing: ExistingRecord | None,
+    record_content: dict[str, Any],
+    heartbeat_interval: timedelta,
+    now: datetime,
+) -> bool:
+    """Whether the stored record is missing, out of date or due a heartbeat."""
+    if existing is None or existing.content_hash != record_content["contentHash"]:
+        return True
+    try:
+        last_registered = datetime.fromisoformat(existing.last_registered_at or "")
+        return now - last_registered >= heartbeat_interval
+    except (TypeError, ValueError):
+        return True
+
+
+async def register_servers(
+    registrations: Sequence[ServerRegistration],
     *,
-    server: Server[Any] | FastMCP,
-    installation: str,
-    description: str | None = None,
-    version: str = "0.0.1",
     bsky_handle: str | None = None,
     bsky_password: str | None = None,
-) -> None:
-    """Register an MCP server with ATProto if credentials exist.
+    concurrency: int = 8,
+    heartbeat_interval: timedelta = timedelta(days=1),
+) -> list[RegistrationResult]:
+    """Register many MCP servers with ATProto in one session.
+
+    Logs in once, looks up each server's existing record by rkey, builds the
+    new records concurrently and writes them with
+    `com.atproto.repo.applyWrites`. Lookups are cached per publisher for the
+    life of the process, so registering again costs no extra reads.
+
+    Records carry a hash of their content. A server whose stored record has
+    the same hash is not written again unless `heartbeat_interval` has passed
+    since it was last registered, which keeps `lastRegisteredAt` fresh
+    without a new commit on every run.
 
     Args:
-        name: Display name of the server
-        tools: List of tool names available in the server
-        installation: Command to install and run the server (e.g. "uv run script.py")
-        description: Optional description of the server
-        version: Server version string
+        registrations: The servers to register
         bsky_handle: Bluesky handle for authentication
         bsky_password: Bluesky password for authentication
+        concurrency: How many records to build at once
+        heartbeat_interval: How often to rewrite a record that hasn't changed
+
+    Returns:
+        What happened to each server, in the order given
     """
+    import httpx
+    from atproto import models
+
+    from ._session import login
+
+    rkeys = [make_valid_rkey(r.installation) for r in registrations]
+    if len(set(rkeys)) != len(rkeys):
+        raise ValueError("Each server must have a distinct installation command")
+
     provided_options: dict[str, Any] = {}
     if bsky_handle:
         provided_options["handle"] = bsky_handle
@@ -45,27 +286,7 @@ async def register_server(
 
     settings = Settings(**provided_options)
 
-    client = AsyncClient()
-    profile = await client.login(settings.handle, settings.password)
-
-    rkey = make_valid_rkey(installation)
-
-    # Try to get existing record to preserve createdAt
-    created_at = datetime.now().isoformat()
-    try:
-        existing_records = await client.com.atproto.repo.list_records(
-            params=models.ComAtprotoRepoListRecords.Params(
-                repo=profile.did,
-                collection="app.mcp.server",
-            ),
-        )
-        for record in existing_records.records:
-            if record.uri.split("/")[-1] == rkey and isinstance(record.value, dict):
-                created_at = record.value.get("createdAt", created_at)
-                break
-    except Exception:
-        # If we can't read records, just use current time for createdAt
-        pass
+    client, profile = await login(settings)
 
     publisher_info = {
         "did": profile.did,
@@ -75,54 +296,102 @@ async def register_server(
     if "." in profile.handle:
         publisher_info["verifiedDomain"] = profile.handle
 
-    commit_sha = extract_github_commit_sha(installation)
-
-    # Prepare base record data
-    if isinstance(server, FastMCP):
-        tools = await server.list_tools()
-    else:
-        tools = []  # TODO: get tool names from low-level server
+    semaphore = asyncio.Semaphore(concurrency)
 
-    record_content = {
-        "$type": "app.mcp.server",
-        "name": server.name,
-        "installation": installation,
-        "version": version,
-        "description": description,
-        "tools": tools,
-        "createdAt": created_at,
-        "lastRegisteredAt": datetime.now().isoformat(),
-        "publisher": publisher_info,
-        "language": "python",
-    }
-
-    # Only add commit SHA if available
-    if commit_sha:
-        record_content["commitSha"] = commit_sha
+    async def build(
+        registration: ServerRegistration, rkey: str
+    ) -> tuple[ExistingRecord | None, dict[str, Any]]:
+        async with semaphore:
+            existing = await _get_existing_record(client, profile.did, rkey)
+            return existing, await _build_record(
+                registration, existing, publisher_info, commits
+            )
 
-    try:
-        # Try to update existing record first
-        await client.com.atproto.repo.put_record(
-            models.ComAtprotoRepoPutRecord.Data(
-                repo=profile.did,
-                collection="app.mcp.server",
-                rkey=rkey,
-                record=record_content,
+    async with httpx.AsyncClient(timeout=10.0) as http_client:
+        commits = CommitShaResolver(http_client, settings.github_cache_dir)
+        built = await asyncio.gather(
+            *(
+                build(registration, rkey)
+                for registration, rkey in zip(registrations, rkeys)
             )
         )
-    except Exception as put_error:
-        # If update fails, try to create new record
+
+    writes: list[
+        models.ComAtprotoRepoApplyWrites.Create
+        | models.ComAtprotoRepoApplyWrites.Update
+    ] = []
+    now = datetime.now()
+    results: list[RegistrationResult] = []
+    for rkey, (existing, record_content) in zip(rkeys, built):
+        written = _needs_write(existing, record_content, heartbeat_interval, now)
+        results.append(RegistrationResult(rkey=rkey, written=written))
+        if not written:
+            continue
+        write_type = (
+            models.ComAtprotoRepoApplyWrites.Update
+            if existing is not None
+            else models.ComAtprotoRepoApplyWrites.Create
+        )
+        writes.append(
+            write_type(collection=COLLECTION, rkey=rkey, value=record_content)
+        )
+
+    cache = _existing_records[profile.did]
+    for start in range(0, len(writes), _MAX_WRITES_PER_CALL):
+        chunk = writes[start : start + _MAX_WRITES_PER_CALL]
         try:
-            print(f"Creating record: {record_content}")
-            await client.com.atproto.repo.create_record(
-                models.ComAtprotoRepoCreateRecord.Data(
-                    repo=profile.did,
-                    collection="app.mcp.server",
-                    rkey=rkey,
-                    record=record_content,
-                )
+            response = await client.com.atproto.repo.apply_writes(
+                models.ComAtprotoRepoApplyWrites.Data(repo=profile.did, writes=chunk)
             )
-        except Exception as create_error:
-            raise RuntimeError(
-                f"Failed to update or create record: Update error: {put_error}, Create error: {create_error}"
+        except Exception as e:
+            # what is stored is unknown now, so look it up again next time
+            for write in chunk:
+                cache.pop(write.rkey, None)
+            raise RuntimeError(f"Failed to write records: {e}") from e
+
+        write_results = (response.results if response else None) or [None] * len(chunk)
+        for write, result in zip(chunk, write_results):
+            cache[write.rkey] = ExistingRecord(
+                created_at=write.value["createdAt"],
+                cid=getattr(result, "cid", None),
+                content_hash=write.value["contentHash"],
+                last_registered_at=write.value["lastRegisteredAt"],
+            )
+
+    return results
+
+
+async def register_server(
+    *,
+    server: "Server[Any] | FastMCP",
+    installation: str,
+    description: str | None = None,
+    version: str = "0.0.1",
+    bsky_handle: str | None = None,
+    bsky_password: str | None = None,
+    heartbeat_interval: timedelta = timedelta(days=1),
+) -> None:
+    """Register an MCP server with ATProto if credentials exist.
+
+    Args:
+        server: The MCP server to register
+        installation: Command to install and run the server (e.g. "uv run script.py")
+        description: Optional description of the server
+        version: Server version string
+        bsky_handle: Bluesky handle for authentication
+        bsky_password: Bluesky password for authentication
+        heartbeat_interval: How often to rewrite the record if it hasn't changed
+    """
+    await register_servers(
+        [
+            ServerRegistration(
+                server=server,
+                installation=installation,
+                description=description,
+                version=version,
             )
+        ],
+        bsky_handle=bsky_handle,
+        bsky_password=bsky_password,
+        heartbeat_interval=heartbeat_interval,
+    )
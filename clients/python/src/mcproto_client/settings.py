@@ -1,3 +1,4 @@
+from pathlib import Path
 from typing import ClassVar
 
 from pydantic import AnyHttpUrl, model_validator
@@ -14,6 +15,11 @@ class Settings(BaseSettings):
 
     registry_url: AnyHttpUrl = AnyHttpUrl("https://mcproto.alternatebuild.dev")
 
+    # where login sessions are cached between runs, None to always log in
+    session_cache_dir: Path | None = Path.home() / ".cache" / "mcproto" / "sessions"
+    # where GitHub commit lookups are cached for conditional requests
+    github_cache_dir: Path | None = Path.home() / ".cache" / "mcproto" / "github"
+
     @model_validator(mode="before")
     @classmethod
     def validate_credentials(cls, data):
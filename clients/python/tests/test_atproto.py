@@ -0,0 +1,325 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from atproto import models
+from atproto_client.exceptions import BadRequestError
+from atproto_client.models.common import XrpcError
+from atproto_client.models.utils import get_or_create
+from atproto_client.request import Response
+from mcp import types
+from mcp.server.lowlevel import Server
+
+from mcproto_client import _session, atproto
+from mcproto_client._git import CommitShaResolver
+from mcproto_client._static import extract_server
+from mcproto_client.atproto import (
+    COLLECTION,
+    ExistingRecord,
+    ServerRegistration,
+    _build_record,
+    _content_hash,
+    _get_existing_record,
+    _list_tools,
+    _needs_write,
+    make_valid_rkey,
+    register_servers,
+)
+
+DID = "did:plc:test"
+
+SERVER = '''
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("demo")
+
+
+@mcp.tool()
+def greet(name: str, times: int = 1) -> str:
+    """Say hello.
+
+    Repeats the greeting `times` times.
+    """
+    return name
+'''
+
+
+class FakeRepo:
+    """The `com.atproto.repo` namespace of an `AsyncClient`, kept in memory."""
+
+    def __init__(self) -> None:
+        self.records: dict[str, dict] = {}
+        self.get_calls: list[str] = []
+        self.write_calls: list[list] = []
+        self.fail_writes = False
+
+    async def get_record(self, params):
+        self.get_calls.append(params.rkey)
+        if params.rkey not in self.records:
+            raise BadRequestError(
+                Response(
+                    success=False,
+                    status_code=400,
+                    content=XrpcError(
+                        error="RecordNotFound", message="Could not locate record"
+                    ),
+                    headers={},
+                )
+            )
+        return get_or_create(
+            {
+                "uri": f"at://{DID}/{COLLECTION}/{params.rkey}",
+                "cid": f"cid-{params.rkey}",
+                "value": self.records[params.rkey],
+            },
+            models.ComAtprotoRepoGetRecord.Response,
+        )
+
+    async def apply_writes(self, data):
+        self.write_calls.append(data.writes)
+        if self.fail_writes:
+            raise RuntimeError("PDS unavailable")
+        for write in data.writes:
+            self.records[write.rkey] = write.value
+        return SimpleNamespace(
+            results=[SimpleNamespace(cid=f"cid-{write.rkey}") for write in data.writes]
+        )
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.repo = FakeRepo()
+        self.com = SimpleNamespace(atproto=SimpleNamespace(repo=self.repo))
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(atproto, "_existing_records", {})
+
+
+@pytest.fixture
+def client(monkeypatch) -> FakeClient:
+    client = FakeClient()
+    profile = SimpleNamespace(did=DID, handle="test.example.com")
+
+    async def login(settings):
+        return client, profile
+
+    monkeypatch.setattr(_session, "login", login)
+    return client
+
+
+def registrations(count: int) -> list[ServerRegistration]:
+    server = extract_server(SERVER)
+    return [
+        ServerRegistration(server=server, installation=f"uvx demo-{i}")
+        for i in range(count)
+    ]
+
+
+def register(registrations: list[ServerRegistration], **kwargs):
+    return asyncio.run(
+        register_servers(
+            registrations, bsky_handle="test", bsky_password="secret", **kwargs
+        )
+    )
+
+
+def test_writes_are_chunked_and_create_then_update(client):
+    servers = registrations(450)
+    rkeys = [make_valid_rkey(r.installation) for r in servers]
+    client.repo.records[rkeys[0]] = {"$type": COLLECTION, "createdAt": "2024-01-01"}
+
+    results = register(servers)
+
+    assert [r.rkey for r in results] == rkeys
+    assert all(r.written for r in results)
+    assert [len(chunk) for chunk in client.repo.write_calls] == [200, 200, 50]
+    writes = [write for chunk in client.repo.write_calls for write in chunk]
+    assert [write.rkey for write in writes] == rkeys
+    assert isinstance(writes[0], models.ComAtprotoRepoApplyWrites.Update)
+    assert all(
+        isinstance(write, models.ComAtprotoRepoApplyWrites.Create)
+        for write in writes[1:]
+    )
+    # createdAt survives an update
+    assert writes[0].value["createdAt"] == "2024-01-01"
+
+
+def test_unchanged_records_are_not_written_again(client):
+    register(registrations(3))
+    client.repo.write_calls.clear()
+
+    # the records written last time are known without reading them back
+    client.repo.get_calls.clear()
+    results = register(registrations(3))
+
+    assert not any(r.written for r in results)
+    assert client.repo.write_calls == []
+    assert client.repo.get_calls == []
+
+
+def test_duplicate_installations_are_rejected(client):
+    servers = registrations(2)
+    servers[1].installation = servers[0].installation
+
+    with pytest.raises(ValueError, match="distinct installation"):
+        register(servers)
+    assert client.repo.get_calls == []
+
+
+def test_failed_writes_are_looked_up_again(client):
+    servers = registrations(250)
+    client.repo.fail_writes = True
+
+    with pytest.raises(RuntimeError, match="Failed to write records"):
+        register(servers)
+    # only the first chunk was sent, and nothing of it is trusted any more
+    assert [len(chunk) for chunk in client.repo.write_calls] == [200]
+    cache = atproto._existing_records[DID]
+    assert not {make_valid_rkey(r.installation) for r in servers[:200]} & set(cache)
+
+    client.repo.fail_writes = False
+    client.repo.get_calls.clear()
+    register(servers)
+    assert len(client.repo.get_calls) == 200
+
+
+def test_existing_record_lookup():
+    client = FakeClient()
+    client.repo.records["known"] = {
+        "$type": COLLECTION,
+        "createdAt": "2024-01-01T00:00:00",
+        "contentHash": "abc",
+        "lastRegisteredAt": "2024-02-01T00:00:00",
+    }
+
+    async def lookups():
+        return [
+            await _get_existing_record(client, DID, rkey)
+            for rkey in ("known", "missing", "known", "missing")
+        ]
+
+    known, missing, *again = asyncio.run(lookups())
+
+    # read from the DotDict the PDS response is parsed into
+    assert known == ExistingRecord(
+        created_at="2024-01-01T00:00:00",
+        cid="cid-known",
+        content_hash="abc",
+        last_registered_at="2024-02-01T00:00:00",
+    )
+    assert missing is None
+    assert again == [known, None]
+    assert client.repo.get_calls == ["known", "missing"]
+
+
+def test_other_lookup_errors_are_raised():
+    client = FakeClient()
+
+    async def get_record(params):
+        raise BadRequestError(
+            Response(success=False, status_code=400, content=None, headers={})
+        )
+
+    client.repo.get_record = get_record
+    with pytest.raises(BadRequestError):
+        asyncio.run(_get_existing_record(client, DID, "rkey"))
+    assert "rkey" not in atproto._existing_records[DID]
+
+
+@pytest.mark.parametrize(
+    "last_registered_at, written",
+    [
+        ("2025-01-01T11:00:00", False),
+        ("2024-12-31T12:00:00", True),
+        (None, True),
+        ("yesterday", True),
+    ],
+)
+def test_heartbeat(last_registered_at, written):
+    record = {"contentHash": "abc"}
+    existing = ExistingRecord(
+        created_at=None,
+        cid=None,
+        content_hash="abc",
+        last_registered_at=last_registered_at,
+    )
+    now = datetime(2025, 1, 1, 12)
+
+    assert _needs_write(existing, record, timedelta(days=1), now) is written
+
+
+def test_changed_or_missing_records_are_written():
+    now = datetime(2025, 1, 1, 12)
+    existing = ExistingRecord(None, None, "abc", now.isoformat())
+
+    assert _needs_write(None, {"contentHash": "abc"}, timedelta(days=1), now)
+    assert _needs_write(existing, {"contentHash": "def"}, timedelta(days=1), now)
+
+
+def test_content_hash_ignores_volatile_fields():
+    record = {"name": "demo", "tools": [], "lastRegisteredAt": "a"}
+
+    assert _content_hash(record) == _content_hash(
+        {**record, "lastRegisteredAt": "b", "contentHash": "c"}
+    )
+    assert _content_hash(record) != _content_hash({**record, "name": "other"})
+
+
+def test_content_hash_is_the_same_for_static_and_imported_servers():
+    namespace: dict = {}
+    exec(compile(SERVER, "<server>", "exec"), namespace)
+    existing = ExistingRecord(created_at="2024-01-01T00:00:00", cid=None)
+    commits = CommitShaResolver(None, None)  # type: ignore[arg-type]
+
+    async def build(server):
+        registration = ServerRegistration(server=server, installation="uvx demo")
+        return await _build_record(registration, existing, {"did": DID}, commits)
+
+    static = asyncio.run(build(extract_server(SERVER)))
+    imported = asyncio.run(build(namespace["mcp"]))
+
+    assert static["tools"] == imported["tools"]
+    assert static["contentHash"] == imported["contentHash"]
+
+
+def test_low_level_tools_are_listed_once_per_handler():
+    server = Server("low-level")
+    calls: list[str] = []
+
+    @server.list_tools()
+    async def list_tools() -> list[types.Tool]:
+        calls.append("list_tools")
+        return [types.Tool(name=name, inputSchema={}) for name in ("a", "b")]
+
+    first = asyncio.run(_list_tools(server))
+    again = asyncio.run(_list_tools(server))
+
+    assert [tool["name"] for tool in first] == ["a", "b"]
+    assert again == first
+    assert calls == ["list_tools"]
+
+    # registering another handler replaces what was listed
+    @server.list_tools()
+    async def list_other_tools() -> list[types.Tool]:
+        return [types.Tool(name="c", inputSchema={})]
+
+    assert [tool["name"] for tool in asyncio.run(_list_tools(server))] == ["c"]
+
+
+def test_servers_without_tools():
+    assert asyncio.run(_list_tools(Server("empty"))) == []
+
+
+def test_handlers_needing_a_session_are_skipped():
+    server = Server("session")
+
+    @server.list_tools()
+    async def list_tools() -> list[types.Tool]:
+        server.request_context  # only set while handling a client's request
+        return []
+
+    with pytest.warns(UserWarning, match="Cannot list tools of server session"):
+        assert asyncio.run(_list_tools(server)) == []
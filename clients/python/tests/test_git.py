@@ -0,0 +1,222 @@
+import asyncio
+import json
+import subprocess
+
+import httpx
+import pytest
+
+from mcproto_client import _git
+from mcproto_client._git import (
+    CommitShaResolver,
+    RepoMetadata,
+    _parse_github_source,
+    _repo_metadata,
+    repo_metadata,
+    source_url_from_file_path,
+)
+
+SHA = "0123456789abcdef0123456789abcdef01234567"
+OTHER_SHA = "89abcdef0123456789abcdef0123456789abcdef"
+
+
+@pytest.mark.parametrize(
+    "package_url, source",
+    [
+        (
+            "uv run https://raw.githubusercontent.com/o/r/refs/heads/main/server.py",
+            ("o", "r", "main"),
+        ),
+        (
+            "https://raw.githubusercontent.com/o/r/refs/tags/v1.0/server.py",
+            ("o", "r", "v1.0"),
+        ),
+        (f"https://raw.githubusercontent.com/o/r/{SHA}/server.py", ("o", "r", SHA)),
+        ("uvx git+https://github.com/o/r.git", ("o", "r", "HEAD")),
+        ("https://github.com/o/r/blob/dev/server.py", ("o", "r", "dev")),
+        (f"https://github.com/o/r/commit/{SHA}", ("o", "r", SHA)),
+        ("https://gitlab.com/o/r", None),
+        ("uvx some-package", None),
+        ("", None),
+    ],
+)
+def test_parse_github_source(package_url, source):
+    assert _parse_github_source(package_url) == source
+
+
+class GitHub:
+    """Answers commit lookups like the GitHub API, counting requests."""
+
+    def __init__(self, status_code: int = 200) -> None:
+        self.status_code = status_code
+        self.requests: list[httpx.Request] = []
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        await asyncio.sleep(0.01)
+        if request.headers.get("If-None-Match") == '"etag-1"':
+            return httpx.Response(304)
+        if self.status_code != 200:
+            return httpx.Response(self.status_code)
+        return httpx.Response(200, json={"sha": SHA}, headers={"ETag": '"etag-1"'})
+
+
+def resolve(github: GitHub, cache_dir, *package_urls: str) -> list[str | None]:
+    async def main():
+        transport = httpx.MockTransport(github.handle)
+        async with httpx.AsyncClient(transport=transport) as client:
+            commits = CommitShaResolver(client, cache_dir)
+            return await asyncio.gather(*(commits.resolve(url) for url in package_urls))
+
+    return asyncio.run(main())
+
+
+def test_sha_in_the_url_needs_no_request(tmp_path):
+    github = GitHub()
+    url = f"https://github.com/o/r/commit/{OTHER_SHA}"
+
+    assert resolve(github, tmp_path, url) == [OTHER_SHA]
+    assert github.requests == []
+
+
+def test_concurrent_lookups_share_a_request(tmp_path):
+    github = GitHub()
+    main = "https://github.com/o/r/blob/main/server.py"
+    dev = "https://github.com/o/r/blob/dev/server.py"
+
+    assert resolve(github, tmp_path, main, main, dev, main) == [SHA] * 4
+    assert sorted(str(request.url) for request in github.requests) == [
+        "https://api.github.com/repos/o/r/commits/dev",
+        "https://api.github.com/repos/o/r/commits/main",
+    ]
+
+
+def test_cached_etag_is_sent_and_a_304_reuses_the_sha(tmp_path):
+    github = GitHub()
+    url = "https://github.com/o/r/blob/main/server.py"
+
+    assert resolve(github, tmp_path, url) == [SHA]
+    assert "If-None-Match" not in github.requests[0].headers
+    (cached,) = tmp_path.iterdir()
+    assert json.loads(cached.read_text()) == {"etag": '"etag-1"', "sha": SHA}
+
+    # a later run asks again, conditionally
+    assert resolve(github, tmp_path, url) == [SHA]
+    assert github.requests[1].headers["If-None-Match"] == '"etag-1"'
+
+
+def test_without_a_cache_dir_every_run_asks(tmp_path):
+    github = GitHub()
+    url = "https://github.com/o/r/blob/main/server.py"
+
+    assert resolve(github, None, url) == [SHA]
+    assert resolve(github, None, url) == [SHA]
+    assert ["If-None-Match" in r.headers for r in github.requests] == [False, False]
+
+
+def test_failed_lookups_warn(tmp_path):
+    github = GitHub(status_code=404)
+
+    with pytest.warns(UserWarning, match="GitHub returned 404"):
+        assert resolve(github, tmp_path, "https://github.com/o/r") == [None]
+    assert list(tmp_path.iterdir()) == []
+
+
+def git(cwd, *args: str) -> str:
+    return subprocess.run(
+        ["git", *args], cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+
+@pytest.fixture
+def checkout(tmp_path, monkeypatch):
+    """A repository with one commit on `main` and a GitHub remote."""
+    _repo_metadata.cache_clear()
+    root = tmp_path / "repo"
+    root.mkdir()
+    git(root, "init", "-q", "-b", "main")
+    git(root, "remote", "add", "origin", "git@github.com:o/r.git")
+    (root / "pkg").mkdir()
+    (root / "pkg" / "server.py").write_text("")
+    git(root, "add", ".")
+    git(
+        root,
+        *("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-q", "-m", "init"),
+    )
+
+    # everything should be read from `.git`, without running git
+    def run_git(args, cwd):
+        raise AssertionError(f"ran git {args}")
+
+    monkeypatch.setattr(_git, "_run_git", run_git)
+    yield root
+    _repo_metadata.cache_clear()
+
+
+def test_loose_refs(checkout):
+    metadata = repo_metadata(checkout / "pkg" / "server.py")
+
+    assert metadata == RepoMetadata(
+        root=checkout,
+        remote_url="git@github.com:o/r.git",
+        branch="main",
+        head_sha=git(checkout, "rev-parse", "HEAD"),
+    )
+    assert source_url_from_file_path(checkout / "pkg" / "server.py") == (
+        "https://raw.githubusercontent.com/o/r/refs/heads/main/pkg/server.py"
+    )
+
+
+def test_packed_refs(checkout):
+    git(checkout, "pack-refs", "--all")
+    assert not (checkout / ".git" / "refs" / "heads" / "main").exists()
+
+    metadata = repo_metadata(checkout / "pkg" / "server.py")
+
+    assert metadata is not None
+    assert metadata.head_sha == git(checkout, "rev-parse", "HEAD")
+
+
+def test_detached_head(checkout):
+    git(checkout, "checkout", "-q", "--detach")
+
+    metadata = repo_metadata(checkout / "pkg" / "server.py")
+
+    assert metadata is not None
+    assert (metadata.branch, metadata.head_sha) == (
+        "HEAD",
+        git(checkout, "rev-parse", "HEAD"),
+    )
+
+
+def test_worktree(checkout, tmp_path):
+    worktree = tmp_path / "worktree"
+    git(checkout, "worktree", "add", "-q", "-b", "feature", str(worktree))
+
+    metadata = repo_metadata(worktree / "pkg" / "server.py")
+
+    # the branch is the worktree's own, the remote and refs are shared
+    assert metadata == RepoMetadata(
+        root=worktree,
+        remote_url="git@github.com:o/r.git",
+        branch="feature",
+        head_sha=git(checkout, "rev-parse", "HEAD"),
+    )
+
+
+def test_local_checkout_needs_no_request(checkout):
+    github = GitHub()
+
+    async def main():
+        transport = httpx.MockTransport(github.handle)
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await CommitShaResolver(client, None).resolve(
+                "uv run https://github.com/o/r/blob/main/pkg/server.py",
+                checkout / "pkg" / "server.py",
+            )
+
+    assert asyncio.run(main()) == git(checkout, "rev-parse", "HEAD")
+    assert github.requests == []
+
+
+def test_outside_a_repository(tmp_path):
+    assert repo_metadata(tmp_path / "server.py") is None
@@ -0,0 +1,107 @@
+import asyncio
+import stat
+from types import SimpleNamespace
+
+import pytest
+from atproto_client.client.session import Session, SessionEvent
+
+from mcproto_client import _session
+from mcproto_client._session import _session_path, login
+from mcproto_client.settings import Settings
+
+HANDLE = "Someone@Example.com"
+
+
+class FakeClient:
+    """Logs in like `AsyncClient`, accepting only sessions it handed out."""
+
+    instances: list["FakeClient"] = []
+
+    def __init__(self) -> None:
+        self.callbacks = []
+        self.logins: list[str] = []
+        FakeClient.instances.append(self)
+
+    def on_session_change(self, callback) -> None:
+        self.callbacks.append(callback)
+
+    async def _changed(self, event: SessionEvent, session: Session) -> None:
+        for callback in self.callbacks:
+            await callback(event, session)
+
+    async def login(self, login=None, password=None, session_string=None):
+        if session_string is not None:
+            self.logins.append("session")
+            if not session_string.startswith("someone:::"):
+                raise ValueError("Invalid session string")
+            await self._changed(
+                SessionEvent.REFRESH,
+                Session("someone", "did:plc:test", "access-2", "refresh-2"),
+            )
+        else:
+            self.logins.append("password")
+            await self._changed(
+                SessionEvent.CREATE,
+                Session("someone", "did:plc:test", "access-1", "refresh-1"),
+            )
+        return SimpleNamespace(did="did:plc:test", handle="someone")
+
+
+@pytest.fixture(autouse=True)
+def fake_client(monkeypatch):
+    FakeClient.instances = []
+    monkeypatch.setattr(_session, "AsyncClient", FakeClient)
+
+
+def settings(cache_dir) -> Settings:
+    return Settings(handle=HANDLE, password="secret", session_cache_dir=cache_dir)
+
+
+def test_session_file_is_private_and_not_named_after_the_handle(tmp_path):
+    path = _session_path(tmp_path, HANDLE)
+
+    assert path == _session_path(tmp_path, HANDLE.lower())
+    assert path.parent == tmp_path
+    assert "example" not in path.name.lower()
+
+    asyncio.run(login(settings(tmp_path)))
+
+    assert [p.name for p in tmp_path.iterdir()] == [path.name]
+    assert stat.S_IMODE(path.stat().st_mode) == 0o600
+
+
+def test_new_and_refreshed_sessions_are_cached(tmp_path):
+    path = _session_path(tmp_path, HANDLE)
+
+    asyncio.run(login(settings(tmp_path)))
+    assert Session.decode(path.read_text()).access_jwt == "access-1"
+
+    asyncio.run(login(settings(tmp_path)))
+    assert Session.decode(path.read_text()).access_jwt == "access-2"
+    assert [client.logins for client in FakeClient.instances] == [
+        ["password"],
+        ["session"],
+    ]
+
+
+def test_unusable_session_falls_back_to_the_password(tmp_path):
+    path = _session_path(tmp_path, HANDLE)
+    path.write_text("expired")
+
+    with pytest.warns(UserWarning, match="Cached session unusable"):
+        client, profile = asyncio.run(login(settings(tmp_path)))
+
+    # the password login uses a new client, not the one holding the bad session
+    assert [c.logins for c in FakeClient.instances] == [["session"], ["password"]]
+    assert client is FakeClient.instances[1]
+    assert profile.did == "did:plc:test"
+    assert Session.decode(path.read_text()).access_jwt == "access-1"
+
+
+def test_without_a_cache_dir_nothing_is_written(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    asyncio.run(login(settings(None)))
+
+    assert list(tmp_path.iterdir()) == []
+    assert FakeClient.instances[0].callbacks == []
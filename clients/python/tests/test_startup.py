@@ -0,0 +1,49 @@
+"""The CLI must start without loading what only a registration needs."""
+
+import os
+import statistics
+import subprocess
+import sys
+
+import pytest
+
+MODULE = "mcproto_client._cli"
+
+# only needed once servers are actually being registered
+DEFERRED = ("atproto", "atproto_client", "mcp", "httpx")
+
+# import time depends on the machine, so the budget is only checked on request
+BUDGET_MS = 150
+RUNS = 5
+CHECK_BUDGET = os.environ.get("MCPROTO_CHECK_IMPORT_BUDGET") == "1"
+
+
+def import_times() -> dict[str, int]:
+    """Import MODULE in a fresh interpreter and return cumulative times in us."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_slow_dependencies_are_deferred():
+    loaded = {name.split(".")[0] for name in import_times()}
+    assert not loaded & set(DEFERRED)
+
+
+@pytest.mark.skipif(
+    not CHECK_BUDGET, reason="set MCPROTO_CHECK_IMPORT_BUDGET=1 to check"
+)
+def test_import_is_within_budget():
+    import_ms = statistics.median(import_times()[MODULE] for _ in range(RUNS)) / 1000
+    assert import_ms <= BUDGET_MS, f"import {MODULE} took {import_ms:.1f}ms"
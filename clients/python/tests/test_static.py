@@ -0,0 +1,148 @@
+import asyncio
+import textwrap
+
+import pytest
+
+from mcproto_client._static import (
+    StaticExtractionError,
+    _compiler_cleandoc,
+    extract_server,
+)
+
+SERVER = '''
+from typing import Annotated, Any, Literal, Optional, Union
+
+from mcp.server.fastmcp import Context, FastMCP
+from pydantic import Field
+
+mcp = FastMCP("demo", instructions="Does things.")
+
+
+@mcp.tool()
+def multi_line(text: str) -> str:
+    """Line one.
+
+    More detail here.
+        Indented further.
+    """
+    return text
+
+
+@mcp.tool()
+async def one_line(count: int = 3, ratio: float = 0.5, flag: bool = False) -> str:
+    """Just one line."""
+    return ""
+
+
+@mcp.tool()
+def undocumented(anything, value: Any, items: list[str], mapping: dict[str, int]):
+    return ""
+
+
+@mcp.tool(name="renamed", description="Given in the decorator.")
+def described(pair: tuple[int, str], many: tuple[int, ...], unique: set[int]) -> str:
+    """Not used."""
+    return ""
+
+
+@mcp.tool()
+def annotated(
+    limit: Annotated[int, Field(description="How many")],
+    mode: Literal["fast", "slow"] = "fast",
+    mixed: Literal[1, "one"] = 1,
+) -> str:
+    return ""
+
+
+@mcp.tool()
+def unions(
+    a: int | None,
+    b: Optional[str] = None,
+    c: Union[int, str] = 0,
+    d: "int | None" = None,
+    *,
+    e: list[int] | None = None,
+    ctx: Context,
+) -> str:
+    return ""
+
+
+@mcp.tool()
+def defaults(names: list[str] = ["a", "b"], options: dict = {"x": 1}) -> str:
+    return ""
+'''
+
+
+def listed_tools(source: str) -> list[dict]:
+    namespace: dict = {}
+    exec(compile(source, "<server>", "exec"), namespace)
+    tools = asyncio.run(namespace["mcp"].list_tools())
+    return [
+        {
+            "name": tool.name,
+            "description": tool.description,
+            "inputSchema": tool.inputSchema,
+        }
+        for tool in tools
+    ]
+
+
+def test_matches_fastmcp():
+    server = extract_server(SERVER)
+
+    assert server.name == "demo"
+    assert server.instructions == "Does things."
+    assert [tool.to_record() for tool in server.tools] == listed_tools(SERVER)
+
+
+def test_docstrings_are_dedented_like_the_compiler():
+    doc = "Line one.\n\n    More detail here.\n    "
+    assert _compiler_cleandoc(doc) == "Line one.\n\nMore detail here.\n"
+    assert _compiler_cleandoc("  Only.") == "Only."
+    assert _compiler_cleandoc("\n\tTabbed\n\t  more\n") == "\nTabbed\n  more\n"
+
+
+def server_with(signature: str, body: str = "") -> str:
+    return textwrap.dedent(
+        f"""
+        from typing import Annotated
+        from pydantic import Field
+        from mcp.server.fastmcp import FastMCP
+        from models import Query
+
+        mcp = FastMCP("demo")
+
+        @mcp.tool()
+        def tool({signature}) -> str:
+            return ""
+        """
+    ) + textwrap.dedent(body)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        # a type defined outside the file
+        server_with("query: Query"),
+        # constraints change the schema
+        server_with("n: Annotated[int, Field(ge=1)]"),
+        server_with("n: Annotated[int, 'not a Field']"),
+        server_with("n: 'int |'"),
+        server_with("*args: int"),
+        server_with("n: int = DEFAULT"),
+        # tools registered outside a decorator
+        server_with("n: int", "mcp.add_tool(print)\n"),
+        server_with("n: int").replace('FastMCP("demo")', "FastMCP(NAME)"),
+        server_with("n: int").replace('FastMCP("demo")', "make_server()"),
+        "this is not python",
+    ],
+)
+def test_falls_back_to_importing(source):
+    with pytest.raises(StaticExtractionError):
+        extract_server(source)
+
+
+def test_fallback_cases_differ_from_a_static_server():
+    assert [tool.name for tool in extract_server(server_with("n: int")).tools] == [
+        "tool"
+    ]
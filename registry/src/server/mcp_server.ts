@@ -53,6 +53,10 @@ export const lexicon: LexiconDoc = {
             type: 'string',
             description: 'Git commit SHA for reproducible installation'
           },
+          contentHash: {
+            type: 'string',
+            description: 'SHA-256 of the record as canonical JSON, without lastRegisteredAt and contentHash, so clients can skip unchanged re-registrations'
+          },
           language: {
             type: 'string',
             description: 'Programming language of the server implementation'
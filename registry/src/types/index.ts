@@ -15,6 +15,7 @@ export interface MCPServerRecord {
     createdAt: string
     lastRegisteredAt: string
     commitSha?: string  // Git commit SHA for reproducible installs
+    contentHash?: string  // SHA-256 of the record without lastRegisteredAt, set by the Python client
     language: string    // Programming language of the server implementation
     publisher: Publisher
 }